@@ -14,11 +14,12 @@ setup(
     install_requires=[
         'openpyxl',  # List your dependencies here
         'pandas',
+        'numpy>=1.20',  # sliding_window_view
     ],
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
         "Operating System :: OS Independent",
     ],
-    python_requires='>=3.6',
+    python_requires='>=3.9',
 )
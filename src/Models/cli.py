@@ -0,0 +1,109 @@
+"""
+Command line entry point, run as `python -m ExcelFormulaParser parse`.
+
+Reads formulas from a JSONL or CSV stream and writes one parsed formula
+(Parser.to_dict()) per line as JSONL. Everything is streamed: input is read
+as the parsers need it and results are written as they come back, so memory
+stays flat however many formulas go through.
+"""
+import argparse
+import csv
+import json
+import sys
+from Models.parallel import ParseFailure, iter_parse_many
+
+
+def read_jsonl(stream, column):
+    """Formulas from JSONL, each line either a JSON string or an object holding it under column."""
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise ValueError(f"Line {line_number} isn't valid JSON: {error}")
+        yield record.get(column) if isinstance(record, dict) else record
+
+
+def read_csv(stream, column):
+    """Formulas from the column of a CSV file with a header row."""
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None or column not in reader.fieldnames:
+        raise ValueError(f"The CSV input has no {column!r} column")
+    for row in reader:
+        yield row[column]
+
+
+readers = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+def input_format(args):
+    if args.format:
+        return args.format
+    return 'csv' if args.input.lower().endswith('.csv') else 'jsonl'
+
+
+def open_stream(path, mode):
+    if path == '-':
+        return sys.stdin if 'r' in mode else sys.stdout
+    return open(path, mode, newline='' if path.lower().endswith('.csv') else None, encoding='utf-8')
+
+
+def parse_command(args):
+    """
+    Parse every formula of the input into the output, one JSON line per input record.
+    Records that fail to parse are written as null, with the details in the --errors file.
+    """
+    source = open_stream(args.input, 'r')
+    output = open_stream(args.output, 'w')
+    errors = open(args.errors, 'w', encoding='utf-8') if args.errors else None
+    failures = 0
+    try:
+        formulas = readers[input_format(args)](source, args.column)
+        for record_number, result in enumerate(iter_parse_many(formulas, args.jobs, args.chunksize), 1):
+            if isinstance(result, ParseFailure):
+                failures += 1
+                output.write('null\n')
+                if errors:
+                    errors.write(json.dumps({"record": record_number, "formula": result.formula,
+                                             "error": result.error}) + '\n')
+            else:
+                output.write(json.dumps(result) + '\n')
+    finally:
+        for stream in (source, output, errors):
+            if stream is not None and stream not in (sys.stdin, sys.stdout):
+                stream.close()
+    if failures:
+        print(f"{failures} formula(s) could not be parsed", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='ExcelFormulaParser',
+                                     description="Break Excel formulas down into their JSON structure.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parse = commands.add_parser('parse', help="parse a JSONL or CSV stream of formulas into JSONL")
+    parse.add_argument('input', nargs='?', default='-', help="input file, - for stdin (the default)")
+    parse.add_argument('-o', '--output', default='-', help="output file, - for stdout (the default)")
+    parse.add_argument('--format', choices=sorted(readers), help="input format, guessed from the file name if left out")
+    parse.add_argument('--column', default='formula',
+                       help="CSV column, or JSONL object key, holding the formula (default: formula)")
+    parse.add_argument('-j', '--jobs', type=int, default=1, help="worker processes to parse with (default: 1)")
+    parse.add_argument('--chunksize', type=int, default=256, help="formulas sent to a worker at a time")
+    parse.add_argument('--errors', help="write the formulas that failed to parse to this JSONL file")
+    parse.set_defaults(handler=parse_command)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.handler(args)
+    except (ValueError, OSError) as error:
+        print(f"error: {error}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
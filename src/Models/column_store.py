@@ -0,0 +1,163 @@
+"""
+Cell values kept column by column in NumPy arrays, for evaluating big ranges.
+
+Every column of a sheet is its own float64 array, grown by doubling as rows past
+its end are set, so a value written far out (XFD1048576, say) only costs the one
+column it's in. Empty cells are nan. Text, booleans and errors don't fit a float
+array, they sit in the column's dictionary with a boolean mask marking where they
+are, so checking that a range is purely numeric is one mask lookup at C speed.
+
+get_range returns a view of the column when a one column range has no text,
+booleans or errors in it, which is what makes SUM(B2:B200000) a single array
+reduction instead of 200000 Python values (see CellRange.numbers). Ranges over
+several columns are the columns' slices stacked side by side.
+"""
+from numbers import Real
+import numpy as np
+from Models.columns import column_index_from_string
+from Models.dependency_graph import DependencyGraph
+from Models.evaluator import CellProvider
+
+
+def is_number(value):
+    # NumPy and pandas scalars (np.float64, np.int64) count, booleans are kept aside
+    return isinstance(value, Real) and not isinstance(value, (bool, np.bool_))
+
+
+class ColumnValues:
+    """One column's values, grown by doubling when a row past the end is set."""
+    __slots__ = ('values', 'other_mask', 'others')
+
+    def __init__(self):
+        self.values = np.full(0, np.nan)
+        self.other_mask = np.zeros(0, dtype=bool)
+        self.others = {}  # row -> text, boolean or ExcelError
+
+    def reserve(self, max_row):
+        """Make room for rows up to max_row."""
+        rows = len(self.values)
+        if max_row <= rows:
+            return
+        values = np.full(max(max_row, rows * 2), np.nan)
+        other_mask = np.zeros(len(values), dtype=bool)
+        values[:rows] = self.values
+        other_mask[:rows] = self.other_mask
+        self.values, self.other_mask = values, other_mask
+
+    def set(self, row, value):
+        self.reserve(row)
+        if self.other_mask[row - 1]:
+            self.other_mask[row - 1] = False
+            del self.others[row]
+        if is_number(value):
+            self.values[row - 1] = value
+            return
+        self.values[row - 1] = np.nan
+        if value is not None:
+            self.other_mask[row - 1] = True
+            self.others[row] = value
+
+    def set_numbers(self, first_row, numbers):
+        """Set a run of rows from a 1-D numeric array, nan for empty cells."""
+        last_row = first_row + len(numbers) - 1
+        self.reserve(last_row)
+        if self.other_mask[first_row - 1:last_row].any():
+            for row in [row for row in self.others if first_row <= row <= last_row]:
+                del self.others[row]
+            self.other_mask[first_row - 1:last_row] = False
+        self.values[first_row - 1:last_row] = numbers
+
+    def get(self, row):
+        if row > len(self.values):
+            return None
+        if self.other_mask[row - 1]:
+            return self.others[row]
+        value = self.values[row - 1]
+        return None if value != value else float(value)
+
+    def block(self, min_row, max_row):
+        """The rows as a 1-D float array, a view when they've all been reserved. None if any isn't a number."""
+        if self.other_mask[min_row - 1:max_row].any():
+            return None
+        inside = self.values[min_row - 1:max_row]
+        if max_row <= len(self.values):
+            return inside
+        # the range runs past what's been set, the cells out there are empty
+        block = np.full(max_row - min_row + 1, np.nan)
+        block[:len(inside)] = inside
+        return block
+
+
+class ColumnStore(CellProvider):
+    """
+    A CellProvider holding values in NumPy arrays, one per column (see the module docstring).
+    Numbers come back as floats, like Excel keeps them. It has the same set() as
+    DictCellProvider, so it can stand in for one, for example under a Recalculator.
+    """
+
+    def __init__(self, values=None):
+        self.sheets = {}  # sheet name -> {column number: ColumnValues}
+        for (sheet_name, cell), value in (values or {}).items():
+            self.set(sheet_name, cell, value)
+
+    def column(self, sheet_name, column):
+        columns = self.sheets.setdefault(sheet_name, {})
+        values = columns.get(column)
+        if values is None:
+            values = columns[column] = ColumnValues()
+        return values
+
+    def set(self, sheet_name, cell, value):
+        """Set a cell given as 'B2' or (column, row), None empties it."""
+        _, column, row = DependencyGraph.cell(sheet_name, cell)
+        self.column(sheet_name, column).set(row, value)
+
+    def set_block(self, sheet_name, cell, rows):
+        """
+        Set a block of values starting at cell, given as a list of rows or a 2-D array.
+        A numeric array (nan for empty cells) is copied in a column at a time, anything else cell by cell.
+        """
+        _, min_col, min_row = DependencyGraph.cell(sheet_name, cell)
+        if isinstance(rows, np.ndarray) and rows.dtype.kind in 'iuf':
+            block = rows.reshape(rows.shape[0], -1)
+            for offset in range(block.shape[1]):
+                self.column(sheet_name, min_col + offset).set_numbers(min_row, block[:, offset])
+            return
+        for row_offset, row in enumerate(rows):
+            for col_offset, value in enumerate(row):
+                self.set(sheet_name, (min_col + col_offset, min_row + row_offset), value)
+
+    def set_column(self, sheet_name, column, first_row, values):
+        """Set a run of cells down one column (a letter or a number) starting at first_row."""
+        if isinstance(column, str):
+            column = column_index_from_string(column)
+        if not isinstance(values, np.ndarray):
+            values = list(values)
+            if all(is_number(value) for value in values):
+                values = np.array(values, dtype=float)
+        if isinstance(values, np.ndarray):
+            self.set_block(sheet_name, (column, first_row), values.reshape(-1, 1))
+        else:
+            self.set_block(sheet_name, (column, first_row), [[value] for value in values])
+
+    def get(self, sheet_name, column, row):
+        values = self.sheets.get(sheet_name, {}).get(column)
+        return None if values is None else values.get(row)
+
+    def get_range(self, sheet_name, min_col, min_row, max_col, max_row):
+        """
+        The values of a rectangle: a 2-D float array (nan for empty cells) when it only
+        holds numbers, a view into the store for one column, a list of rows like any
+        CellProvider otherwise.
+        """
+        columns = self.sheets.get(sheet_name, {})
+        blocks = []
+        for column in range(min_col, max_col + 1):
+            values = columns.get(column)
+            block = np.full(max_row - min_row + 1, np.nan) if values is None else values.block(min_row, max_row)
+            if block is None:
+                return super().get_range(sheet_name, min_col, min_row, max_col, max_row)
+            blocks.append(block)
+        if len(blocks) == 1:
+            return blocks[0].reshape(-1, 1)
+        return np.column_stack(blocks)
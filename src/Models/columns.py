@@ -0,0 +1,44 @@
+"""
+Column letter <-> number conversions.
+
+These mirror openpyxl.utils.column_index_from_string and get_column_letter,
+but importing openpyxl.utils loads the whole openpyxl package, which is far
+too slow for the parse path. Both directions are plain lookups into tables
+covering every column Excel allows, built once at import.
+"""
+from itertools import product
+from string import ascii_uppercase
+
+MAX_COLUMN = 16384  # XFD, the last column Excel allows
+
+
+def _build_column_letters():
+    letters = ['']  # index 0 is unused so column numbers index the list directly
+    for width in (1, 2, 3):
+        for combination in product(ascii_uppercase, repeat=width):
+            letters.append(''.join(combination))
+            if len(letters) > MAX_COLUMN:
+                return letters
+    return letters
+
+
+COLUMN_LETTERS = _build_column_letters()
+COLUMN_NUMBERS = {letter: number for number, letter in enumerate(COLUMN_LETTERS) if letter}
+
+
+def column_index_from_string(column_letter):
+    """Convert a column letter like 'AB' into its number (28)."""
+    try:
+        return COLUMN_NUMBERS[column_letter]
+    except (KeyError, TypeError):
+        pass
+    if isinstance(column_letter, str) and column_letter.upper() in COLUMN_NUMBERS:
+        return COLUMN_NUMBERS[column_letter.upper()]
+    raise ValueError(f"Invalid column letter: {column_letter!r}")
+
+
+def get_column_letter(column_number):
+    """Convert a column number like 28 into its letter ('AB')."""
+    if not isinstance(column_number, int) or not 1 <= column_number <= MAX_COLUMN:
+        raise ValueError(f"Invalid column number: {column_number!r}")
+    return COLUMN_LETTERS[column_number]
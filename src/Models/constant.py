@@ -1,10 +1,12 @@
-
-
 class Constant:
 
     @staticmethod
     def from_dict(constant_dict):
-        return Constant(constant_dict['constant'])
+        value = constant_dict['constant']
+        if isinstance(value, str):
+            # text constants are stored without their quotes in the dictionary structure
+            value = Constant.format_value(value)
+        return Constant(value)
 
     @staticmethod
     def is_valid_constant(arg):
@@ -14,24 +16,45 @@ class Constant:
         return True
 
     def __init__(self, value):
-        # Automatically parse and set value during initialization
-        self.value = self.parse_constant(value)
+        # Values that already came out of a parse (numbers and booleans) are kept as they are
+        if isinstance(value, (bool, int, float)):
+            self.value = value
+        else:
+            # Automatically parse and set value during initialization
+            self.value = self.parse_constant(value)
 
     @staticmethod
     def parse_constant(constant_str):
-        constant_str = str(constant_str).replace("'", "").replace('"', "").strip()
-        
+        constant_str = str(constant_str).strip()
+
+        # Excel logicals and double quoted text literals
+        if constant_str in ('TRUE', 'FALSE'):
+            return constant_str == 'TRUE'
+        if len(constant_str) >= 2 and constant_str[0] == constant_str[-1] == '"':
+            return constant_str[1:-1].replace('""', '"')
+
+        constant_str = constant_str.replace("'", "").replace('"', "")
+
         # Try to convert to float or int
         try:
             if '.' in constant_str:
-                return float(constant_str) 
-            return int(constant_str)  
-        
+                return float(constant_str)
+            return int(constant_str)
+
         except ValueError:
             raise ValueError("Invalid constant format")
 
+    @staticmethod
+    def format_value(value):
+        """Turn a constant value back into the text Excel would show in a formula."""
+        if isinstance(value, bool):
+            return 'TRUE' if value else 'FALSE'
+        if isinstance(value, str):
+            return '"' + value.replace('"', '""') + '"'
+        return str(value)
+
     def __str__(self):
-        return str(self.value)
-    
+        return Constant.format_value(self.value)
+
     def to_dict(self):
-        return {"constant": self.value}
\ No newline at end of file
+        return {"constant": self.value}
@@ -0,0 +1,360 @@
+"""
+SUMIF, SUMIFS, COUNTIF, COUNTIFS, AVERAGEIF and AVERAGEIFS over NumPy masks.
+
+A criterion like ">=100" or "A*" is parsed once into a Criterion (parse_criterion
+is cached), and a criteria range is read once into a CriteriaColumn: its values
+split into typed arrays, cached in the Evaluator's LookupIndexes by the range's
+bounds like the lookup indexes are. A criterion then becomes a boolean mask over
+the column, computed with array operations and kept on the column, so the same
+criterion over the same range is never worked out twice.
+
+Most conditional aggregates test one range for equality (SUMIF(A:A, "north", B:B)
+filled down a report with a different region per row). For those the column
+also keeps a group-by index, each distinct value's group number per cell, and
+the sums and counts of every group come out of one np.bincount per summed range.
+Every one of those formulas is then a dictionary lookup.
+
+numpy is only imported when one of these functions runs, so it isn't loaded
+with the evaluator.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+from Models.excel_functions import ExcelError, CellRange, register
+from Models.lookup import lookup_key
+
+
+class Criterion(namedtuple('Criterion', ['operator', 'kind', 'operand'])):
+    """
+    A parsed criterion: operator is one of = <> < > <= >=, kind is 'number', 'text',
+    'bool', 'blank' (the criterion "" or "=") or 'pattern' (text with * or ? wildcards,
+    operand is then a compiled regular expression).
+    """
+    __slots__ = ()
+
+    @property
+    def group_key(self):
+        """The group-by key of an equality criterion on one value, None for everything else."""
+        if self.operator != '=' or self.kind not in ('number', 'text', 'bool'):
+            return None
+        return lookup_key(self.operand)
+
+
+@lru_cache(maxsize=4096, typed=True)  # typed, or True and 1 would share an entry
+def parse_criterion(criterion):
+    """Parse a criterion value (a number, a boolean, text like '>=100' or 'A*', or None)."""
+    if criterion is None:
+        return Criterion('=', 'blank', None)
+    if isinstance(criterion, bool):
+        return Criterion('=', 'bool', criterion)
+    if isinstance(criterion, (int, float)):
+        return Criterion('=', 'number', criterion)
+    if isinstance(criterion, ExcelError):
+        raise criterion
+    if not isinstance(criterion, str):
+        raise ExcelError('#VALUE!')
+
+    operator = '='
+    for prefix in ('<=', '>=', '<>', '<', '>', '='):
+        if criterion.startswith(prefix):
+            operator, criterion = prefix, criterion[len(prefix):]
+            break
+    if criterion == '':
+        return Criterion(operator if operator in ('=', '<>') else '=', 'blank', None)
+    try:
+        return Criterion(operator, 'number', float(criterion))
+    except ValueError:
+        pass
+    if criterion.upper() in ('TRUE', 'FALSE'):
+        return Criterion(operator, 'bool', criterion.upper() == 'TRUE')
+    if operator in ('=', '<>') and re.search(r'(?<!~)[*?]', criterion):
+        return Criterion(operator, 'pattern', re.compile(wildcard_pattern(criterion.lower()), re.DOTALL))
+    # an escaped wildcard on its own is just the character
+    return Criterion(operator, 'text', re.sub(r'~([*?~])', r'\1', criterion).lower())
+
+
+def wildcard_pattern(text):
+    """Excel's * and ? wildcards as a regular expression, ~ escapes them."""
+    pattern = []
+    position = 0
+    while position < len(text):
+        character = text[position]
+        if character == '~' and position + 1 < len(text):
+            pattern.append(re.escape(text[position + 1]))
+            position += 2
+            continue
+        pattern.append('.*' if character == '*' else '.' if character == '?' else re.escape(character))
+        position += 1
+    return ''.join(pattern)
+
+
+class CriteriaColumn:
+    """
+    The values of a range as flat typed arrays, read row by row: numbers (nan where
+    the cell isn't a number), lower cased text, booleans, and masks of which cells
+    are blank and which hold errors. Masks for criteria and the group-by index are
+    worked out the first time they're asked for and kept.
+    """
+
+    def __init__(self, rows):
+        import numpy as np
+
+        self.masks = {}  # Criterion -> boolean mask
+        self.groups = None  # (group number per cell, -1 for none; group key -> group number)
+        self.group_totals = {}  # summed range's bounds -> (its CriteriaColumn, sums, numeric counts)
+        self.group_counts = None  # cells per group
+        self.errors = {}  # position -> ExcelError
+        if hasattr(rows, 'dtype'):
+            # an array from a ColumnStore, only numbers and nan for empty cells
+            self.shape = rows.shape
+            self.numbers = rows.astype(float).ravel()
+            self.is_blank = np.isnan(self.numbers)
+            self.texts = np.full(self.numbers.size, '')
+            self.is_text = self.is_bool = self.is_error = np.zeros(self.numbers.size, dtype=bool)
+            self.booleans = self.is_bool
+            return
+
+        rows = [list(row) for row in rows]
+        self.shape = (len(rows), len(rows[0]) if rows else 0)
+        numbers, texts, kinds = [], [], []
+        for row in rows:
+            for value in row:
+                if isinstance(value, bool):
+                    numbers.append(float('nan'))
+                    texts.append('')
+                    kinds.append(3 if value else 2)
+                elif isinstance(value, (int, float)):
+                    numbers.append(value)
+                    texts.append('')
+                    kinds.append(0)
+                elif isinstance(value, str):
+                    numbers.append(float('nan'))
+                    texts.append(value.lower())
+                    kinds.append(1)
+                else:
+                    numbers.append(float('nan'))
+                    texts.append('')
+                    if isinstance(value, ExcelError):
+                        self.errors[len(kinds)] = value
+                        kinds.append(5)
+                    else:
+                        kinds.append(4)  # empty
+        kinds = np.array(kinds, dtype=np.int8)
+        self.numbers = np.array(numbers, dtype=float)
+        self.texts = np.array(texts, dtype=str) if texts else np.full(0, '')
+        self.is_text = kinds == 1
+        self.is_bool = (kinds == 2) | (kinds == 3)
+        self.booleans = kinds == 3
+        self.is_blank = kinds == 4
+        self.is_error = kinds == 5
+
+    def __len__(self):
+        return self.numbers.size
+
+    def mask(self, criterion):
+        """Boolean mask of the cells meeting criterion."""
+        mask = self.masks.get(criterion)
+        if mask is None:
+            if len(self.masks) >= 256:
+                self.masks.clear()  # a column every cell asks a different question of, keep memory bounded
+            mask = self.masks[criterion] = self.compute_mask(criterion)
+        return mask
+
+    def compute_mask(self, criterion):
+        import numpy as np
+
+        operator, kind, operand = criterion
+        if operator == '<>':
+            return ~self.mask(Criterion('=', kind, operand))
+        if kind == 'blank':
+            return self.is_blank | (self.is_text & (self.texts == ''))
+        if kind == 'pattern':
+            # match each distinct text once, then spread the answers back over the cells
+            mask = np.zeros(len(self), dtype=bool)
+            if self.is_text.any():
+                uniques, inverse = np.unique(self.texts[self.is_text], return_inverse=True)
+                matches = np.array([operand.fullmatch(text) is not None for text in uniques.tolist()], dtype=bool)
+                mask[self.is_text] = matches[inverse]
+            return mask
+        compare = {'=': np.equal, '<': np.less, '>': np.greater, '<=': np.less_equal, '>=': np.greater_equal}[operator]
+        with np.errstate(invalid='ignore'):
+            if kind == 'number':
+                return compare(self.numbers, operand)  # nan (not a number) compares False
+            if kind == 'text':
+                return self.is_text & compare(self.texts, operand)
+            return self.is_bool & compare(self.booleans, operand)
+
+    def group_index(self):
+        """Group number per cell (-1 for blanks and errors) and the number of each distinct value."""
+        import numpy as np
+
+        if self.groups is None:
+            codes = np.full(len(self), -1, dtype=np.int64)
+            keys = {}
+            is_number = ~np.isnan(self.numbers)
+            uniques, inverse = np.unique(self.numbers[is_number], return_inverse=True)
+            codes[is_number] = inverse
+            keys.update(((0, value), code) for code, value in enumerate(uniques.tolist()))
+            offset = len(keys)
+            uniques, inverse = np.unique(self.texts[self.is_text], return_inverse=True)
+            codes[self.is_text] = inverse + offset
+            keys.update(((1, value), offset + code) for code, value in enumerate(uniques.tolist()))
+            offset = len(keys)
+            codes[self.is_bool] = self.booleans[self.is_bool] + offset
+            keys.update((((2, False), offset), ((2, True), offset + 1)))
+            self.groups = (codes, keys)
+        return self.groups
+
+    def count(self, group_key):
+        """How many cells hold the value group_key stands for."""
+        import numpy as np
+
+        codes, keys = self.group_index()
+        group = keys.get(group_key)
+        if group is None:
+            return 0
+        if self.group_counts is None:
+            self.group_counts = np.bincount(codes[codes >= 0], minlength=len(keys))
+        return int(self.group_counts[group])
+
+    def totals(self, bounds, summed):
+        """Sum and count of summed's numbers per group of this column, worked out once per summed range."""
+        import numpy as np
+
+        cached = self.group_totals.get(bounds)
+        # a changed summed range is a new CriteriaColumn, the totals of the old one are stale
+        if cached is None or cached[0] is not summed:
+            codes, keys = self.group_index()
+            grouped = codes >= 0
+            numbers = summed.numbers[grouped]
+            is_number = ~np.isnan(numbers)
+            size = len(keys)
+            sums = np.bincount(codes[grouped], weights=np.where(is_number, numbers, 0.0), minlength=size)
+            counts = np.bincount(codes[grouped], weights=is_number, minlength=size)
+            cached = self.group_totals[bounds] = (summed, sums, counts)
+        return cached[1], cached[2]
+
+
+def criteria_column(environment, closure, shape=None, resize=False):
+    """
+    The CriteriaColumn of a range argument and the bounds it was read from (None for a
+    computed range). A range that isn't the given shape is a #VALUE! error, unless resize
+    is set: then a plain range is resized from its top left corner, the way SUMIF treats
+    a sum range of a different size.
+    """
+    area = getattr(closure, 'area', None)
+    if area is None:
+        value = closure(environment)
+        column = CriteriaColumn(value.rows if isinstance(value, CellRange) else [[value]])
+        if shape is not None and column.shape != shape:
+            raise ExcelError('#VALUE!')
+        return column, None
+
+    sheet_name, min_col, min_row, max_col, max_row = area(environment)
+    if shape is not None and (max_row - min_row + 1, max_col - min_col + 1) != shape:
+        if not resize:
+            raise ExcelError('#VALUE!')
+        max_row, max_col = min_row + shape[0] - 1, min_col + shape[1] - 1
+    bounds = (sheet_name, min_col, min_row, max_col, max_row)
+    read = lambda: environment.provider.get_range(*bounds)
+    lookups = environment.lookups
+    if lookups is None:
+        return CriteriaColumn(read()), bounds
+    return lookups.get(bounds, read, kind=CriteriaColumn), bounds
+
+
+def conditional_mask(environment, pairs):
+    """The cells meeting every (range closure, criterion closure) pair, and the shape of the ranges."""
+    mask, shape = None, None
+    for criteria_range, criterion in pairs:
+        column, _ = criteria_column(environment, criteria_range, shape)
+        shape = column.shape
+        condition = column.mask(parse_criterion(criterion(environment)))
+        mask = condition if mask is None else mask & condition
+    return mask, shape
+
+
+def masked_totals(summed, mask):
+    """Sum and count of the numbers under the mask, raising the first error it covers."""
+    import numpy as np
+
+    if summed.errors:
+        for position in np.flatnonzero(mask & summed.is_error).tolist()[:1]:
+            raise summed.errors[position]
+    numbers = summed.numbers[mask]
+    is_number = ~np.isnan(numbers)
+    return numbers[is_number].sum().item(), int(is_number.sum())
+
+
+def conditional_totals(environment, pairs, summed_range, resize=False):
+    """
+    Sum and count of the summed range's numbers where every criterion holds. One
+    equality criterion over a plain range is answered from the group-by index.
+    """
+    if len(pairs) == 1:
+        criteria_range, criterion = pairs[0]
+        column, _ = criteria_column(environment, criteria_range)
+        criterion = parse_criterion(criterion(environment))
+        summed, summed_bounds = criteria_column(environment, summed_range, column.shape, resize)
+        if criterion.group_key is not None and summed_bounds is not None and not summed.errors:
+            sums, counts = column.totals(summed_bounds, summed)
+            group = column.group_index()[1].get(criterion.group_key)
+            if group is None:
+                return 0, 0
+            return sums[group].item(), int(counts[group])
+        return masked_totals(summed, column.mask(criterion))
+
+    mask, shape = conditional_mask(environment, pairs)
+    summed, _ = criteria_column(environment, summed_range, shape)
+    return masked_totals(summed, mask)
+
+
+def criteria_pairs(arguments):
+    if not arguments or len(arguments) % 2:
+        raise ExcelError('#VALUE!')
+    return list(zip(arguments[::2], arguments[1::2]))
+
+
+@register('SUMIF', lazy=True)
+def excel_sumif(environment, criteria_range, criterion, sum_range=None):
+    return conditional_totals(environment, [(criteria_range, criterion)], sum_range or criteria_range, resize=True)[0]
+
+
+@register('SUMIFS', lazy=True)
+def excel_sumifs(environment, sum_range, *criteria):
+    return conditional_totals(environment, criteria_pairs(criteria), sum_range)[0]
+
+
+@register('AVERAGEIF', lazy=True)
+def excel_averageif(environment, criteria_range, criterion, average_range=None):
+    total, count = conditional_totals(environment, [(criteria_range, criterion)], average_range or criteria_range,
+                                      resize=True)
+    if not count:
+        raise ExcelError('#DIV/0!')
+    return total / count
+
+
+@register('AVERAGEIFS', lazy=True)
+def excel_averageifs(environment, average_range, *criteria):
+    total, count = conditional_totals(environment, criteria_pairs(criteria), average_range)
+    if not count:
+        raise ExcelError('#DIV/0!')
+    return total / count
+
+
+@register('COUNTIF', lazy=True)
+def excel_countif(environment, criteria_range, criterion):
+    return excel_countifs(environment, criteria_range, criterion)
+
+
+@register('COUNTIFS', lazy=True)
+def excel_countifs(environment, *criteria):
+    pairs = criteria_pairs(criteria)
+    if len(pairs) == 1:
+        column, _ = criteria_column(environment, pairs[0][0])
+        criterion = parse_criterion(pairs[0][1](environment))
+        if criterion.group_key is not None:
+            return column.count(criterion.group_key)
+        return int(column.mask(criterion).sum())
+    mask, _ = conditional_mask(environment, pairs)
+    return int(mask.sum())
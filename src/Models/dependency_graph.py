@@ -0,0 +1,172 @@
+from collections import namedtuple
+from Models.columns import COLUMN_NUMBERS, get_column_letter
+from Models.nodes import Node, ReferenceNode, RangeNode, FunctionNode, ExpressionNode, node_from_dict
+from Models.operator_tree import BinaryNode, UnaryNode
+from Models.parser import Parser
+from Models.range_index import RangeIndex
+from Models.reference import Reference
+
+
+class Cell(namedtuple('Cell', ['sheet_name', 'column', 'row'])):
+    """A cell of the workbook, column and row are numbers."""
+    __slots__ = ()
+
+    @property
+    def coordinate(self):
+        return f"{get_column_letter(self.column)}{self.row}"
+
+    def __str__(self):
+        return f"'{self.sheet_name}'!{self.coordinate}"
+
+
+class Area(namedtuple('Area', ['sheet_name', 'min_col', 'min_row', 'max_col', 'max_row'])):
+    """A rectangle of cells a formula reads, a single reference is a one cell area."""
+    __slots__ = ()
+
+    def __contains__(self, cell):
+        return (cell.sheet_name == self.sheet_name and self.min_col <= cell.column <= self.max_col
+                and self.min_row <= cell.row <= self.max_row)
+
+    @property
+    def is_cell(self):
+        return self.min_col == self.max_col and self.min_row == self.max_row
+
+    def __str__(self):
+        start = f"{get_column_letter(self.min_col)}{self.min_row}"
+        if self.is_cell:
+            return f"'{self.sheet_name}'!{start}"
+        return f"'{self.sheet_name}'!{start}:{get_column_letter(self.max_col)}{self.max_row}"
+
+
+class DependencyGraph:
+    """
+    Precedents and dependents of every formula in a workbook.
+
+    Single references are kept as cell to cell edges. Ranges are kept as one
+    rectangle each rather than being expanded into their cells, so a formula
+    reading A1:A1000000 costs the same as one reading A1:A2. The ranges that
+    hold a cell are found through a RangeIndex per sheet.
+    """
+
+    def __init__(self):
+        self.formulas = {}  # formula cell -> list of the Areas it reads
+        self.cell_dependents = {}  # cell -> formula cells with a reference to it
+        self.range_indexes = {}  # sheet name -> RangeIndex of the ranges on it, valued by formula cell
+
+    @staticmethod
+    def cell(sheet_name, cell):
+        """Turn (sheet_name, 'B2') or (sheet_name, (column, row)) into a Cell."""
+        if isinstance(cell, Cell):
+            return cell
+        if isinstance(cell, str):
+            match = Reference.compiled_pattern.match(cell)
+            column = COLUMN_NUMBERS.get(match.group(2)) if match else None
+            if column is None:
+                raise ValueError(f"Invalid cell reference: {cell}")
+            return Cell(sheet_name, column, int(match.group(3)))
+        column, row = cell
+        return Cell(sheet_name, column, row)
+
+    @staticmethod
+    def areas(tree, sheet_name):
+        """The Areas a formula's node tree reads, references without a sheet are on sheet_name."""
+        areas = []
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, ReferenceNode):
+                areas.append(Area(node.sheet_name or sheet_name, node.column, node.row, node.column, node.row))
+            elif isinstance(node, RangeNode):
+                start, end = node.start, node.end
+                areas.append(Area(node.sheet_name or sheet_name, min(start.column, end.column), min(start.row, end.row),
+                                  max(start.column, end.column), max(start.row, end.row)))
+            elif isinstance(node, FunctionNode):
+                stack.extend(reversed(node.arguments))
+            elif isinstance(node, ExpressionNode):
+                stack.extend(reversed(node.components))
+            elif isinstance(node, BinaryNode):
+                stack.extend((node.right, node.left))
+            elif isinstance(node, UnaryNode):
+                stack.append(node.operand)
+        return areas
+
+    def add_formula(self, sheet_name, cell, formula):
+        """
+        Record the formula in cell, given as a formula string, a parsed dictionary
+        or a node tree. A formula already in that cell is replaced.
+        """
+        if isinstance(formula, str):
+            tree = Parser(formula).tree
+        elif isinstance(formula, Node):
+            tree = formula
+        else:
+            tree = node_from_dict(formula)
+
+        cell = DependencyGraph.cell(sheet_name, cell)
+        self.add_areas(cell.sheet_name, cell, DependencyGraph.areas(tree, cell.sheet_name))
+
+    def add_areas(self, sheet_name, cell, areas):
+        """Record a formula in cell by the Areas it reads, for callers that already know them."""
+        cell = DependencyGraph.cell(sheet_name, cell)
+        self.remove_formula(cell.sheet_name, cell)
+        self.formulas[cell] = areas
+        for area in areas:
+            if area.is_cell:
+                self.cell_dependents.setdefault(Cell(area.sheet_name, area.min_col, area.min_row), set()).add(cell)
+            else:
+                self.range_indexes.setdefault(area.sheet_name, RangeIndex()).add(area, cell)
+
+    def remove_formula(self, sheet_name, cell):
+        """Forget the formula in cell, if there is one."""
+        cell = DependencyGraph.cell(sheet_name, cell)
+        # a formula reading the same area twice only recorded it once
+        for area in set(self.formulas.pop(cell, ())):
+            if area.is_cell:
+                precedent = Cell(area.sheet_name, area.min_col, area.min_row)
+                dependents = self.cell_dependents.get(precedent)
+                if dependents is not None:
+                    dependents.discard(cell)
+                    if not dependents:
+                        del self.cell_dependents[precedent]
+            else:
+                self.range_indexes[area.sheet_name].remove(area, cell)
+
+    def precedents(self, sheet_name, cell):
+        """The Areas the formula in cell reads, empty if it isn't a formula."""
+        return list(self.formulas.get(DependencyGraph.cell(sheet_name, cell), ()))
+
+    def dependents(self, sheet_name, cell):
+        """The formula cells that read cell, through a reference or a range."""
+        cell = DependencyGraph.cell(sheet_name, cell)
+        dependents = set(self.cell_dependents.get(cell, ()))
+        index = self.range_indexes.get(cell.sheet_name)
+        if index is not None:
+            dependents.update(index.search((cell.column, cell.row)))
+        return dependents
+
+    def all_dependents(self, sheet_name, cell):
+        """Every formula cell affected by a change to cell, directly or through other formulas."""
+        seen = set()
+        stack = [DependencyGraph.cell(sheet_name, cell)]
+        while stack:
+            for dependent in self.dependents(None, stack.pop()):
+                if dependent not in seen:
+                    seen.add(dependent)
+                    stack.append(dependent)
+        return seen
+
+    def __len__(self):
+        return len(self.formulas)
+
+    def __contains__(self, cell):
+        return cell in self.formulas
+
+    @classmethod
+    def from_workbook(cls, filename, sheet_names=None, workers=1):
+        """Build the graph for every formula of an .xlsx file, formulas that don't parse are left out."""
+        from Models.workbook import iter_workbook_formulas
+        graph = cls()
+        for sheet_name, cell, parsed in iter_workbook_formulas(filename, sheet_names, workers):
+            if isinstance(parsed, dict):
+                graph.add_formula(sheet_name, cell, parsed)
+        return graph
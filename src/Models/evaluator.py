@@ -0,0 +1,326 @@
+import inspect
+from Models.columns import MAX_COLUMN
+from Models.dependency_graph import DependencyGraph
+from Models.excel_functions import (ExcelError, CellRange, binary_operators, negate, percent,
+                                    functions, lazy_functions, range_functions, register)
+from Models.lookup import LookupIndexes
+import Models.criteria  # registers SUMIF and the other conditional aggregates
+from Models.nodes import Node, ReferenceNode, RangeNode, ConstantNode, FunctionNode, ExpressionNode, node_from_dict
+from Models.operator_tree import BinaryNode, UnaryNode, binary_tree, operation_tree
+from Models.parse_cache import ParseCache
+from Models.parser import Parser
+from Models.simplify import fold
+from Models.template_cache import TemplateCache
+
+
+class CellProvider:
+    """
+    Where an Evaluator reads cell values from. Subclasses implement get(),
+    get_range() can be overridden when there's a faster way to read a block.
+    Empty cells are None, error cells hold an ExcelError.
+    """
+
+    def get(self, sheet_name, column, row):
+        raise NotImplementedError
+
+    def get_range(self, sheet_name, min_col, min_row, max_col, max_row):
+        """The values of a rectangle as a list of rows, or a 2-D array of numbers (see CellRange)."""
+        return [[self.get(sheet_name, column, row) for column in range(min_col, max_col + 1)]
+                for row in range(min_row, max_row + 1)]
+
+
+class DictCellProvider(CellProvider):
+    """Cell values kept in a dictionary keyed by (sheet_name, column, row)."""
+
+    def __init__(self, values=None):
+        self.values = {}
+        for (sheet_name, cell), value in (values or {}).items():
+            self.set(sheet_name, cell, value)
+
+    def set(self, sheet_name, cell, value):
+        """Set a cell given as 'B2' or (column, row), None empties it."""
+        key = DependencyGraph.cell(sheet_name, cell)
+        if value is None:
+            self.values.pop(key, None)
+        else:
+            self.values[key] = value
+
+    def get(self, sheet_name, column, row):
+        return self.values.get((sheet_name, column, row))
+
+
+class Environment:
+    """
+    What compiled closures evaluate against: the provider, the formula's sheet, how
+    far the formula moved and the lookup indexes lookup functions can reuse.
+    """
+    __slots__ = ('provider', 'sheet_name', 'col_shift', 'row_shift', 'lookups')
+
+    def __init__(self, provider, sheet_name=None, col_shift=0, row_shift=0, lookups=None):
+        self.provider = provider
+        self.sheet_name = sheet_name
+        self.col_shift = col_shift
+        self.row_shift = row_shift
+        self.lookups = lookups
+
+
+class Evaluator:
+    """
+    Computes formulas by compiling their node trees into Python closures.
+
+    A formula is compiled once, every later evaluation calls the closures with an
+    Environment instead of walking the tree again. Compiled formulas are cached by
+    text, or by their template (see TemplateCache) when the cell they're in is
+    given, so a filled down column shares a single compiled formula: references
+    are moved by the distance from the cell it was compiled for at evaluation time.
+
+    Lookup functions keep indexes of the columns and rows they search (see
+    Models.lookup). Call invalidate() after changing a cell the provider holds so
+    the indexes covering it are rebuilt.
+    """
+
+    def __init__(self, provider, maxsize=4096):
+        self.provider = provider
+        # formula text or template key -> [closure, column, row it was compiled for, tree, vectorized closure]
+        # the vectorized closure is compiled the first time many cells ask for it, False if it can't be
+        self.compiled = ParseCache(maxsize)
+        self.lookups = LookupIndexes()
+
+    @staticmethod
+    def register_function(name, function, lazy=False, pure=False, ranges=False):
+        """
+        Add or replace a function formulas can call. Eager functions get their evaluated
+        arguments (ranges as a CellRange), lazy ones the Environment and argument closures.
+        Pure ones always give the same value for the same arguments, so calls with constant
+        arguments are worked out once when formulas are compiled (see Models.simplify).
+        Eager ones taking ranges get their reference arguments as one cell CellRanges too.
+        """
+        register(name, lazy, pure, ranges)(function)
+
+    def evaluate(self, formula, sheet_name=None, cell=None):
+        """
+        The value of formula (a formula string, parsed dictionary or node tree),
+        sitting in cell of sheet_name. Excel errors come back as ExcelError values.
+        """
+        closure, col_shift, row_shift = self.compiled_formula(formula, cell)
+        return self.run(closure, sheet_name, col_shift, row_shift)
+
+    def run(self, closure, sheet_name, col_shift, row_shift):
+        try:
+            return closure(Environment(self.provider, sheet_name, col_shift, row_shift, self.lookups))
+        except ExcelError as error:
+            return error
+
+    def invalidate(self, sheet_name, cell):
+        """Tell the evaluator a cell's value changed, dropping the lookup indexes that read it."""
+        _, column, row = DependencyGraph.cell(sheet_name, cell)
+        self.lookups.invalidate(sheet_name, column, row)
+
+    def compiled_formula(self, formula, cell=None):
+        """(closure, col_shift, row_shift) for formula, compiling it if it isn't cached yet."""
+        if not isinstance(formula, str):
+            return Evaluator.compile(formula), 0, 0
+        entry, col_shift, row_shift = self.compiled_entry(formula, cell)
+        return entry[0], col_shift, row_shift
+
+    def compiled_entry(self, formula, cell=None):
+        if cell is None:
+            key, column, row = formula, 0, 0
+        else:
+            column, row = DependencyGraph.cell(None, cell)[1:]
+            key = TemplateCache.template_key(formula, column, row)
+        entry = self.compiled.get(key)
+        if entry is None:
+            # folded once here, for this closure and the vectorized one
+            tree = fold(binary_tree(Parser(formula).tree))
+            entry = [Evaluator.compile_node(tree), column, row, tree, None]
+            self.compiled.put(key, entry)
+        return entry, column - entry[1], row - entry[2]
+
+    def evaluate_fill_down(self, formula, sheet_name, first_cell, count, vectorize=True):
+        """
+        Values of formula, written for first_cell, filled down over count cells (first_cell included).
+        The whole column is evaluated as NumPy array operations where the formula allows it.
+        """
+        column, row = DependencyGraph.cell(None, first_cell)[1:]
+        return self.evaluate_cells(formula, sheet_name, (column, row), [column] * count,
+                                   list(range(row, row + count)), vectorize)
+
+    def evaluate_many(self, formulas, sheet_name=None, vectorize=True, min_group=16, keys=None):
+        """
+        Values of many (cell, formula) pairs on one sheet, in the same order.
+        Formulas are grouped by template, groups of at least min_group cells are
+        evaluated as NumPy array operations, the rest one cell at a time.
+        keys are the formulas' template keys when the caller already has them.
+        """
+        formulas = list(formulas)
+        results = [None] * len(formulas)
+        groups = {}
+        for index, (cell, formula) in enumerate(formulas):
+            column, row = DependencyGraph.cell(None, cell)[1:]
+            key = TemplateCache.template_key(formula, column, row) if keys is None else keys[index]
+            groups.setdefault(key, []).append((row, column, index, formula))
+        for group in groups.values():
+            group.sort()  # by row, so a filled down column reads each reference as one slice
+            row, column, _, formula = group[0]
+            values = self.evaluate_cells(formula, sheet_name, (column, row), [item[1] for item in group],
+                                         [item[0] for item in group], vectorize and len(group) >= min_group)
+            for (_, _, index, _), value in zip(group, values):
+                results[index] = value
+        return results
+
+    def evaluate_cells(self, formula, sheet_name, cell, columns, rows, vectorize=True):
+        """Values of formula, written for cell, copied into every (column, row) of columns and rows."""
+        entry, col_shift, row_shift = self.compiled_entry(formula, cell)
+        column, row = DependencyGraph.cell(None, cell)[1:]
+        col_shifts = [target - column + col_shift for target in columns]
+        row_shifts = [target - row + row_shift for target in rows]
+
+        values = None
+        if vectorize and entry[4] is not False:
+            from Models import vectorized  # loads numpy, only wanted on this path
+            try:
+                if entry[4] is None:
+                    entry[4] = vectorized.compile_formula(entry[3])
+                values = vectorized.evaluate(entry[4], self.provider, sheet_name, col_shifts, row_shifts)
+            except vectorized.NotVectorizable:
+                if entry[4] is None:
+                    entry[4] = False
+                values = None
+        if values is None:
+            values = [None] * len(rows)
+        # anything the arrays couldn't produce (errors, text, ...) is evaluated one cell at a time
+        for index, value in enumerate(values):
+            if value is None:
+                values[index] = self.run(entry[0], sheet_name, col_shifts[index], row_shifts[index])
+        return values
+
+    @staticmethod
+    def compile(tree):
+        """
+        Compile a node tree (or parsed dictionary) into a closure taking an Environment.
+        Constant parts are folded first (see Models.simplify), so they're worked out once.
+        """
+        if not isinstance(tree, Node):
+            tree = node_from_dict(tree)
+        return Evaluator.compile_node(fold(binary_tree(tree)))
+
+    @staticmethod
+    def compile_node(node):
+        if isinstance(node, ConstantNode):
+            value = node.value
+            return lambda environment: value
+        if isinstance(node, ReferenceNode):
+            return Evaluator.compile_reference(node)
+        if isinstance(node, RangeNode):
+            return Evaluator.compile_range(node)
+        if isinstance(node, FunctionNode):
+            return Evaluator.compile_function(node)
+        if isinstance(node, ExpressionNode):
+            # Excel's precedence comes from the binary tree, see Models.operator_tree
+            return Evaluator.compile_node(operation_tree(node.components))
+        if isinstance(node, BinaryNode):
+            return Evaluator.binary_closure(binary_operators[node.operator],
+                                            Evaluator.compile_node(node.left), Evaluator.compile_node(node.right))
+        if isinstance(node, UnaryNode):
+            operand = Evaluator.compile_node(node.operand)
+            if node.operator == '+':
+                return operand
+            return Evaluator.unary_closure(negate if node.operator == '-' else percent, operand)
+        raise ValueError(f"Can't evaluate {node!r}")
+
+    @staticmethod
+    def compile_reference(node):
+        sheet_name, column, row = node.sheet_name, node.column, node.row
+
+        def reference(environment):
+            moved_column = column + environment.col_shift
+            moved_row = row + environment.row_shift
+            if not 1 <= moved_column <= MAX_COLUMN or moved_row < 1:
+                raise ExcelError('#REF!')
+            value = environment.provider.get(sheet_name or environment.sheet_name, moved_column, moved_row)
+            if isinstance(value, ExcelError):
+                raise value  # so an error read from a cell reaches IFERROR like a computed one
+            return value
+
+        def area(environment):
+            moved_column = column + environment.col_shift
+            moved_row = row + environment.row_shift
+            if not 1 <= moved_column <= MAX_COLUMN or moved_row < 1:
+                raise ExcelError('#REF!')
+            return sheet_name or environment.sheet_name, moved_column, moved_row, moved_column, moved_row
+        # a reference is a one cell range to the functions that take ranges by their bounds
+        reference.area = area
+        return reference
+
+    @staticmethod
+    def compile_range(node):
+        sheet_name = node.sheet_name
+        min_col, max_col = sorted((node.start.column, node.end.column))
+        min_row, max_row = sorted((node.start.row, node.end.row))
+
+        def area(environment):
+            """(sheet_name, min_col, min_row, max_col, max_row) the range covers once moved."""
+            col_shift, row_shift = environment.col_shift, environment.row_shift
+            if min_col + col_shift < 1 or max_col + col_shift > MAX_COLUMN or min_row + row_shift < 1:
+                raise ExcelError('#REF!')
+            return (sheet_name or environment.sheet_name, min_col + col_shift, min_row + row_shift,
+                    max_col + col_shift, max_row + row_shift)
+
+        def cell_range(environment):
+            return CellRange(environment.provider.get_range(*area(environment)))
+        # lookup functions read the bounds instead of the whole range
+        cell_range.area = area
+        return cell_range
+
+    @staticmethod
+    def compile_function(node):
+        name = node.name.upper()
+        arguments = [Evaluator.compile_node(argument) for argument in node.arguments]
+        if name in lazy_functions:
+            function = lazy_functions[name]
+            if not Evaluator.takes(function, len(arguments) + 1):
+                # the wrong number of arguments, checked here since a lazy call can't tell its own TypeErrors apart
+                def wrong_arguments(environment):
+                    raise ExcelError('#VALUE!')
+                return wrong_arguments
+            return lambda environment: function(environment, *arguments)
+        function = functions.get(name)
+        if function is None:
+            def unknown(environment):
+                raise ExcelError('#NAME?')
+            return unknown
+        if name in range_functions:
+            arguments = [Evaluator.range_closure(closure.area) if isinstance(argument, ReferenceNode) else closure
+                         for argument, closure in zip(node.arguments, arguments)]
+
+        def call(environment):
+            try:
+                return function(*[argument(environment) for argument in arguments])
+            except TypeError:
+                # called with the wrong number of arguments
+                raise ExcelError('#VALUE!')
+        return call
+
+    @staticmethod
+    def range_closure(area):
+        return lambda environment: CellRange(environment.provider.get_range(*area(environment)))
+
+    @staticmethod
+    def takes(function, count):
+        """Whether function can be called with count positional arguments, True when there's no telling."""
+        try:
+            inspect.signature(function).bind(*range(count))
+        except TypeError:
+            return False
+        except ValueError:
+            pass  # no signature to check, some builtins
+        return True
+
+    @staticmethod
+    def binary_closure(operation, left, right):
+        return lambda environment: operation(left(environment), right(environment))
+
+    @staticmethod
+    def unary_closure(operation, operand):
+        return lambda environment: operation(operand(environment))
@@ -0,0 +1,430 @@
+"""
+Excel's values, coercion rules and built in functions, used by Models.evaluator.
+
+Errors like #DIV/0! are ExcelError exceptions: raising one unwinds the
+evaluation up to the nearest IFERROR, or to Evaluator.evaluate, which returns
+it as the formula's value.
+"""
+import math
+
+
+class ExcelError(Exception):
+    """An Excel error value such as #DIV/0!, equal to any other error with the same code."""
+    codes = ('#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A')
+
+    def __init__(self, code):
+        if code not in ExcelError.codes:
+            raise ValueError(f"Unknown Excel error {code!r}")
+        super().__init__(code)
+        self.code = code
+
+    def __eq__(self, other):
+        return isinstance(other, ExcelError) and other.code == self.code
+
+    def __hash__(self):
+        return hash(self.code)
+
+    def __str__(self):
+        return self.code
+
+    def __repr__(self):
+        return f"ExcelError({self.code!r})"
+
+
+class CellRange:
+    """
+    The values of a range argument, rows is a list of rows or a 2-D float array
+    (from a ColumnStore) holding only numbers, with nan for empty cells.
+    """
+    __slots__ = ('rows',)
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def is_array(self):
+        return hasattr(self.rows, 'dtype')
+
+    def cells(self):
+        if self.is_array():
+            for value in self.rows.ravel().tolist():
+                yield None if value != value else value
+            return
+        for row in self.rows:
+            yield from row
+
+    def numbers(self):
+        """The numbers of an array backed range as a flat array, empty cells left out."""
+        rows = self.rows
+        return rows[rows == rows]  # nan isn't equal to itself
+
+
+def to_number(value):
+    """Coerce a value the way Excel arithmetic does, raising #VALUE! for what can't be a number."""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (int, float)):
+        return value
+    if value is None:
+        return 0
+    if isinstance(value, ExcelError):
+        raise value
+    if isinstance(value, str):
+        try:
+            return float(value) if value.strip() else 0
+        except ValueError:
+            pass
+    raise ExcelError('#VALUE!')
+
+
+def to_text(value):
+    if isinstance(value, ExcelError):
+        raise value
+    if isinstance(value, CellRange):
+        raise ExcelError('#VALUE!')
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    if value is None:
+        return False
+    if isinstance(value, ExcelError):
+        raise value
+    if isinstance(value, str) and value.upper() in ('TRUE', 'FALSE'):
+        return value.upper() == 'TRUE'
+    raise ExcelError('#VALUE!')
+
+
+def compare(left, right):
+    """-1, 0 or 1 by Excel's ordering: numbers < text < booleans, text compared case insensitively."""
+    for value in (left, right):
+        if isinstance(value, ExcelError):
+            raise value
+        if isinstance(value, CellRange):
+            raise ExcelError('#VALUE!')
+    # an empty cell compares as the empty value of the other side's type
+    if left is None:
+        left = '' if isinstance(right, str) else False if isinstance(right, bool) else 0
+    if right is None:
+        right = '' if isinstance(left, str) else False if isinstance(left, bool) else 0
+    left_rank, right_rank = type_rank(left), type_rank(right)
+    if left_rank != right_rank:
+        return -1 if left_rank < right_rank else 1
+    if left_rank == 1:
+        left, right = left.lower(), right.lower()
+    return (left > right) - (left < right)
+
+
+def type_rank(value):
+    if isinstance(value, bool):
+        return 2
+    if isinstance(value, str):
+        return 1
+    return 0
+
+
+# Arithmetic operators, the operands have already been evaluated
+
+def add(left, right):
+    return to_number(left) + to_number(right)
+
+
+def subtract(left, right):
+    return to_number(left) - to_number(right)
+
+
+def multiply(left, right):
+    return to_number(left) * to_number(right)
+
+
+def divide(left, right):
+    divisor = to_number(right)
+    dividend = to_number(left)
+    if divisor == 0:
+        raise ExcelError('#DIV/0!')
+    return dividend / divisor
+
+
+def power(left, right):
+    base, exponent = to_number(left), to_number(right)
+    if base == 0 and exponent < 0:
+        raise ExcelError('#DIV/0!')
+    # in floats like Excel, ** on ints would work out 7^300000000 digit by digit
+    try:
+        result = math.pow(float(base), float(exponent))
+    except (OverflowError, ValueError):
+        # ValueError is a negative base with a fractional exponent
+        raise ExcelError('#NUM!')
+    if not math.isfinite(result):
+        raise ExcelError('#NUM!')
+    return result
+
+
+def concat(left, right):
+    return to_text(left) + to_text(right)
+
+
+def negate(value):
+    return -to_number(value)
+
+
+def percent(value):
+    return to_number(value) / 100
+
+
+binary_operators = {
+    '+': add, '-': subtract, '*': multiply, '/': divide, '^': power, '&': concat,
+    '=': lambda left, right: compare(left, right) == 0,
+    '<>': lambda left, right: compare(left, right) != 0,
+    '<': lambda left, right: compare(left, right) < 0,
+    '>': lambda left, right: compare(left, right) > 0,
+    '<=': lambda left, right: compare(left, right) <= 0,
+    '>=': lambda left, right: compare(left, right) >= 0,
+}
+
+# Functions, by the name formulas call them with. Lazy functions get the evaluation
+# environment and their arguments' closures, so IF only evaluates the branch it takes.
+functions = {}
+lazy_functions = {}
+# Names of the functions that always give the same value for the same arguments,
+# Models.simplify precomputes them when they're called with constants
+pure_functions = set()
+# Names of the functions that get a reference argument as a one cell CellRange, the
+# way Excel's aggregates skip an empty or text cell that =A1+1 would read as a number
+range_functions = set()
+
+
+def register(name, lazy=False, pure=False, ranges=False):
+    """Decorator adding a function under its Excel name."""
+    def decorator(function):
+        (lazy_functions if lazy else functions)[name.upper()] = function
+        for flag, names in ((pure, pure_functions), (ranges, range_functions)):
+            if flag:
+                names.add(name.upper())
+            else:
+                names.discard(name.upper())
+        return function
+    return decorator
+
+
+def numbers(arguments):
+    """
+    The numbers in a function's arguments, the way SUM and friends see them: in
+    ranges (references included) only actual numbers count, typed arguments are coerced.
+    """
+    for argument in arguments:
+        if isinstance(argument, CellRange) and argument.is_array():
+            yield from argument.numbers().tolist()
+        elif isinstance(argument, CellRange):
+            for value in argument.cells():
+                if isinstance(value, ExcelError):
+                    raise value
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    yield value
+        else:
+            yield to_number(argument)
+
+
+def split_arrays(arguments):
+    """
+    Split a function's arguments into the numbers of its array backed ranges, which the
+    aggregates below reduce at C speed, and everything else.
+    """
+    arrays, others = [], []
+    for argument in arguments:
+        if isinstance(argument, CellRange) and argument.is_array():
+            arrays.append(argument.numbers())
+        else:
+            others.append(argument)
+    return arrays, others
+
+
+@register('SUM', pure=True, ranges=True)
+def excel_sum(*arguments):
+    arrays, others = split_arrays(arguments)
+    return sum(numbers(others)) + sum(array.sum().item() for array in arrays)
+
+
+@register('PRODUCT', pure=True, ranges=True)
+def excel_product(*arguments):
+    arrays, others = split_arrays(arguments)
+    result = 1
+    for number in numbers(others):
+        result *= number
+    for array in arrays:
+        result *= array.prod().item()
+    return result
+
+
+@register('AVERAGE', pure=True, ranges=True)
+def excel_average(*arguments):
+    arrays, others = split_arrays(arguments)
+    values = list(numbers(others))
+    count = len(values) + sum(array.size for array in arrays)
+    if not count:
+        raise ExcelError('#DIV/0!')
+    return (sum(values) + sum(array.sum().item() for array in arrays)) / count
+
+
+@register('MIN', pure=True, ranges=True)
+def excel_min(*arguments):
+    arrays, others = split_arrays(arguments)
+    return min(list(numbers(others)) + [array.min().item() for array in arrays if array.size], default=0)
+
+
+@register('MAX', pure=True, ranges=True)
+def excel_max(*arguments):
+    arrays, others = split_arrays(arguments)
+    return max(list(numbers(others)) + [array.max().item() for array in arrays if array.size], default=0)
+
+
+@register('COUNT', pure=True, ranges=True)
+def excel_count(*arguments):
+    count = 0
+    for argument in arguments:
+        if isinstance(argument, CellRange) and argument.is_array():
+            count += argument.numbers().size
+        elif isinstance(argument, CellRange):
+            count += sum(1 for value in argument.cells()
+                         if isinstance(value, (int, float)) and not isinstance(value, bool))
+        else:
+            try:
+                to_number(argument)
+                count += 1
+            except ExcelError:
+                pass
+    return count
+
+
+@register('COUNTA', pure=True)
+def excel_counta(*arguments):
+    count = 0
+    for argument in arguments:
+        if isinstance(argument, CellRange) and argument.is_array():
+            count += argument.numbers().size
+        elif isinstance(argument, CellRange):
+            count += sum(1 for value in argument.cells() if value is not None)
+        elif argument is not None:
+            count += 1
+    return count
+
+
+@register('ABS', pure=True)
+def excel_abs(value):
+    return abs(to_number(value))
+
+
+@register('ROUND', pure=True)
+def excel_round(value, digits=0):
+    # Excel rounds halves away from zero, Python's round() goes to the even number
+    number, digits = to_number(value), int(to_number(digits))
+    factor = 10 ** digits
+    return math.copysign(math.floor(abs(number) * factor + 0.5) / factor, number)
+
+
+@register('INT', pure=True)
+def excel_int(value):
+    return math.floor(to_number(value))
+
+
+@register('MOD', pure=True)
+def excel_mod(value, divisor):
+    number, divisor = to_number(value), to_number(divisor)
+    if divisor == 0:
+        raise ExcelError('#DIV/0!')
+    return number % divisor
+
+
+@register('POWER', pure=True)
+def excel_power(value, exponent):
+    return power(value, exponent)
+
+
+@register('SQRT', pure=True)
+def excel_sqrt(value):
+    number = to_number(value)
+    if number < 0:
+        raise ExcelError('#NUM!')
+    return math.sqrt(number)
+
+
+@register('AND', pure=True)
+def excel_and(*arguments):
+    return all(list(logicals(arguments)))
+
+
+@register('OR', pure=True)
+def excel_or(*arguments):
+    return any(list(logicals(arguments)))
+
+
+def logicals(arguments):
+    for argument in arguments:
+        if isinstance(argument, CellRange):
+            for value in argument.cells():
+                if isinstance(value, ExcelError):
+                    raise value
+                if isinstance(value, (bool, int, float)):
+                    yield to_bool(value)
+        else:
+            yield to_bool(argument)
+
+
+@register('NOT', pure=True)
+def excel_not(value):
+    return not to_bool(value)
+
+
+@register('CONCATENATE', pure=True)
+def excel_concatenate(*arguments):
+    return ''.join(to_text(argument) for argument in arguments)
+
+
+@register('CONCAT', pure=True)
+def excel_concat(*arguments):
+    parts = []
+    for argument in arguments:
+        if isinstance(argument, CellRange):
+            parts.extend(to_text(value) for value in argument.cells())
+        else:
+            parts.append(to_text(argument))
+    return ''.join(parts)
+
+
+@register('LEN', pure=True)
+def excel_len(value):
+    return len(to_text(value))
+
+
+@register('UPPER', pure=True)
+def excel_upper(value):
+    return to_text(value).upper()
+
+
+@register('LOWER', pure=True)
+def excel_lower(value):
+    return to_text(value).lower()
+
+
+@register('IF', lazy=True)
+def excel_if(environment, condition, if_true=None, if_false=None):
+    if to_bool(condition(environment)):
+        return if_true(environment) if if_true is not None else True
+    return if_false(environment) if if_false is not None else False
+
+
+@register('IFERROR', lazy=True)
+def excel_iferror(environment, value, value_if_error):
+    try:
+        return value(environment)
+    except ExcelError:
+        return value_if_error(environment)
@@ -1,10 +1,12 @@
-import re 
 from Models.model_types import Types
+from Models.constant import Constant
+from Models.tokenizer import Tokenizer
 
 
 class Expression:
-    operators = ['+', '-', '*', '/', '>', '<', '>=', '<=', '=', '<>']
-    operator_pattern = '|'.join(re.escape(op) for op in operators)  # Create a regex pattern for splitting
+    operators = ['+', '-', '*', '/', '^', '&', '%', '>', '<', '>=', '<=', '=', '<>']
+    prefix_operators = ['+', '-']
+    postfix_operators = ['%']
 
     @staticmethod
     def from_dict(expr_dict):
@@ -15,15 +17,19 @@ class Expression:
                 if isinstance(component, dict):
                     # Recursively handle nested expressions
                     if 'expression' in component:
-                        nested_expr = reconstruct_expression(component['expression'])
+                        # plain Expression objects nest lists, parsed formulas nest full dictionaries
+                        nested = component['expression']
+                        if not isinstance(nested, list):
+                            nested = component['components']
+                        nested_expr = reconstruct_expression(nested)
                         parts.append(f"({nested_expr})")
                     elif 'operator' in component:
                         parts.append(component['operator'])
                     elif 'constant' in component:
-                        parts.append(str(component['constant']))
+                        parts.append(Constant.format_value(component['constant']))
                     else:
                         type_str = [item for item in component.keys() if item not in ['components']][0]
-                        obj_type = Types(type_str).get_type()
+                        obj_type = Types.lookup(type_str)
                         instance = obj_type.from_dict(component)
                         parts.append(str(instance))
                 else:
@@ -39,9 +45,13 @@ class Expression:
 
     def __init__(self, expression):
         self.original_expression = expression.strip()
-        if not self.is_valid_expression(self.original_expression):
+        try:
+            tokens = Tokenizer.tokenize(self.original_expression)
+            self.expression = self.build_components(self.original_expression, tokens)
+        except ValueError:
+            raise ValueError("Invalid expression format")
+        if not any(token.kind == Tokenizer.OPERATOR for token in tokens):
             raise ValueError("Invalid expression format")
-        self.expression = self.parse_expression(self.original_expression)
 
     @staticmethod
     def has_balanced_parentheses(expr):
@@ -58,76 +68,65 @@ class Expression:
         if not expr:
             return False  # Empty string is not a valid expression
 
-        # Basic check for the presence of an operator
-        if not any(op in expr for op in Expression.operators):
-            return False
-
-        # Check for balanced parentheses
-        if not Expression.has_balanced_parentheses(expr):
+        try:
+            tokens = Tokenizer.tokenize(expr)
+            Expression.build_components(expr, tokens)
+        except ValueError:
             return False
 
-        # Split expression by operators and check the parts
-        parts = re.split(Expression.operator_pattern, expr)
-        if any(not part.strip() for part in parts):  # Check if any part is empty or just whitespace
-            return False
+        # Basic check for the presence of an operator
+        return any(token.kind == Tokenizer.OPERATOR for token in tokens)
 
-        return True
+    @staticmethod
+    def build_components(text, tokens, first=0, last=None, pairs=None):
+        """
+        Walk tokens[first:last] once and return the flat list of operand and
+        operator strings, with parenthesised groups nested as {'expression': [...]}.
+        Raises ValueError if operands and operators don't alternate properly.
+        """
+        if last is None:
+            last = len(tokens)
+        if pairs is None:
+            pairs = Tokenizer.match_parentheses(tokens)
+
+        components = []
+        expect_operand = True
+        index = first
+        while index < last:
+            token = tokens[index]
+            if token.kind == Tokenizer.OPERATOR:
+                if expect_operand and token.value not in Expression.prefix_operators:
+                    raise ValueError(f"Unexpected operator {token.value!r} at position {token.start}")
+                if not expect_operand and token.value not in Expression.postfix_operators:
+                    expect_operand = True
+                components.append(token.value)
+                index += 1
+                continue
+
+            if not expect_operand or token.kind in (Tokenizer.RPAREN, Tokenizer.COMMA):
+                raise ValueError(f"Unexpected {token.value!r} at position {token.start}")
+
+            if token.kind == Tokenizer.LPAREN:
+                close = pairs[index]
+                components.append({'expression': Expression.build_components(text, tokens, index + 1, close, pairs)})
+                index = close + 1
+            elif token.kind == Tokenizer.NAME and index + 1 < last and tokens[index + 1].kind == Tokenizer.LPAREN:
+                # keep whole function calls as a single operand
+                close = pairs[index + 1]
+                components.append(text[token.start:tokens[close].end])
+                index = close + 1
+            else:
+                components.append(token.value)
+                index += 1
+            expect_operand = False
+
+        if expect_operand:
+            raise ValueError("Expression ends with an operator or is empty")
+        return components
 
     def parse_expression(self, expr):
-        # Function to handle recursive parsing
-        def parse_recursive(chars):
-            components = []
-            current = []
-            depth = 0
-
-            i = 0
-            while i < len(chars):
-                char = chars[i]
-
-                if char == '(':
-                    if depth == 0 and current:
-                        # Add current content before '(' as a new component if it's not just space
-                        component = ''.join(current).strip()
-                        if component:
-                            components.append(component)
-                        current = []
-                    depth += 1
-                elif char == ')':
-                    if depth == 1:
-                        # Closing the current nested expression
-                        if current:
-                            component = ''.join(current).strip()
-                            if component:
-                                components.append({'expression': parse_recursive(current)[0]})
-                        current = []
-                        depth -= 1
-                    else:
-                        current.append(char)
-                        depth -= 1
-                elif depth == 0 and char in Expression.operators:
-                    # Add operator and the current content as separate components
-                    if current:
-                        component = ''.join(current).strip()
-                        if component:
-                            components.append(component)
-                        current = []
-                    components.append(char)
-                elif char != ' ':
-                    # Add non-space characters to the current buffer
-                    current.append(char)
-
-                i += 1
-
-            # Add remaining characters after the last operator or parenthesis
-            if current:
-                component = ''.join(current).strip()
-                if component:
-                    components.append(component)
-
-            return components, i
-
-        parsed_expr, _ = parse_recursive(list(expr))
-        return parsed_expr
+        tokens = Tokenizer.tokenize(expr)
+        return self.build_components(expr, tokens)
 
     def __str__(self):
         def build_expression_string(components):
@@ -11,7 +11,11 @@ class Formula:
         if not isinstance(input_data, (str, dict)):
             raise ValueError("Invalid input data type")
         self.parser = Parser(input_data)
-        self.parsed_formula = self.parser.parse()
+
+    @property
+    def parsed_formula(self):
+        # the parser caches its tree, so this never parses the text a second time
+        return self.parser.parsed_formula
 
     def __dict__(self):
         return self.parsed_formula
@@ -21,7 +25,11 @@ class Formula:
     
     def translate(self, input_cell, output_cell):
         # Translate the formula from input_cell to output_cell
-        self.parsed_formula = self.parsed_formula.translate(input_cell, output_cell)
+        self.parser.translate(input_cell, output_cell)
+
+    def simplify(self):
+        # Fold constant parts of the formula, str(self) gives the smaller formula after
+        self.parser.simplify()
 
 
 if __name__ == "__main__":
@@ -1,8 +1,7 @@
-import re
 from Models.model_types import Types
+from Models.tokenizer import Tokenizer
 
 class Function:
-    pattern = r"^([a-zA-Z_]+)\((.*)\)$"  # Matches function name and its arguments
 
     # I copied this from the expression class because I'm too tired
     # to figure out how to avoid circular imports right now.
@@ -27,7 +26,7 @@ class Function:
             if isinstance(arg, dict):
                 type_str = [item for item in arg.keys() if item not in ['components']][0]
                 if type_str != 'function':
-                    obj_type = Types(type_str).get_type()
+                    obj_type = Types.lookup(type_str)
                     instance = obj_type.from_dict(arg)
                     arg_str = str(instance)
                     args.append(arg_str)
@@ -50,49 +49,96 @@ class Function:
         function_str = f"{name}({args_str})"
         return Function(function_str)
 
+    @staticmethod
+    def split_call(text, tokens, first=0, last=None):
+        """
+        Check that tokens[first:last] are exactly one call like NAME(...) and split it.
+
+        Returns the function name, the raw argument text and a list of
+        (argument_text, first_token, last_token) spans, or None if the tokens
+        are not a single function call.
+        """
+        if last is None:
+            last = len(tokens)
+        if (last - first < 3 or tokens[first].kind != Tokenizer.NAME
+                or tokens[first + 1].kind != Tokenizer.LPAREN
+                or tokens[last - 1].kind != Tokenizer.RPAREN):
+            return None
+
+        depth = 0
+        spans = []
+        arg_first = first + 2
+        for index in range(first + 1, last):
+            kind = tokens[index].kind
+            if kind == Tokenizer.LPAREN:
+                depth += 1
+            elif kind == Tokenizer.RPAREN:
+                depth -= 1
+                if depth == 0 and index != last - 1:
+                    return None  # the call closes early, e.g. SUM(A1) + SUM(B1)
+            elif kind == Tokenizer.COMMA and depth == 1:
+                spans.append(Function._argument_span(text, tokens, arg_first, index))
+                arg_first = index + 1
+        if depth != 0:
+            return None
+
+        if spans or arg_first < last - 1:
+            spans.append(Function._argument_span(text, tokens, arg_first, last - 1))
+        args_str = text[tokens[first + 1].end:tokens[last - 1].start].strip()
+        return tokens[first].value, args_str, spans
+
+    @staticmethod
+    def _argument_span(text, tokens, first, last):
+        if first >= last:
+            return '', first, last
+        return text[tokens[first].start:tokens[last - 1].end], first, last
+
     @staticmethod
     def is_function_string(function_string):
-        return bool(re.match(Function.pattern, function_string.strip() if isinstance(function_string, str) else ""))
+        if not isinstance(function_string, str):
+            return False
+        function_string = function_string.strip()
+        try:
+            tokens = Tokenizer.tokenize(function_string)
+        except ValueError:
+            return False
+        return Function.split_call(function_string, tokens) is not None
 
     def __init__(self, function_string):
         function_string = function_string.strip() if isinstance(function_string, str) else ""
-        if not Function.is_function_string(function_string):
+        try:
+            tokens = Tokenizer.tokenize(function_string)
+        except ValueError:
             raise ValueError("Invalid function format")
-        
-        if not Function.has_balanced_parentheses(function_string):
-            raise ValueError("Unbalanced parentheses in function")
 
-        self.name, self.args_str = re.match(Function.pattern, function_string).groups()
+        call = Function.split_call(function_string, tokens)
+        if call is None:
+            raise ValueError("Invalid function format")
+        self._load(function_string, tokens, call)
+
+    def _load(self, text, tokens, call):
+        # text and tokens are shared with nested calls so the string is only tokenized once
+        self.name, self.args_str, self._arg_spans = call
+        self._source = (text, tokens)
         self.args = []
         self.parse_arguments()
 
     def parse_arguments(self):
-        args, brackets, current_arg = [], 0, []
-        for char in self.args_str:
-            if char == '(':
-                brackets += 1
-            elif char == ')':
-                brackets -= 1
-
-            if char == ',' and brackets == 0:
-                args.append(''.join(current_arg).strip())
-                current_arg = []
-            else:
-                current_arg.append(char)
-        
-        if current_arg:
-            args.append(''.join(current_arg).strip())
-
-        if brackets != 0:
-            raise ValueError("Unbalanced parentheses in function arguments")
-
-        self.args = [self.parse_arg(arg) for arg in args]
+        text, tokens = self._source
+        args = []
+        for arg_text, first, last in self._arg_spans:
+            call = Function.split_call(text, tokens, first, last)
+            if call is None:
+                args.append(arg_text)  # Treat as plain string if not a function
+                continue
+            nested_function = Function.__new__(Function)
+            nested_function._load(text, tokens, call)
+            args.append(nested_function.to_dict())
+        self.args = args
 
     def parse_arg(self, arg):
         if Function.is_function_string(arg):
-            nested_function = Function(arg)
-            nested_function.parse_arguments()
-            return nested_function.to_dict()
+            return Function(arg).to_dict()
         return arg  # Treat as plain string if not a function
 
     def to_dict(self):
@@ -0,0 +1,278 @@
+"""
+VLOOKUP, HLOOKUP, MATCH and XLOOKUP, answered from cached indexes.
+
+Looking a value up by scanning its column makes a sheet of n lookups into an
+n row table quadratic. Here the first lookup into a column (or row) reads it once
+into a LookupIndex: a dictionary of first and last positions for exact matches,
+and the values sorted with their positions, built the first time an approximate
+match asks, for binary searches. Indexes are cached in the Evaluator's
+LookupIndexes by the bounds of the column or row they cover, so VLOOKUP and
+MATCH over the same column share one, and a filled down column of lookups
+builds it once. Changing a cell drops the indexes covering it (Evaluator.invalidate).
+
+Approximate matches find the answer a sorted table would give: Excel binary
+searches the raw values, so on an unsorted table it can return something else.
+Wildcards in text aren't supported.
+"""
+from bisect import bisect_left, bisect_right
+from Models.excel_functions import ExcelError, CellRange, register, to_number, to_bool
+from Models.range_index import RangeIndex
+
+
+def lookup_key(value):
+    """
+    The key a value is matched by: numbers, text and booleans never match each
+    other and text matches case insensitively. Empty cells have no key.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 2, value
+    if isinstance(value, (int, float)):
+        return 0, value
+    if isinstance(value, str):
+        return 1, value.lower()
+    return None
+
+
+class LookupIndex:
+    """Exact and approximate lookups into one column or row of values, positions counted from 0."""
+    __slots__ = ('keys', 'first', 'last', 'ordered')
+
+    def __init__(self, values):
+        self.keys = [lookup_key(value) for value in values]
+        self.first = None  # key -> first position holding it, built on the first exact lookup
+        self.last = None
+        self.ordered = {}  # type rank -> (sorted values, their positions), built per rank on demand
+
+    def exact(self, key, last=False):
+        """Position of the first (or last) value matching key, None if there isn't one."""
+        if self.first is None:
+            self.first, self.last = {}, {}
+            for position, value_key in enumerate(self.keys):
+                if value_key is not None:
+                    self.first.setdefault(value_key, position)
+                    self.last[value_key] = position
+        return (self.last if last else self.first).get(key)
+
+    def sorted_values(self, rank):
+        ordered = self.ordered.get(rank)
+        if ordered is None:
+            # sorted by value then position, so equal values sit in the order they're in the table
+            pairs = sorted((key[1], position) for position, key in enumerate(self.keys)
+                           if key is not None and key[0] == rank)
+            ordered = self.ordered[rank] = ([value for value, _ in pairs], [position for _, position in pairs])
+        return ordered
+
+    def at_most(self, key, last=True):
+        """Position of the largest value <= key of the same type, the last (or first) of equal ones."""
+        values, positions = self.sorted_values(key[0])
+        end = bisect_right(values, key[1])
+        if end == 0:
+            return None
+        if last:
+            return positions[end - 1]
+        return positions[bisect_left(values, values[end - 1])]
+
+    def at_least(self, key, last=False):
+        """Position of the smallest value >= key of the same type, the first (or last) of equal ones."""
+        values, positions = self.sorted_values(key[0])
+        start = bisect_left(values, key[1])
+        if start == len(values):
+            return None
+        if last:
+            return positions[bisect_right(values, values[start]) - 1]
+        return positions[start]
+
+
+class LookupIndexes:
+    """
+    The indexes an Evaluator has built over ranges, keyed by their kind (LookupIndex,
+    or CriteriaColumn for the conditional aggregates) and the (sheet_name, min_col,
+    min_row, max_col, max_row) bounds they cover. A RangeIndex per sheet finds the
+    indexes a changed cell belongs to.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.indexes = {}  # (kind, bounds) -> index, oldest first
+        self.areas = {}  # sheet name -> RangeIndex of the bounds indexed on it, valued by key
+
+    def get(self, bounds, read, kind=LookupIndex):
+        """The index of this kind for bounds, built as kind(read()) when it isn't cached."""
+        key = (kind, bounds)
+        index = self.indexes.get(key)
+        if index is None:
+            index = kind(read())
+            if len(self.indexes) >= self.maxsize:
+                self.discard(next(iter(self.indexes)))
+            self.indexes[key] = index
+            self.areas.setdefault(bounds[0], RangeIndex()).add(bounds[1:], key)
+        return index
+
+    def discard(self, key):
+        if self.indexes.pop(key, None) is not None:
+            bounds = key[1]
+            self.areas[bounds[0]].remove(bounds[1:], key)
+
+    def invalidate(self, sheet_name, column, row):
+        """Drop every index covering the cell."""
+        areas = self.areas.get(sheet_name)
+        if areas is not None and len(areas):
+            for key in areas.search((column, row)):
+                self.discard(key)
+
+    def clear(self):
+        self.indexes.clear()
+        self.areas.clear()
+
+    def __len__(self):
+        return len(self.indexes)
+
+
+class Table:
+    """
+    A lookup function's range argument. A plain range is read through the provider one
+    column, row or cell at a time, anything else (a computed range) is evaluated whole.
+    """
+    __slots__ = ('environment', 'bounds', 'rows', 'height', 'width')
+
+    def __init__(self, environment, closure):
+        self.environment = environment
+        area = getattr(closure, 'area', None)
+        self.bounds = area(environment) if area is not None else None
+        self.rows = None
+        if self.bounds is not None:
+            _, min_col, min_row, max_col, max_row = self.bounds
+            self.height, self.width = max_row - min_row + 1, max_col - min_col + 1
+            return
+        value = closure(environment)
+        if isinstance(value, CellRange):
+            self.rows = [list(row) for row in (value.rows.tolist() if value.is_array() else value.rows)]
+        else:
+            self.rows = [[value]]
+        self.height, self.width = len(self.rows), len(self.rows[0]) if self.rows else 0
+
+    def cell(self, column, row):
+        """The value at (column, row) counted from 0 from the table's top left."""
+        if self.bounds is None:
+            value = self.rows[row][column]
+            if value != value:
+                value = None  # nan, an empty cell of an array backed range
+        else:
+            sheet_name, min_col, min_row, _, _ = self.bounds
+            value = self.environment.provider.get(sheet_name, min_col + column, min_row + row)
+        if isinstance(value, ExcelError):
+            raise value
+        return value
+
+    def index(self, column=None, row=None):
+        """The LookupIndex for one column or one row of the table."""
+        if self.bounds is None:
+            if column is not None:
+                return LookupIndex([None if value != value else value for value in (r[column] for r in self.rows)])
+            return LookupIndex([None if value != value else value for value in self.rows[row]])
+        sheet_name, min_col, min_row, max_col, max_row = self.bounds
+        if column is not None:
+            bounds = (sheet_name, min_col + column, min_row, min_col + column, max_row)
+        else:
+            bounds = (sheet_name, min_col, min_row + row, max_col, min_row + row)
+        provider = self.environment.provider
+        lookups = self.environment.lookups
+        read = lambda: list(CellRange(provider.get_range(*bounds)).cells())
+        return lookups.get(bounds, read) if lookups is not None else LookupIndex(read())
+
+    def vector(self):
+        """The index of a one row or one column table, and whether it runs down (a column)."""
+        if self.width == 1:
+            return self.index(column=0), True
+        if self.height == 1:
+            return self.index(row=0), False
+        raise ExcelError('#N/A')
+
+
+def key_of(value):
+    if isinstance(value, ExcelError):
+        raise value
+    if isinstance(value, CellRange):
+        raise ExcelError('#VALUE!')
+    key = lookup_key(value)
+    if key is None:
+        raise ExcelError('#N/A')
+    return key
+
+
+def table_lookup(environment, lookup_value, table, index, range_lookup, down):
+    """VLOOKUP (down the first column, index picks the column) or HLOOKUP (along the first row)."""
+    key = key_of(lookup_value(environment))
+    table = Table(environment, table)
+    offset = int(to_number(index(environment))) - 1
+    if offset < 0:
+        raise ExcelError('#VALUE!')
+    if offset >= (table.width if down else table.height):
+        raise ExcelError('#REF!')
+    approximate = to_bool(range_lookup(environment)) if range_lookup is not None else True
+    vector = table.index(column=0) if down else table.index(row=0)
+    position = vector.at_most(key) if approximate else vector.exact(key)
+    if position is None:
+        raise ExcelError('#N/A')
+    return table.cell(offset, position) if down else table.cell(position, offset)
+
+
+@register('VLOOKUP', lazy=True)
+def excel_vlookup(environment, lookup_value, table, column_index, range_lookup=None):
+    return table_lookup(environment, lookup_value, table, column_index, range_lookup, down=True)
+
+
+@register('HLOOKUP', lazy=True)
+def excel_hlookup(environment, lookup_value, table, row_index, range_lookup=None):
+    return table_lookup(environment, lookup_value, table, row_index, range_lookup, down=False)
+
+
+@register('MATCH', lazy=True)
+def excel_match(environment, lookup_value, lookup_array, match_type=None):
+    key = key_of(lookup_value(environment))
+    match_type = to_number(match_type(environment)) if match_type is not None else 1
+    vector, _ = Table(environment, lookup_array).vector()
+    if match_type == 0:
+        position = vector.exact(key)
+    elif match_type > 0:
+        position = vector.at_most(key)  # ascending table
+    else:
+        position = vector.at_least(key, last=True)  # descending table
+    if position is None:
+        raise ExcelError('#N/A')
+    return position + 1
+
+
+@register('XLOOKUP', lazy=True)
+def excel_xlookup(environment, lookup_value, lookup_array, return_array, if_not_found=None,
+                  match_mode=None, search_mode=None):
+    key = key_of(lookup_value(environment))
+    match_mode = int(to_number(match_mode(environment))) if match_mode is not None else 0
+    search_mode = int(to_number(search_mode(environment))) if search_mode is not None else 1
+    if match_mode not in (-1, 0, 1) or search_mode not in (-2, -1, 1, 2):
+        raise ExcelError('#VALUE!')  # wildcard matching isn't supported
+    vector, down = Table(environment, lookup_array).vector()
+    returns = Table(environment, return_array)
+    if (returns.height if down else returns.width) != len(vector.keys):
+        raise ExcelError('#VALUE!')
+
+    # binary search modes (2 and -2) give the same answer on the sorted tables they're meant for
+    last = search_mode < 0
+    if match_mode == 0:
+        position = vector.exact(key, last)
+    elif match_mode == -1:
+        position = vector.at_most(key, last)
+    else:
+        position = vector.at_least(key, last)
+    if position is None:
+        if if_not_found is not None:
+            return if_not_found(environment)
+        raise ExcelError('#N/A')
+
+    if down:
+        values = [returns.cell(column, position) for column in range(returns.width)]
+        return values[0] if returns.width == 1 else CellRange([values])
+    values = [returns.cell(position, row) for row in range(returns.height)]
+    return values[0] if returns.height == 1 else CellRange([[value] for value in values])
@@ -2,23 +2,57 @@ from importlib import import_module
 
 
 class Types:
+    # kind -> model class (Reference, Function, ...) used by the from_dict methods
+    registry = {}
+    # kind -> custom node class, node_from_dict checks these after the built in nodes
+    node_registry = {}
+    _defaults_loaded = False
+    default_kinds = ['reference', 'range', 'function', 'expression', 'constant']
 
     def __init__(self, type_str='') -> None:
         self.type_str = type_str
         self.module_name = 'Models'  # Assuming all model classes are in the 'Models' package
 
+    @staticmethod
+    def register(kind, type_class):
+        """Map a kind (the key it uses in the parsed dictionaries) to its model class."""
+        Types.registry[kind.lower()] = type_class
+        return type_class
+
+    @staticmethod
+    def register_node(node_class):
+        """Register a node class under its kind, works as a class decorator too."""
+        Types.node_registry[node_class.kind] = node_class
+        return node_class
+
+    @staticmethod
+    def load_defaults():
+        """
+        Import the built in model classes once and register them.
+        This can't happen at import time because the models import this module.
+        """
+        for kind in Types.default_kinds:
+            module = import_module(f"Models.{kind}")
+            Types.registry.setdefault(kind, getattr(module, kind.capitalize()))
+        Types._defaults_loaded = True
+
+    @staticmethod
+    def lookup(kind):
+        """Return the model class for a kind, a dictionary lookup once the defaults are loaded."""
+        type_class = Types.registry.get(kind.lower())
+        if type_class is None and not Types._defaults_loaded:
+            Types.load_defaults()
+            type_class = Types.registry.get(kind.lower())
+        if type_class is None:
+            raise ImportError(f"Could not load type {kind}: no class is registered for it")
+        return type_class
+
     def get_type(self):
-        
+
         if not self.type_str:
             raise ValueError("Type string not provided")
 
-        try:
-            # Dynamically import the module and access the class
-            module = import_module(f".{self.type_str.lower()}", package=self.module_name)
-            type_class = getattr(module, self.type_str.capitalize())
-            return type_class
-        except (ImportError, AttributeError) as e:
-            raise ImportError(f"Could not load type {self.type_str}: {str(e)}")
+        return Types.lookup(self.type_str)
 
 
 if __name__ == "__main__":
@@ -27,4 +61,4 @@ if __name__ == "__main__":
     type_class = Types(type_str).get_type()
     type_instance = type_class('A1')
     print(type_instance)
-    print(type_class.is_valid_reference('A1'))
\ No newline at end of file
+    print(type_class.is_valid_reference('A1'))
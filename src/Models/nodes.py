@@ -0,0 +1,439 @@
+from collections import namedtuple
+from Models.columns import get_column_letter, COLUMN_NUMBERS, MAX_COLUMN
+from Models.constant import Constant
+from Models.reference import Reference
+from Models.model_types import Types
+
+
+class Span(namedtuple('Span', ['source', 'start', 'end', 'edited'])):
+    """
+    Where a node sits in the formula text it was parsed from. Edited spans
+    belong to nodes that were changed since (a translated reference, or a
+    function holding one), their text has to be regenerated.
+    """
+    __slots__ = ()
+
+    def text(self):
+        return self.source[self.start:self.end]
+
+    def moved(self):
+        return self if self.edited else self._replace(edited=True)
+
+
+def moved_span(span):
+    return None if span is None else span.moved()
+
+
+class Node:
+    """
+    Base class of the compact parse tree Parser builds.
+
+    Nodes only keep what they need in __slots__ (integer rows and columns
+    for references), the dictionary structure is generated by to_dict() when
+    someone asks for it. Nodes are treated as read only once built, so parsers
+    and caches can share them; translated() returns new nodes instead.
+
+    Nodes the parser builds also carry their Span, so source_text() can copy
+    untouched subtrees straight out of the original formula.
+    """
+    __slots__ = ()
+    kind = None
+    span = None
+
+    def to_dict(self):
+        raise NotImplementedError
+
+    def to_formula(self):
+        """Fully parenthesised text for a reconstructed formula, same rules as Parser.json_to_string."""
+        return str(self)
+
+    def source_text(self):
+        """
+        Formula text for this node: a slice of the original formula if it's untouched,
+        regenerated otherwise. Edited nodes only regenerate the parts that changed.
+        """
+        if self.span is not None and not self.span.edited:
+            return self.span.text()
+        return str(self)
+
+    def translated(self, col_shift, row_shift):
+        """Return this node with every reference in it moved by the shifts."""
+        return self
+
+    def shift(self, col_shift, row_shift):
+        """
+        Move every reference in this node in place. Only for trees nobody else
+        holds (one just built from a dictionary, say), shared trees use translated().
+        """
+
+    def formula_parts(self, parts, references=False):
+        """
+        Append the pieces of source_text() to parts. With references=True the
+        ReferenceNodes are appended as themselves instead of their text, so callers
+        can fill in moved coordinates, and untouched subtrees are split up to reach them.
+        """
+        parts.append(self.source_text())
+
+    @staticmethod
+    def splice(span, children, parts, references):
+        """
+        Append span's source text to parts with each child's text put in place of the
+        child's own span. Returns False if a child has no span in the same source.
+        """
+        if span is None or any(child.span is None or child.span.source is not span.source for child in children):
+            return False
+        position = span.start
+        for child in children:
+            parts.append(span.source[position:child.span.start])
+            child.formula_parts(parts, references)
+            position = child.span.end
+        parts.append(span.source[position:span.end])
+        return True
+
+    def composite_text(self):
+        # source_text() for the nodes with children
+        if self.span is not None and not self.span.edited:
+            return self.span.text()
+        parts = []
+        self.formula_parts(parts)
+        return ''.join(parts)
+
+    def untouched_parts(self, parts, references):
+        # a subtree nobody edited can be copied in one slice, unless the caller wants the references
+        if references or self.span is None or self.span.edited:
+            return False
+        parts.append(self.span.text())
+        return True
+
+    def __repr__(self):
+        return f"{type(self).__name__}({str(self)!r})"
+
+
+class ReferenceNode(Node):
+    __slots__ = ('sheet_name', 'column', 'row', 'span')
+    kind = 'reference'
+    pattern = Reference.compiled_pattern
+
+    def __init__(self, sheet_name, column, row, span=None):
+        if not 1 <= column <= MAX_COLUMN:
+            raise ValueError("Invalid column number")
+        if row < 1:
+            raise ValueError("Invalid row number")
+        self.sheet_name = sheet_name
+        self.column = column
+        self.row = row
+        self.span = span
+
+    @staticmethod
+    def from_string(reference, span=None):
+        match = ReferenceNode.pattern.match(reference)
+        if not match:
+            raise ValueError(f"Invalid cell reference: {reference}")
+        sheet_name, column_letter, row = match.groups()
+        column = COLUMN_NUMBERS.get(column_letter)
+        if column is None:
+            raise ValueError(f"Invalid cell reference: {reference}")
+        return ReferenceNode(sheet_name, column, int(row), span)
+
+    @staticmethod
+    def from_dict(data):
+        components = data['components']
+        return ReferenceNode(components.get('sheet_name'), components['column_number'], components['row_number'])
+
+    @staticmethod
+    def from_coordinates(column, row, sheet_name=None):
+        return ReferenceNode(sheet_name, column, row)
+
+    @property
+    def column_letter(self):
+        return get_column_letter(self.column)
+
+    def to_dict(self):
+        return {
+            "reference": str(self),
+            "components": {
+                "sheet_name": self.sheet_name,
+                "column_letter": self.column_letter,
+                "row_number": self.row,
+                "column_number": self.column
+            }
+        }
+
+    def translated(self, col_shift, row_shift):
+        if not col_shift and not row_shift:
+            return self
+        return ReferenceNode(self.sheet_name, self.column + col_shift, self.row + row_shift, moved_span(self.span))
+
+    def shift(self, col_shift, row_shift):
+        column = self.column + col_shift
+        row = self.row + row_shift
+        if not 1 <= column <= MAX_COLUMN:
+            raise ValueError("Invalid column number")
+        if row < 1:
+            raise ValueError("Invalid row number")
+        self.column = column
+        self.row = row
+        self.span = moved_span(self.span)
+
+    def formula_parts(self, parts, references=False):
+        parts.append(self if references else self.source_text())
+
+    def __str__(self):
+        if self.sheet_name:
+            return f"'{self.sheet_name}'!{self.column_letter}{self.row}"
+        return f"{self.column_letter}{self.row}"
+
+
+class RangeNode(Node):
+    __slots__ = ('start', 'end', 'span')
+    kind = 'range'
+
+    def __init__(self, start, end, span=None):
+        self.start = start
+        self.end = end
+        self.span = span
+
+    @staticmethod
+    def from_string(range_str, span=None):
+        start, separator, end = range_str.partition(':')
+        if not separator:
+            raise ValueError(f"Invalid range format: {range_str}")
+        if span is None:
+            return RangeNode(ReferenceNode.from_string(start), ReferenceNode.from_string(end))
+        # the corners get spans of their own so a moved range only regenerates them
+        middle = span.start + len(start)
+        return RangeNode(ReferenceNode.from_string(start, span._replace(end=middle)),
+                         ReferenceNode.from_string(end, span._replace(start=middle + 1)), span)
+
+    @staticmethod
+    def from_dict(data):
+        corners = []
+        for corner in (data['components']['start'], data['components']['end']):
+            # Range.to_dict stores the corners as strings, reference dicts are accepted too
+            if isinstance(corner, dict):
+                corners.append(ReferenceNode.from_dict(corner))
+            else:
+                corners.append(ReferenceNode.from_string(corner))
+        return RangeNode(*corners)
+
+    def to_dict(self):
+        return {
+            "range": str(self),
+            "components": {
+                "start": str(self.start),
+                "end": str(self.end)
+            }
+        }
+
+    @property
+    def sheet_name(self):
+        # a sheet qualified range like 'Data'!A1:B2 only names the sheet on its start corner
+        return self.start.sheet_name
+
+    def translated(self, col_shift, row_shift):
+        start = self.start.translated(col_shift, row_shift)
+        end = self.end.translated(col_shift, row_shift)
+        if start is self.start and end is self.end:
+            return self
+        return RangeNode(start, end, moved_span(self.span))
+
+    def shift(self, col_shift, row_shift):
+        self.start.shift(col_shift, row_shift)
+        self.end.shift(col_shift, row_shift)
+        self.span = moved_span(self.span)
+
+    def source_text(self):
+        return self.composite_text()
+
+    def formula_parts(self, parts, references=False):
+        if self.untouched_parts(parts, references) or Node.splice(self.span, (self.start, self.end), parts, references):
+            return
+        self.start.formula_parts(parts, references)
+        parts.append(':')
+        self.end.formula_parts(parts, references)
+
+    def __str__(self):
+        return f"{self.start}:{self.end}"
+
+
+class ConstantNode(Node):
+    __slots__ = ('value', 'span')
+    kind = 'constant'
+
+    def __init__(self, value, span=None):
+        self.value = value
+        self.span = span
+
+    @staticmethod
+    def from_dict(data):
+        return ConstantNode(data['constant'])
+
+    def to_dict(self):
+        return {"constant": self.value}
+
+    def __str__(self):
+        return Constant.format_value(self.value)
+
+
+class OperatorNode(Node):
+    __slots__ = ('operator', 'span')
+    kind = 'operator'
+
+    def __init__(self, operator, span=None):
+        self.operator = operator
+        self.span = span
+
+    @staticmethod
+    def from_dict(data):
+        return OperatorNode(data['operator'])
+
+    def to_dict(self):
+        return {"operator": self.operator}
+
+    def __str__(self):
+        return self.operator
+
+
+class FunctionNode(Node):
+    __slots__ = ('name', 'arguments', 'span')
+    kind = 'function'
+
+    def __init__(self, name, arguments, span=None):
+        self.name = name
+        self.arguments = arguments
+        self.span = span
+
+    @staticmethod
+    def from_dict(data):
+        components = data['components']
+        return FunctionNode(components['name'], [node_from_dict(arg) for arg in components['arguments']])
+
+    def to_dict(self):
+        return {
+            "function": str(self),
+            "components": {
+                "name": self.name,
+                "arguments": [arg.to_dict() for arg in self.arguments]
+            }
+        }
+
+    def to_formula(self):
+        return f"{self.name}({', '.join(arg.to_formula() for arg in self.arguments)})"
+
+    def translated(self, col_shift, row_shift):
+        arguments = [arg.translated(col_shift, row_shift) for arg in self.arguments]
+        # calls without any references in them are shared rather than copied
+        if all(new is old for new, old in zip(arguments, self.arguments)):
+            return self
+        return FunctionNode(self.name, arguments, moved_span(self.span))
+
+    def shift(self, col_shift, row_shift):
+        for arg in self.arguments:
+            arg.shift(col_shift, row_shift)
+        self.span = moved_span(self.span)
+
+    def source_text(self):
+        return self.composite_text()
+
+    def formula_parts(self, parts, references=False):
+        if self.untouched_parts(parts, references) or Node.splice(self.span, self.arguments, parts, references):
+            return
+        parts.append(f"{self.name}(")
+        for index, arg in enumerate(self.arguments):
+            if index:
+                parts.append(', ')
+            arg.formula_parts(parts, references)
+        parts.append(')')
+
+    def __str__(self):
+        return f"{self.name}({', '.join(str(arg) for arg in self.arguments)})"
+
+
+class ExpressionNode(Node):
+    """Flat run of operands and OperatorNodes, nested ExpressionNodes are parenthesised groups."""
+    __slots__ = ('components', 'span')
+    kind = 'expression'
+
+    def __init__(self, components, span=None):
+        self.components = components
+        # a parenthesised group's span includes its parenthesis
+        self.span = span
+
+    @staticmethod
+    def from_dict(data):
+        return ExpressionNode([node_from_dict(component) for component in data['components']])
+
+    def to_dict(self):
+        return {
+            "expression": str(self),
+            "components": [component.to_dict() for component in self.components]
+        }
+
+    def to_formula(self):
+        # The parenthesis keep the order of operations exact, see Parser.json_to_string
+        return f"({' '.join(component.to_formula() for component in self.components)})"
+
+    def translated(self, col_shift, row_shift):
+        components = [component.translated(col_shift, row_shift) for component in self.components]
+        if all(new is old for new, old in zip(components, self.components)):
+            return self
+        return ExpressionNode(components, moved_span(self.span))
+
+    def shift(self, col_shift, row_shift):
+        for component in self.components:
+            component.shift(col_shift, row_shift)
+        self.span = moved_span(self.span)
+
+    def source_text(self):
+        return self.composite_text()
+
+    def gaps(self):
+        """
+        The text to put before each component: a space around binary operators, nothing
+        after a prefix operator or before a %, so -A1 and A1% stay as they're written.
+        """
+        gaps = []
+        expect_operand = True
+        after_prefix = False
+        for component in self.components:
+            postfix = isinstance(component, OperatorNode) and component.operator == '%'
+            gaps.append('' if not gaps or after_prefix or postfix else ' ')
+            after_prefix = isinstance(component, OperatorNode) and expect_operand
+            if isinstance(component, OperatorNode):
+                expect_operand = expect_operand or not postfix
+            else:
+                expect_operand = False
+        return gaps
+
+    def formula_parts(self, parts, references=False):
+        if self.untouched_parts(parts, references) or Node.splice(self.span, self.components, parts, references):
+            return
+        for gap, component in zip(self.gaps(), self.components):
+            if gap:
+                parts.append(gap)
+            # groups without a span don't have their parenthesis in any source text
+            if isinstance(component, ExpressionNode) and component.span is None:
+                parts.append('(')
+                component.formula_parts(parts, references)
+                parts.append(')')
+            else:
+                component.formula_parts(parts, references)
+
+    def __str__(self):
+        return ''.join(gap + (f"({component})" if isinstance(component, ExpressionNode) else str(component))
+                       for gap, component in zip(self.gaps(), self.components))
+
+
+# The built in node kinds, custom ones are registered with Types.register_node
+node_classes = {node_class.kind: node_class for node_class in
+                (FunctionNode, ExpressionNode, RangeNode, ReferenceNode, ConstantNode, OperatorNode)}
+
+
+def node_from_dict(data):
+    """Build the node tree for a parsed formula dictionary."""
+    if isinstance(data, dict):
+        for key in data:
+            node_class = node_classes.get(key) or Types.node_registry.get(key)
+            if node_class is not None:
+                return node_class.from_dict(data)
+    raise ValueError(f"Can't build a node from {data!r}")
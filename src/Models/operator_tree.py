@@ -0,0 +1,185 @@
+"""
+Binary operator trees for the flat expressions the parser builds.
+
+An ExpressionNode keeps its operands and operators as a flat list, the way the
+formula was written, which is what to_dict, translation and source text need.
+Evaluating or compiling needs the structure Excel's precedence gives them, so
+binary_tree() turns a node tree into one where every operator is a BinaryNode
+or UnaryNode with its operands as children, in one precedence climbing pass
+over each expression's components. Parenthesised groups disappear into the
+shape of the tree.
+
+Binary trees flatten back into ExpressionNodes (to_dict goes through that), so
+their dictionaries have the parser's shape, with only the parenthesis the
+precedence needs: =(A1+B1)+C1 comes back as A1 + B1 + C1.
+"""
+from Models.nodes import Node, ExpressionNode, FunctionNode, OperatorNode, moved_span
+
+# Excel's precedence, higher binds tighter. Every binary operator is left associative, ^ included.
+# Prefix + and - bind tighter than all of them (-2^2 is 4), postfix % tighter still (-2% is -(2%)).
+precedence = {'^': 4, '*': 3, '/': 3, '+': 2, '-': 2, '&': 1,
+              '=': 0, '<>': 0, '<': 0, '>': 0, '<=': 0, '>=': 0}
+PREFIX_PRECEDENCE = 5
+POSTFIX_PRECEDENCE = 6
+
+
+class BinaryNode(Node):
+    """left operator right, for every operator in precedence."""
+    __slots__ = ('operator', 'left', 'right')
+    kind = 'binary'
+
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    def flattened(self):
+        """The flat ExpressionNode the parser would have built for this operation."""
+        return ExpressionNode(flat_components(self))
+
+    def to_dict(self):
+        return self.flattened().to_dict()
+
+    def to_formula(self):
+        return f"({self.left.to_formula()} {self.operator} {self.right.to_formula()})"
+
+    def translated(self, col_shift, row_shift):
+        left, right = self.left.translated(col_shift, row_shift), self.right.translated(col_shift, row_shift)
+        if left is self.left and right is self.right:
+            return self
+        return BinaryNode(self.operator, left, right)
+
+    def shift(self, col_shift, row_shift):
+        self.left.shift(col_shift, row_shift)
+        self.right.shift(col_shift, row_shift)
+
+    def __str__(self):
+        return self.to_formula()
+
+
+class UnaryNode(Node):
+    """A prefix + or -, or a postfix %, applied to operand."""
+    __slots__ = ('operator', 'operand')
+    kind = 'unary'
+
+    def __init__(self, operator, operand):
+        self.operator = operator
+        self.operand = operand
+
+    @property
+    def postfix(self):
+        return self.operator == '%'
+
+    def flattened(self):
+        return ExpressionNode(flat_components(self))
+
+    def to_dict(self):
+        return self.flattened().to_dict()
+
+    def to_formula(self):
+        if self.postfix:
+            return f"({self.operand.to_formula()}%)"
+        return f"({self.operator}{self.operand.to_formula()})"
+
+    def translated(self, col_shift, row_shift):
+        operand = self.operand.translated(col_shift, row_shift)
+        return self if operand is self.operand else UnaryNode(self.operator, operand)
+
+    def shift(self, col_shift, row_shift):
+        self.operand.shift(col_shift, row_shift)
+
+    def __str__(self):
+        return self.to_formula()
+
+
+def binding(node):
+    """How tightly a node holds together, operands that aren't operations can't be pulled apart."""
+    if isinstance(node, BinaryNode):
+        return precedence[node.operator]
+    if isinstance(node, UnaryNode):
+        return POSTFIX_PRECEDENCE if node.postfix else PREFIX_PRECEDENCE
+    return POSTFIX_PRECEDENCE + 1
+
+
+def flat_components(node):
+    """The flat components of an operation, operands that would bind the wrong way are wrapped in groups."""
+    if isinstance(node, UnaryNode):
+        operand = operand_components(node.operand, binding(node))
+        if node.postfix:
+            return operand + [OperatorNode('%')]
+        return [OperatorNode(node.operator)] + operand
+    level = precedence[node.operator]
+    # left associative: a right operand at the same level needs its parenthesis, a left one doesn't
+    return (operand_components(node.left, level) + [OperatorNode(node.operator)]
+            + operand_components(node.right, level + 1))
+
+
+def operand_components(node, level):
+    if isinstance(node, (BinaryNode, UnaryNode)):
+        if binding(node) < level:
+            return [ExpressionNode(flat_components(node))]
+        return flat_components(node)
+    if isinstance(node, FunctionNode):
+        return [FunctionNode(node.name, [flattened(argument) for argument in node.arguments], node.span)]
+    return [node]
+
+
+def flattened(node):
+    """The parser's flat form of a node tree that may hold BinaryNodes and UnaryNodes."""
+    if isinstance(node, (BinaryNode, UnaryNode)):
+        return node.flattened()
+    return operand_components(node, 0)[0]
+
+
+def binary_tree(node):
+    """
+    The tree with every ExpressionNode in it replaced by its BinaryNode and UnaryNode
+    structure. Nodes without expressions under them are shared with the input.
+    """
+    if isinstance(node, ExpressionNode):
+        return operation_tree(node.components)
+    if isinstance(node, FunctionNode):
+        arguments = [binary_tree(argument) for argument in node.arguments]
+        if all(new is old for new, old in zip(arguments, node.arguments)):
+            return node
+        return FunctionNode(node.name, arguments, moved_span(node.span))
+    return node
+
+
+def operation_tree(components):
+    """Precedence climbing over an ExpressionNode's components."""
+    node, position = parse_operation(components, 0, 0)
+    if position != len(components):
+        raise ValueError(f"Can't build an operation from {' '.join(str(component) for component in components)}")
+    return node
+
+
+def parse_operation(components, position, min_precedence):
+    """Parse an operation whose operators bind at least min_precedence, returns it and the position after it."""
+    left, position = parse_unary(components, position)
+    while position < len(components):
+        operator = components[position]
+        if not isinstance(operator, OperatorNode) or precedence[operator.operator] < min_precedence:
+            break
+        right, position = parse_operation(components, position + 1, precedence[operator.operator] + 1)
+        left = BinaryNode(operator.operator, left, right)
+    return left, position
+
+
+def parse_unary(components, position):
+    if position >= len(components):
+        raise ValueError("Expression ends with an operator.")
+    component = components[position]
+    if isinstance(component, OperatorNode):
+        if component.operator not in ('+', '-'):
+            raise ValueError(f"Unexpected operator {component.operator!r} in expression.")
+        operand, position = parse_unary(components, position + 1)
+        node = UnaryNode(component.operator, operand)
+    else:
+        node = binary_tree(component)
+        position += 1
+    while (position < len(components) and isinstance(components[position], OperatorNode)
+           and components[position].operator == '%'):
+        node = UnaryNode('%', node)
+        position += 1
+    return node, position
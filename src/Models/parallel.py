@@ -0,0 +1,72 @@
+import json
+import os
+from collections import deque, namedtuple
+from itertools import islice
+from Models.parser import Parser
+
+
+# Put in the results in place of a parsed formula that couldn't be parsed
+ParseFailure = namedtuple('ParseFailure', ['formula', 'error'])
+
+
+def parse_chunk(formulas):
+    """
+    Parse a list of formulas in a worker process.
+    The whole chunk goes back as one JSON string, much cheaper to send between
+    processes than pickling every nested dictionary on its own.
+    """
+    results = []
+    for formula in formulas:
+        try:
+            results.append([True, Parser(formula).to_dict()])
+        except Exception as error:
+            results.append([False, str(error)])
+    return json.dumps(results)
+
+
+def iter_parse_many(formulas, workers=None, chunksize=256):
+    """
+    Parse formula strings, yielding each one's dictionary structure in input order.
+    Formulas that fail to parse yield a ParseFailure instead of raising.
+
+    workers is the number of processes (None for one per CPU), with workers=1
+    everything is parsed in this process. Only a couple of chunks per worker are
+    in flight at once, so formulas can come from a generator of any length.
+    """
+    if chunksize < 1:
+        raise ValueError("chunksize must be at least 1")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+
+    if workers == 1:
+        for formula in formulas:
+            try:
+                yield Parser(formula).to_dict()
+            except Exception as error:
+                yield ParseFailure(formula, str(error))
+        return
+
+    # multiprocessing is slow to import, only pay for it when a pool is wanted
+    from concurrent.futures import ProcessPoolExecutor
+
+    formulas = iter(formulas)
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        while True:
+            while len(pending) < workers * 2:
+                chunk = list(islice(formulas, chunksize))
+                if not chunk:
+                    break
+                pending.append((chunk, pool.submit(parse_chunk, chunk)))
+            if not pending:
+                return
+            chunk, future = pending.popleft()
+            for formula, (parsed, result) in zip(chunk, json.loads(future.result())):
+                yield result if parsed else ParseFailure(formula, result)
+
+
+def parse_many(formulas, workers=None, chunksize=256):
+    """Parse every formula in formulas and return the results as a list, see iter_parse_many."""
+    return list(iter_parse_many(formulas, workers, chunksize))
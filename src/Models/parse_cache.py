@@ -0,0 +1,126 @@
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+
+CacheStats = namedtuple('CacheStats', ['hits', 'misses', 'evictions', 'currsize', 'maxsize', 'memory_bytes'])
+
+
+class ParseCache:
+    """
+    Bounded LRU cache of parse trees keyed by formula text.
+
+    Trees handed out by the cache are shared between every Parser that asked
+    for the same text, so they must be treated as read only. Parser never
+    edits nodes in place, translating builds new ones.
+    """
+
+    def __init__(self, maxsize=4096, enabled=True):
+        if maxsize < 0:
+            raise ValueError("maxsize can't be negative")
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, formula_text):
+        """Return the cached tree for this text or None, counting the hit or miss."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            tree = self._entries.get(formula_text)
+            if tree is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(formula_text)
+            self.hits += 1
+            return tree
+
+    def put(self, formula_text, tree):
+        """Store a tree, evicting the least recently used ones past maxsize."""
+        if not self.enabled or self.maxsize == 0:
+            return
+        with self._lock:
+            self._entries[formula_text] = tree
+            self._entries.move_to_end(formula_text)
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        """Change the capacity at runtime, shrinking evicts the oldest entries right away."""
+        if maxsize < 0:
+            raise ValueError("maxsize can't be negative")
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        """Stop caching and drop what's stored, Parser then parses every formula itself."""
+        self.enabled = False
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, formula_text):
+        return formula_text in self._entries
+
+    def stats(self):
+        """
+        Return the hit/miss/eviction counters along with the current size.
+        memory_bytes is an estimate (sys.getsizeof over every key and tree), it walks
+        all the entries so it's worth calling occasionally rather than per formula.
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+        memory_bytes = sys.getsizeof(self._entries)
+        for formula_text, tree in entries:
+            memory_bytes += sys.getsizeof(formula_text) + ParseCache.estimate_size(tree)
+        return CacheStats(hits, misses, evictions, len(entries), self.maxsize, memory_bytes)
+
+    @staticmethod
+    def estimate_size(tree):
+        """Roughly how many bytes a parse tree takes up, counting shared objects once."""
+        seen = set()
+        size = 0
+        stack = [tree]
+        while stack:
+            item = stack.pop()
+            if id(item) in seen:
+                continue
+            seen.add(id(item))
+            size += sys.getsizeof(item)
+            if isinstance(item, dict):
+                stack.extend(item.keys())
+                stack.extend(item.values())
+            elif isinstance(item, (list, tuple)):
+                stack.extend(item)
+            else:
+                # parse tree nodes keep their fields in __slots__
+                for klass in type(item).__mro__:
+                    for slot in getattr(klass, '__slots__', ()):
+                        stack.append(getattr(item, slot, None))
+        return size
+
+
+# The process wide cache Parser uses by default
+parse_cache = ParseCache()
@@ -1,87 +1,251 @@
 import json
 from Models.reference import Reference
-from Models.function import Function
-from Models.range import Range
+from Models.columns import COLUMN_LETTERS, MAX_COLUMN
 from Models.expression import Expression
 from Models.constant import Constant
+from Models.tokenizer import Tokenizer
+from Models.parse_cache import parse_cache
+from Models.nodes import (ReferenceNode, RangeNode, ConstantNode, OperatorNode,
+                          FunctionNode, ExpressionNode, Span, node_from_dict)
+from Models.operator_tree import binary_tree
+from Models.simplify import simplify
 
 
 class Parser:
+    # Shared by every Parser in the process, swap or disable it through Parser.cache
+    cache = parse_cache
 
-    def __init__(self, formula_str):
+    def __init__(self, formula_str, tree=None):
+        """
+        Parse formula_str, or use tree (a node tree or a parsed dictionary) if
+        the caller already has the parse of this text.
+        """
         if not formula_str.startswith('='):
             raise ValueError("Formula must start with an '=' sign.")
-        if not Expression.has_balanced_parentheses(formula_str):
-            raise ValueError("Unbalanced parentheses in formula.")
         self.formula = formula_str[1:]  # Skip the '=' sign for internal parsing
         self.full_formula = formula_str
-        self.parsed_formula = self.parse()
+        self._tree = node_from_dict(tree) if isinstance(tree, dict) else tree
+        self._parsed_formula = None
+        self._reconstructed_formula = None
+        self.tree  # parse eagerly so invalid formulas fail here
+
+    @property
+    def tree(self):
+        """
+        The node tree, parsed from the formula text the first time it's needed.
+        Nodes are shared with other parsers through the cache, so they're never
+        edited in place, translate() swaps in a new tree instead.
+        """
+        if self._tree is None:
+            tree = Parser.cache.get(self.formula)
+            if tree is None:
+                tree = self.parse_tree(self.formula)
+                Parser.cache.put(self.formula, tree)
+            self._tree = tree
+        return self._tree
+
+    @tree.setter
+    def tree(self, value):
+        self._tree = value
+        self._parsed_formula = None
+        self._reconstructed_formula = None
+
+    @property
+    def parsed_formula(self):
+        """
+        The dictionary structure of the formula, generated from the tree on first use.
+        It belongs to this parser, so it can be edited in place (call invalidate() after).
+        """
+        if self._parsed_formula is None:
+            self._parsed_formula = self.tree.to_dict()
+        return self._parsed_formula
+
+    @parsed_formula.setter
+    def parsed_formula(self, value):
+        self.tree = node_from_dict(value)
+        self._parsed_formula = value
+
+    def detach(self):
+        """Return the dictionary structure to edit in place, it's never shared with other parsers."""
+        return self.parsed_formula
+
+    def invalidate(self):
+        """
+        Rebuild the tree from parsed_formula and drop the cached strings.
+        Call this after editing parsed_formula in place so str() picks up the change.
+        """
+        if self._parsed_formula is not None:
+            self._tree = node_from_dict(self._parsed_formula)
+        self._reconstructed_formula = None
+
+    def reparse(self):
+        """Throw away the current tree (and any edits to it) and get the tree for the formula text again."""
+        self.tree = None
+        return self.parsed_formula
 
     @property
     def reconstructed_formula(self):
-        parsed_formula = self.parse()
-        return f"={Parser.json_to_string(parsed_formula)}"
+        if self._reconstructed_formula is None:
+            # untouched parts of the tree are copied from the formula text as written
+            self._reconstructed_formula = f"={self.tree.source_text()}"
+        return self._reconstructed_formula
+
+    @property
+    def binary_tree(self):
+        """
+        The parse tree with its operators nested by Excel's precedence, as BinaryNode
+        and UnaryNode operations (see Models.operator_tree).
+        """
+        return binary_tree(self.tree)
+
+    def simplify(self):
+        """
+        Fold the constants in the formula and drop redundant parenthesis and identities,
+        =A1 * (60 * 60 * 24) becomes =A1*86400 (see Models.simplify). Like translate(), it
+        swaps in a new tree.
+        """
+        self.tree = simplify(self.tree)
 
     def parse(self):
-        return self.parse_expression(self.formula)
+        """Return the parse tree, only parsing the text if it hasn't been parsed yet."""
+        return self.parsed_formula
 
     def parse_expression(self, expr):
+        """Parse a formula body (without the leading '=') into its dictionary structure."""
         if isinstance(expr, dict):
-            # Handle nested parsed expressions
-            if 'function' in expr:
-                # Re-parse each argument
-                expr['components']['arguments'] = [self.parse_expression(arg) for arg in expr['components']['arguments']]
-            elif 'expression' in expr:
-                # Single expression re-parse
-                expr = self.parse_expression(expr['components'])
-            return expr
-        elif isinstance(expr, str):
-            expr = expr.strip()
-
-            # Delegate function parsing to ExcelFunction if it matches the function pattern
-            if Function.is_function_string(expr):
-                func = Function(expr)
-                func.parse_arguments()  # Ensure arguments are parsed within ExcelFunction
-                return {
-                    "function": str(func), 
-                    "components": {
-                        "name": func.name,
-                        "arguments": [self.parse_expression(arg) for arg in func.args]
-                }}
-
-            # Parse ranges and references using the respective classes
-            elif Range.is_valid_range(expr):
-                range_obj = Range(expr)
-                return range_obj.to_dict()
-
-            elif Reference.is_valid_reference(expr):
-                ref = Reference(expr)
-                return ref.to_dict()
-
-            # Constants can be parsed directly if they're valid
-            elif Constant.is_valid_constant(expr):
-                const = Constant(expr)
-                return const.to_dict()
-
-            # Catch-all for handling expressions that are not recognized as complete functions
-            # or other specific types above.
-            elif Expression.is_valid_expression(expr):
-                expression_obj = Expression(expr)
-                return {
-                    "expression": str(expression_obj),
-                    "components": [self.parse_expression(part) for part in expression_obj.expression]
-                }
+            return expr  # already parsed
+        return self.parse_tree(expr).to_dict()
+
+    def parse_tree(self, expr):
+        """
+        Parse a formula body (without the leading '=') into a node tree.
+
+        The text is tokenized once and then walked by a small recursive descent
+        parser, so every character is only looked at a constant number of times
+        no matter how deeply the functions and expressions are nested. Every node
+        records its Span in expr.
+        """
+        tokens = Tokenizer.tokenize(expr)
+        if not tokens:
+            raise ValueError("Formula is empty.")
+        node, position = self._parse_sequence(expr, tokens, 0)
+        if position < len(tokens):
+            token = tokens[position]
+            if token.kind == Tokenizer.RPAREN:
+                raise ValueError("Unbalanced parentheses in formula.")
+            raise ValueError(f"Unexpected {token.value!r} at position {token.start} in formula.")
+        return node
+
+    def _parse_sequence(self, expr, tokens, position):
+        """
+        Parse operands and operators up to the next ',' or ')' at this nesting level.
+
+        Returns the node and the position of the first token that wasn't consumed.
+        A lone operand is returned as-is, anything with operators in it becomes an
+        ExpressionNode.
+        """
+        components = []
+        expect_operand = True
+        while position < len(tokens):
+            token = tokens[position]
+            if token.kind == Tokenizer.COMMA or token.kind == Tokenizer.RPAREN:
+                break
 
-            elif any(op in expr for op in Expression.operators) and len(expr) == 1:
-                return {"operator": expr}
+            if token.kind == Tokenizer.OPERATOR:
+                if expect_operand and token.value not in Expression.prefix_operators:
+                    raise ValueError(f"Unexpected operator {token.value!r} at position {token.start} in formula.")
+                if not expect_operand and token.value not in Expression.postfix_operators:
+                    expect_operand = True
+                components.append(OperatorNode(token.value, Span(expr, token.start, token.end, False)))
+                position += 1
+                continue
+
+            if not expect_operand:
+                raise ValueError(f"Missing operator before {token.value!r} at position {token.start} in formula.")
+            node, position = self._parse_operand(expr, tokens, position)
+            components.append(node)
+            expect_operand = False
+
+        if expect_operand:
+            if components:
+                raise ValueError("Formula ends with an operator.")
+            raise ValueError("Missing value in formula.")
+        if len(components) == 1:
+            return components[0], position
+        return ExpressionNode(components, Span(expr, components[0].span.start, components[-1].span.end, False)), position
+
+    def _parse_operand(self, expr, tokens, position):
+        token = tokens[position]
+        kind = token.kind
+        span = Span(expr, token.start, token.end, False)
+
+        if kind == Tokenizer.REFERENCE:
+            return ReferenceNode.from_string(token.value, span), position + 1
+
+        if kind == Tokenizer.RANGE:
+            return RangeNode.from_string(token.value, span), position + 1
+
+        if kind == Tokenizer.NUMBER or kind == Tokenizer.STRING or kind == Tokenizer.BOOLEAN:
+            return ConstantNode(Constant.parse_constant(token.value), span), position + 1
+
+        if kind == Tokenizer.LPAREN:
+            node, position = self._parse_sequence(expr, tokens, position + 1)
+            if position >= len(tokens) or tokens[position].kind != Tokenizer.RPAREN:
+                raise ValueError("Unbalanced parentheses in formula.")
+            # the group's span takes in its parenthesis, the node is brand new so it can be set here
+            span = Span(expr, token.start, tokens[position].end, False)
+            if isinstance(node, ExpressionNode):
+                node.span = span
+            else:
+                node = ExpressionNode([node], span)
+            return node, position + 1
+
+        if kind == Tokenizer.NAME and position + 1 < len(tokens) and tokens[position + 1].kind == Tokenizer.LPAREN:
+            return self._parse_function(expr, tokens, position)
+
+        raise ValueError(f"Unexpected {token.value!r} at position {token.start} in formula.")
+
+    def _parse_function(self, expr, tokens, position):
+        start = tokens[position].start
+        name = tokens[position].value
+        position += 2  # skip the name and the opening parenthesis
+        arguments = []
+
+        if position < len(tokens) and tokens[position].kind == Tokenizer.RPAREN:
+            position += 1  # no arguments, e.g. NOW()
+        else:
+            while True:
+                if position >= len(tokens):
+                    raise ValueError("Unbalanced parentheses in formula.")
+                if tokens[position].kind in (Tokenizer.COMMA, Tokenizer.RPAREN):
+                    raise ValueError(f"Empty argument in {name} at position {tokens[position].start} in formula.")
+                argument, position = self._parse_sequence(expr, tokens, position)
+                arguments.append(argument)
+
+                if position >= len(tokens):
+                    raise ValueError("Unbalanced parentheses in formula.")
+                position += 1
+                if tokens[position - 1].kind == Tokenizer.RPAREN:
+                    break
+
+        return FunctionNode(name, arguments, Span(expr, start, tokens[position - 1].end, False)), position
+
+    @staticmethod
+    def parse_many(formulas, workers=None, chunksize=256):
+        """
+        Parse a batch of formula strings across a pool of worker processes.
+        Returns their dictionary structures in input order, with a ParseFailure
+        in place of any formula that couldn't be parsed. See Models.parallel.
+        """
+        from Models.parallel import parse_many  # parallel imports this module
+        return parse_many(formulas, workers, chunksize)
 
     def to_dict(self):
         return self.parsed_formula
 
     def __str__(self):
         # Provides a JSON string representation of the parsed formula
-        parsed_formula = self.parse()
-        return json.dumps(parsed_formula, indent=4)
+        return json.dumps(self.parsed_formula, indent=4)
     
     @staticmethod
     def json_to_string(json_obj):
@@ -119,7 +283,7 @@ class Parser:
             return json_obj['operator']
         
         elif 'constant' in json_obj:
-            return str(json_obj['constant'])
+            return Constant.format_value(json_obj['constant'])
     
     @staticmethod
     def get_all_keys_with_counts(d, keys_count=None, label=None):
@@ -168,48 +332,95 @@ class Parser:
         col_shift = to_ref.column_number - from_ref.column_number
         row_shift = to_ref.row_number - from_ref.row_number
 
-        # Apply translation to the parsed formula
-        self.parsed_formula = self.recurse_translate(self.parse(), col_shift, row_shift)
+        # translated() returns a new tree, the setter drops the cached dictionary and string
+        self.tree = self.tree.translated(col_shift, row_shift)
+
+    def translate_many(self, from_cell, to_cells, as_tree=False):
+        """
+        Place this formula, written for from_cell, into every cell of to_cells.
+
+        Targets can be references like 'C3' or (column_number, row_number) pairs
+        (a NumPy array of shape (N, 2) works too). Returns the formula strings in
+        the same order, or the translated node trees with as_tree=True. Nothing is
+        parsed per target: the formula is split once into literal text and
+        reference slots and only the slots are filled in for each cell.
+        """
+        from_ref = Reference(from_cell)
+        offsets = [(column - from_ref.column_number, row - from_ref.row_number)
+                   for column, row in map(Parser.cell_coordinates, to_cells)]
+        if as_tree:
+            return [self.tree.translated(col_shift, row_shift) for col_shift, row_shift in offsets]
+
+        parts = ['=']
+        self.tree.formula_parts(parts, references=True)
+        # literals[i] is the text before slot i, the last literal is whatever comes after the last slot
+        literals, slots, text = [], [], []
+        for part in parts:
+            if isinstance(part, str):
+                text.append(part)
+                continue
+            literals.append(''.join(text))
+            text = []
+            slots.append((f"'{part.sheet_name}'!" if part.sheet_name else '', part.column, part.row))
+        tail = ''.join(text)
+
+        formulas = []
+        for col_shift, row_shift in offsets:
+            pieces = []
+            for literal, (prefix, column, row) in zip(literals, slots):
+                column += col_shift
+                row += row_shift
+                if not 1 <= column <= MAX_COLUMN or row < 1:
+                    raise ValueError(f"Translating by ({col_shift}, {row_shift}) moves a reference off the sheet.")
+                pieces.append(literal)
+                pieces.append(prefix)
+                pieces.append(COLUMN_LETTERS[column])
+                pieces.append(str(row))
+            pieces.append(tail)
+            formulas.append(''.join(pieces))
+        return formulas
+
+    @staticmethod
+    def cell_coordinates(cell):
+        """(column_number, row_number) of a cell given as a reference string or a pair of numbers."""
+        if isinstance(cell, str):
+            ref = Reference(cell)
+            return ref.column_number, ref.row_number
+        column, row = cell
+        return int(column), int(row)
 
     def recurse_translate(self, data, col_shift, row_shift):
+        """
+        Move every reference in a parsed dictionary (or list of them) by the given shifts,
+        editing it in place, and return it. The dictionary is read into a private node tree
+        once, the integer coordinates are shifted in place and the display strings are only
+        generated by one to_dict() at the end, which is then written back into data.
+        """
         if isinstance(data, list):
-            return [self.recurse_translate(item, col_shift, row_shift) for item in data]
-        composite_data_types = ['function', 'expression', 'range'] # also formulas but that doesn't matter here
-        data_type = [dt for dt in composite_data_types if dt in data]
-        if data_type:
-            data_type = data_type[0]
-        
-        if not data_type and not 'reference' in data:
+            for item in data:
+                self.recurse_translate(item, col_shift, row_shift)
             return data
-
-        # this whole section feels a little hard coded, 
-        # but there's only a few cases so I guess it's okay. 
-        if 'reference' in data:
-            ref = Reference(data['reference'])
-            ref.update_column_number(ref.column_number + col_shift)
-            ref.update_row_number(ref.row_number + row_shift)
-            data.update(ref.to_dict())
-
-        elif any(data_type):
-            # recursively translate all the components of the composite type
-            # then update it's dictionary (using the update method) with whatever the changes were if any
-            if data_type == 'function':
-                arg_updates = [self.recurse_translate(arg, col_shift, row_shift) for arg in data['components']['arguments']]
-                data['components']['arguments'] = arg_updates
-                if arg_updates:
-                    func = Function.from_dict(data)
-                    data['function'] = str(func)
-            elif data_type == 'expression':
-                updated_components = [self.recurse_translate(comp, col_shift, row_shift) for comp in data['components']]
-                data.update({"components": updated_components})
-                expr = Expression.from_dict(data)
-                data.update({"expression": str(expr)})
-            elif data_type == 'range':
-                data['components']['start'].update(self.recurse_translate(data['components']['start'], col_shift, row_shift))
-                data['components']['end'].update(self.recurse_translate(data['components']['end'], col_shift, row_shift))
-
+        tree = node_from_dict(data)
+        tree.shift(col_shift, row_shift)
+        Parser.update_in_place(data, tree.to_dict())
         return data
 
+    @staticmethod
+    def update_in_place(data, translated):
+        """Copy a translated dictionary's values into data, which has the same shape, keeping data's own containers."""
+        for key, value in translated.items():
+            current = data.get(key)
+            if isinstance(current, dict) and isinstance(value, dict):
+                Parser.update_in_place(current, value)
+            elif isinstance(current, list) and isinstance(value, list) and len(current) == len(value):
+                for index, (old, new) in enumerate(zip(current, value)):
+                    if isinstance(old, dict) and isinstance(new, dict):
+                        Parser.update_in_place(old, new)
+                    else:
+                        current[index] = new
+            else:
+                data[key] = value
+
 
 # Example usage of the FormulaParser class
 if __name__ == "__main__":
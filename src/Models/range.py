@@ -1,10 +1,10 @@
 import re
-import pandas as pd
-from openpyxl.utils import column_index_from_string, get_column_letter
+from Models.columns import get_column_letter, COLUMN_NUMBERS
 from Models.reference import Reference
 
 class Range:
     pattern = r"([A-Z]+\d+):([A-Z]+\d+)"  # Class attribute for the regex pattern
+    cell_pattern = Reference.compiled_pattern
 
     @staticmethod
     def from_dict(range_dict):
@@ -29,11 +29,31 @@ class Range:
         else:
             self.start_cell = Reference(start_ref)
             self.end_cell = Reference(end_ref)
-        self.rows = self.get_rows_in_range()
-        self.columns = self.get_columns_in_range(as_numbers=True)
-        self.cell_matrix = self.get_cells_in_range()  # Get a list of lists of cell references
-        self.row_index = 0
-        self.col_index = 0
+        # Only the bounds are kept, cells are generated when someone asks for them
+        self.min_row = min(self.start_cell.row_number, self.end_cell.row_number)
+        self.max_row = max(self.start_cell.row_number, self.end_cell.row_number)
+        self.min_col = min(self.start_cell.column_number, self.end_cell.column_number)
+        self.max_col = max(self.start_cell.column_number, self.end_cell.column_number)
+
+    @property
+    def rows(self):
+        """Row numbers covered by the range, as a lazy range object."""
+        return range(self.min_row, self.max_row + 1)
+
+    @property
+    def columns(self):
+        """Column numbers covered by the range, as a lazy range object."""
+        return range(self.min_col, self.max_col + 1)
+
+    @property
+    def shape(self):
+        """(number of rows, number of columns)"""
+        return self.max_row - self.min_row + 1, self.max_col - self.min_col + 1
+
+    @property
+    def cell_matrix(self):
+        """List of lists of every cell reference in the range. This builds the whole matrix, use iteration for big ranges."""
+        return self.get_cells_in_range()
 
     def parse_range(self, range_str):
         """Parse a range string into start and end CellReferences."""
@@ -45,25 +65,23 @@ class Range:
     
     def get_rows_in_range(self):
         """Return a list of rows covered by the range."""
-        return list(range(self.start_cell.row_number, self.end_cell.row_number + 1))
+        return list(self.rows)
 
     def get_columns_in_range(self, as_numbers=False):
         """Return a list of columns covered by the range, as numbers or letters."""
-        start_col = column_index_from_string(self.start_cell.column_letter)
-        end_col = column_index_from_string(self.end_cell.column_letter)
         if as_numbers:
-            return list(range(start_col, end_col + 1))
+            return list(self.columns)
         else:
-            return [get_column_letter(col) for col in range(start_col, end_col + 1)]
+            return [get_column_letter(col) for col in self.columns]
         
     def get_cells_in_range(self, as_dataframe=False):
         """Return all cells in the range, optionally as a pandas DataFrame."""
-        rows = range(self.start_cell.row_number, self.end_cell.row_number + 1)
-        cols = range(column_index_from_string(self.start_cell.column_letter), column_index_from_string(self.end_cell.column_letter) + 1)
-        cells = [[f"{get_column_letter(col)}{row}" for col in cols] for row in rows]
+        letters = self.get_columns_in_range()
+        cells = [[f"{letter}{row}" for letter in letters] for row in self.rows]
 
         if as_dataframe:
-            return pd.DataFrame(cells, index=[f"Row {row}" for row in rows], columns=[get_column_letter(col) for col in cols])
+            import pandas as pd  # only loaded when a DataFrame is asked for, it's slow to import
+            return pd.DataFrame(cells, index=[f"Row {row}" for row in self.rows], columns=letters)
         return cells
 
     def to_dict(self):
@@ -77,33 +95,30 @@ class Range:
         }
 
     def __iter__(self):
-        """Reset the iterator to the start of the range."""
-        self.row_index = 0
-        self.col_index = 0
-        return self
+        """Generate the cells row by row without building the matrix."""
+        letters = self.get_columns_in_range()
+        for row in self.rows:
+            for letter in letters:
+                yield f"{letter}{row}"
 
-    def __next__(self):
-        if self.row_index >= len(self.rows):
-            raise StopIteration
-
-        current_cell = self.cell_matrix[self.row_index][self.col_index]
-        self.col_index += 1
-
-        if self.col_index >= len(self.columns):
-            self.col_index = 0
-            self.row_index += 1
-
-        return current_cell
+    def __len__(self):
+        rows, columns = self.shape
+        return rows * columns
 
     def __contains__(self, item):
         """Check if a cell like 'B1' is in the range of 'A1:B2' for example."""
         if isinstance(item, str):
-            try:
-                item_ref = Reference(item)
-                return (column_index_from_string(self.start_cell.column_letter) <= column_index_from_string(item_ref.column_letter) <= column_index_from_string(self.end_cell.column_letter)) and (self.start_cell.row_number <= item_ref.row_number <= self.end_cell.row_number)
-            except ValueError:
+            match = Range.cell_pattern.match(item)
+            if not match:
                 return False
-        return False
+            column, row = COLUMN_NUMBERS.get(match.group(2)), int(match.group(3))
+            if column is None:
+                return False
+        elif isinstance(item, Reference):
+            column, row = item.column_number, item.row_number
+        else:
+            return False
+        return self.min_col <= column <= self.max_col and self.min_row <= row <= self.max_row
 
     def __str__(self):
         """String representation of the cell range."""
@@ -0,0 +1,245 @@
+from bisect import bisect_right
+from Models.columns import COLUMN_NUMBERS
+from Models.reference import Reference
+
+
+class IntervalNode:
+    """
+    One node of a static centered interval tree, over rows (axis 0) or columns (axis 1).
+
+    Entries are (min_row, max_row, min_col, max_col, entry_id) tuples. The node
+    keeps the entries that span its center twice, sorted by where they start and
+    by where they end (descending), so a query can stop reading at the first entry
+    that ends before or starts after what it wants.
+
+    Many ranges often share their rows and only differ by column (SUM(B2:B1000),
+    SUM(C2:C1000), ...), which puts them all in one row node. So a row node holding
+    more than leaf_size entries also keeps them in a tree over columns (across),
+    and a query reads whichever of the two is cheaper.
+    """
+    __slots__ = ('axis', 'center', 'by_start', 'by_end', 'starts', 'ends', 'left', 'right', 'across')
+    leaf_size = 16
+
+    def __init__(self, axis, center, by_start, by_end, left, right, across):
+        self.axis = axis
+        self.center = center
+        self.by_start = by_start
+        self.by_end = by_end
+        low, high = 2 * axis, 2 * axis + 1
+        # for bisecting, ends are negated so they ascend like by_end descends
+        self.starts = [entry[low] for entry in by_start] if by_end is not None else None
+        self.ends = [-entry[high] for entry in by_end] if by_end is not None else None
+        self.left = left
+        self.right = right
+        self.across = across
+
+    @staticmethod
+    def build(entries, axis=0):
+        """Build the tree for a list of entries, returns None for an empty list."""
+        if not entries:
+            return None
+        if len(entries) <= IntervalNode.leaf_size:
+            # small enough to scan, a leaf has no center and no children
+            return IntervalNode(axis, None, entries, None, None, None, None)
+        low, high = 2 * axis, 2 * axis + 1
+        middles = sorted(entry[low] + entry[high] for entry in entries)
+        center = middles[len(middles) // 2] // 2
+        here, left, right = [], [], []
+        for entry in entries:
+            if entry[high] < center:
+                left.append(entry)
+            elif entry[low] > center:
+                right.append(entry)
+            else:
+                here.append(entry)
+        by_start = sorted(here, key=lambda entry: entry[low])
+        by_end = sorted(here, key=lambda entry: entry[high], reverse=True)
+        across = IntervalNode.build(here, 1) if axis == 0 and len(here) > IntervalNode.leaf_size else None
+        return IntervalNode(axis, center, by_start, by_end,
+                            IntervalNode.build(left, axis), IntervalNode.build(right, axis), across)
+
+    def search(self, min_col, min_row, max_col, max_row, found):
+        """Append the ids of the entries overlapping the rectangle to found."""
+        query = (min_row, max_row, min_col, max_col)
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.center is None:
+                for entry in node.by_start:
+                    if (entry[0] <= max_row and entry[1] >= min_row
+                            and entry[2] <= max_col and entry[3] >= min_col):
+                        found.append(entry[4])
+                continue
+            # low and high bound the query on this node's axis, the entries are checked on the other one
+            low, high = query[2 * node.axis], query[2 * node.axis + 1]
+            other_low, other_high = query[2 - 2 * node.axis], query[3 - 2 * node.axis]
+            other = 2 - 2 * node.axis
+            if high < node.center:
+                # every entry here reaches the center, so only where they start matters
+                count = bisect_right(node.starts, high)
+                if node.across is not None and count > IntervalNode.leaf_size:
+                    stack.append(node.across)
+                else:
+                    for entry in node.by_start[:count]:
+                        if entry[other] <= other_high and entry[other + 1] >= other_low:
+                            found.append(entry[4])
+                if node.left is not None:
+                    stack.append(node.left)
+            elif low > node.center:
+                count = bisect_right(node.ends, -low)
+                if node.across is not None and count > IntervalNode.leaf_size:
+                    stack.append(node.across)
+                else:
+                    for entry in node.by_end[:count]:
+                        if entry[other] <= other_high and entry[other + 1] >= other_low:
+                            found.append(entry[4])
+                if node.right is not None:
+                    stack.append(node.right)
+            else:
+                if node.across is not None:
+                    stack.append(node.across)
+                else:
+                    for entry in node.by_start:
+                        if entry[other] <= other_high and entry[other + 1] >= other_low:
+                            found.append(entry[4])
+                if node.left is not None:
+                    stack.append(node.left)
+                if node.right is not None:
+                    stack.append(node.right)
+
+
+class RangeIndex:
+    """
+    Index of rectangles (ranges) answering "which of them hold this cell" and
+    "which of them overlap this area" without looking at every rectangle.
+
+    Rectangles are kept in static centered interval trees over their rows, with
+    trees over the columns of the rectangles sharing a row node (see IntervalNode). Trees hold 1, 2, 4, 8, ... entries
+    like the digits of a binary counter: adding an entry merges the trees of the
+    sizes below it into one, which keeps inserts cheap on average and leaves a
+    query with at most log2(n) trees to search. Removed entries are dropped the
+    next time their tree is rebuilt.
+    """
+
+    def __init__(self, rectangles=()):
+        self.entries = {}  # entry id -> (min_col, min_row, max_col, max_row, value)
+        self.ids = {}  # (min_col, min_row, max_col, max_row, value) -> entry id
+        self.levels = []  # levels[i] is None or (entry ids, tree) holding about 2**i entries
+        self.next_id = 0
+        self.dead = 0  # removed entries still sitting in a tree
+        self.add_many(rectangles)
+
+    @staticmethod
+    def bounds(rectangle):
+        """
+        (min_col, min_row, max_col, max_row) of a rectangle, given as a Range, an
+        Area, a range string like 'A1:B5' or a (min_col, min_row, max_col, max_row) tuple.
+        """
+        if isinstance(rectangle, str):
+            from Models.range import Range
+            rectangle = Range(rectangle)
+        if hasattr(rectangle, 'min_row'):
+            return rectangle.min_col, rectangle.min_row, rectangle.max_col, rectangle.max_row
+        min_col, min_row, max_col, max_row = rectangle
+        return min(min_col, max_col), min(min_row, max_row), max(min_col, max_col), max(min_row, max_row)
+
+    @staticmethod
+    def cell_coordinates(cell):
+        """(column, row) of a cell given as 'B2', a Reference or a (column, row) pair."""
+        if isinstance(cell, str):
+            match = Reference.compiled_pattern.match(cell)
+            column = COLUMN_NUMBERS.get(match.group(2)) if match else None
+            if column is None:
+                raise ValueError(f"Invalid cell reference: {cell}")
+            return column, int(match.group(3))
+        if isinstance(cell, Reference):
+            return cell.column_number, cell.row_number
+        if hasattr(cell, 'column'):
+            return cell.column, cell.row
+        return cell
+
+    def add(self, rectangle, value=None):
+        """Add a rectangle with the value a search should return for it. Adding the same pair twice does nothing."""
+        key = RangeIndex.bounds(rectangle) + (value,)
+        if key in self.ids:
+            return
+        entry_id = self.next_id
+        self.next_id += 1
+        self.entries[entry_id] = key
+        self.ids[key] = entry_id
+
+        carry = [entry_id]
+        for level, slot in enumerate(self.levels):
+            if slot is None:
+                self.levels[level] = self.build(carry)
+                return
+            carry.extend(slot[0])
+            self.levels[level] = None
+        self.levels.append(self.build(carry))
+
+    def add_many(self, rectangles):
+        """Add (rectangle, value) pairs in bulk, the trees are rebuilt once at the end instead of per pair."""
+        added = False
+        for rectangle, value in rectangles:
+            key = RangeIndex.bounds(rectangle) + (value,)
+            if key not in self.ids:
+                self.entries[self.next_id] = key
+                self.ids[key] = self.next_id
+                self.next_id += 1
+                added = True
+        if added:
+            self.rebuild()
+
+    def build(self, entry_ids):
+        live = [entry_id for entry_id in entry_ids if entry_id in self.entries]
+        self.dead -= len(entry_ids) - len(live)
+        tree_entries = []
+        for entry_id in live:
+            min_col, min_row, max_col, max_row, _ = self.entries[entry_id]
+            tree_entries.append((min_row, max_row, min_col, max_col, entry_id))
+        return live, IntervalNode.build(tree_entries)
+
+    def remove(self, rectangle, value=None):
+        """Remove a rectangle added with this value, it's an error if there isn't one."""
+        key = RangeIndex.bounds(rectangle) + (value,)
+        entry_id = self.ids.pop(key, None)
+        if entry_id is None:
+            raise KeyError(f"{rectangle} isn't in the index")
+        del self.entries[entry_id]
+        self.dead += 1
+        if self.dead > len(self.entries):
+            self.rebuild()
+
+    def rebuild(self):
+        """Put every live entry back into one freshly built tree."""
+        entry_ids = list(self.entries)
+        self.dead = 0
+        # the tree sits at the level its size would reach, the levels under it are free for new entries
+        self.levels = [None] * len(entry_ids).bit_length()
+        if entry_ids:
+            self.levels[-1] = self.build(entry_ids)
+
+    def search_ids(self, min_col, min_row, max_col, max_row):
+        found = []
+        for slot in self.levels:
+            if slot is not None and slot[1] is not None:
+                slot[1].search(min_col, min_row, max_col, max_row, found)
+        return [entry_id for entry_id in found if entry_id in self.entries]
+
+    def search(self, cell):
+        """Values of the rectangles that hold cell ('B2', a Reference or a (column, row) pair)."""
+        column, row = RangeIndex.cell_coordinates(cell)
+        return [self.entries[entry_id][4] for entry_id in self.search_ids(column, row, column, row)]
+
+    def search_area(self, rectangle):
+        """Values of the rectangles that overlap rectangle (anything RangeIndex.bounds accepts)."""
+        min_col, min_row, max_col, max_row = RangeIndex.bounds(rectangle)
+        return [self.entries[entry_id][4] for entry_id in self.search_ids(min_col, min_row, max_col, max_row)]
+
+    def items(self):
+        """(bounds, value) for every rectangle in the index."""
+        for min_col, min_row, max_col, max_row, value in self.entries.values():
+            yield (min_col, min_row, max_col, max_row), value
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,198 @@
+from Models.dependency_graph import DependencyGraph, Area
+from Models.evaluator import Evaluator, CellProvider, DictCellProvider
+from Models.parse_cache import ParseCache
+from Models.parser import Parser
+from Models.range_index import RangeIndex
+from Models.template_cache import TemplateCache
+
+
+class CircularReferenceError(ValueError):
+    """
+    Raised by Recalculator.recalculate when formulas depend on each other in a loop.
+    cycle is one loop of Cells, cells every Cell left uncalculated because of it.
+    """
+
+    def __init__(self, cycle, cells):
+        super().__init__("Circular reference: " + " -> ".join(str(cell) for cell in cycle + cycle[:1]))
+        self.cycle = cycle
+        self.cells = cells
+
+
+class Recalculator(CellProvider):
+    """
+    Cell values and formulas of a workbook, recalculating only what a change affects.
+
+    Changing a value or a formula marks the cell dirty. recalculate() then finds
+    every formula downstream of the dirty cells through the DependencyGraph and
+    evaluates each of them once, in topological order (Kahn's algorithm), so a
+    formula only runs after everything it reads is up to date. The values of every
+    other formula are kept from the last calculation. The cells of one step of the
+    order don't depend on each other, they're handed to Evaluator.evaluate_many
+    together so filled down columns are evaluated as arrays.
+
+    Formulas read other formulas' values through this provider, plain values come
+    from the provider it wraps (a DictCellProvider unless given another one). Ranges
+    are read from the wrapped provider in one go with the formula values inside them
+    put in, so a ColumnStore's array views still get through when there aren't any.
+    A formula is only parsed the first time its template (see TemplateCache) is
+    seen, the areas the rest of a filled down column reads are moved from it.
+    """
+
+    def __init__(self, provider=None, vectorize=True, maxsize=4096):
+        self.provider = provider if provider is not None else DictCellProvider()
+        self.graph = DependencyGraph()
+        self.evaluator = Evaluator(self)
+        self.vectorize = vectorize
+        self.formulas = {}  # formula cell -> formula string
+        self.keys = {}  # formula cell -> template key
+        self.templates = ParseCache(maxsize)  # template key -> (Areas read, column, row they were found for)
+        self.values = {}  # formula cell -> value from the last calculation
+        self.formula_cells = {}  # sheet name -> RangeIndex of its formula cells
+        self.dirty = set()  # cells changed since the last calculation
+
+    def get(self, sheet_name, column, row):
+        key = (sheet_name, column, row)
+        if key in self.formulas:
+            return self.values.get(key)
+        return self.provider.get(sheet_name, column, row)
+
+    def get_range(self, sheet_name, min_col, min_row, max_col, max_row):
+        rows = self.provider.get_range(sheet_name, min_col, min_row, max_col, max_row)
+        index = self.formula_cells.get(sheet_name)
+        cells = index.search_area((min_col, min_row, max_col, max_row)) if index is not None and len(index) else ()
+        if not cells:
+            return rows
+        values = [self.values.get(cell) for cell in cells]
+        if hasattr(rows, 'dtype'):
+            if all(value is None or type(value) is float or type(value) is int for value in values):
+                # still all numbers, the formula values go into a copy of the array
+                rows = rows.copy()
+                for cell, value in zip(cells, values):
+                    rows[cell.row - min_row, cell.column - min_col] = float('nan') if value is None else value
+                return rows
+            rows = [[None if value != value else value for value in row] for row in rows.tolist()]
+        else:
+            rows = [list(row) for row in rows]
+        for cell, value in zip(cells, values):
+            rows[cell.row - min_row][cell.column - min_col] = value
+        return rows
+
+    def value(self, sheet_name, cell):
+        """The value of a cell, as of the last recalculate() for formula cells."""
+        cell = DependencyGraph.cell(sheet_name, cell)
+        return self.get(*cell)
+
+    def set_value(self, sheet_name, cell, value):
+        """Put a plain value (None empties it) in a cell, replacing the formula there if there was one."""
+        cell = DependencyGraph.cell(sheet_name, cell)
+        if cell in self.formulas:
+            del self.formulas[cell]
+            del self.keys[cell]
+            self.values.pop(cell, None)
+            self.graph.remove_formula(cell.sheet_name, cell)
+            self.formula_cells[cell.sheet_name].remove((cell.column, cell.row, cell.column, cell.row), cell)
+        self.provider.set(cell.sheet_name, cell, value)
+        self.evaluator.invalidate(cell.sheet_name, cell)
+        self.dirty.add(cell)
+
+    def set_formula(self, sheet_name, cell, formula):
+        """Put a formula string in a cell."""
+        cell = DependencyGraph.cell(sheet_name, cell)
+        key = TemplateCache.template_key(formula, cell.column, cell.row)
+        template = self.templates.get(key)
+        if template is None:
+            # areas without a sheet are on the formula's sheet, whichever that turns out to be
+            template = (DependencyGraph.areas(Parser(formula).tree, None), cell.column, cell.row)
+            self.templates.put(key, template)
+        areas, column, row = template
+        col_shift, row_shift = cell.column - column, cell.row - row
+        self.graph.add_areas(cell.sheet_name, cell, [
+            Area(area.sheet_name or cell.sheet_name, area.min_col + col_shift, area.min_row + row_shift,
+                 area.max_col + col_shift, area.max_row + row_shift) for area in areas])
+        if cell not in self.formulas:
+            self.formula_cells.setdefault(cell.sheet_name, RangeIndex()).add(
+                (cell.column, cell.row, cell.column, cell.row), cell)
+        self.formulas[cell] = formula
+        self.keys[cell] = key
+        self.values.pop(cell, None)
+        self.evaluator.invalidate(cell.sheet_name, cell)
+        self.dirty.add(cell)
+
+    def affected(self):
+        """The formula cells that need calculating: the dirty ones and everything downstream of a dirty cell."""
+        affected = {cell for cell in self.dirty if cell in self.formulas}
+        stack = list(self.dirty)
+        while stack:
+            for dependent in self.graph.dependents(None, stack.pop()):
+                if dependent not in affected:
+                    affected.add(dependent)
+                    stack.append(dependent)
+        return affected
+
+    def recalculate(self):
+        """
+        Calculate every formula affected by the changes since the last call, once each.
+        Returns the cells calculated, in the order they were. Formulas caught in a circular
+        reference (or reading from one) are left dirty and a CircularReferenceError is raised
+        once everything else is calculated.
+        """
+        affected = self.affected()
+        # edges from each affected formula to the affected formulas reading it
+        precedent_count = dict.fromkeys(affected, 0)
+        dependents = {}
+        for cell in affected:
+            dependents[cell] = [dependent for dependent in self.graph.dependents(None, cell) if dependent in affected]
+            for dependent in dependents[cell]:
+                precedent_count[dependent] += 1
+
+        order = []
+        ready = [cell for cell, count in precedent_count.items() if count == 0]
+        while ready:
+            self.calculate(ready)
+            order.extend(ready)
+            next_ready = []
+            for cell in ready:
+                del precedent_count[cell]
+                for dependent in dependents[cell]:
+                    precedent_count[dependent] -= 1
+                    if precedent_count[dependent] == 0:
+                        next_ready.append(dependent)
+            ready = next_ready
+
+        # whatever Kahn's algorithm couldn't reach still waits on a precedent, so it's in or behind a cycle
+        self.dirty = set(precedent_count)
+        if self.dirty:
+            raise CircularReferenceError(self.find_cycle(precedent_count, dependents), sorted(self.dirty))
+        return order
+
+    def calculate(self, cells):
+        """Evaluate formula cells that don't depend on each other, grouped by sheet."""
+        sheets = {}
+        for cell in cells:
+            sheets.setdefault(cell.sheet_name, []).append(cell)
+        for sheet_name, sheet_cells in sheets.items():
+            values = self.evaluator.evaluate_many([(cell, self.formulas[cell]) for cell in sheet_cells], sheet_name,
+                                                  vectorize=self.vectorize, keys=[self.keys[cell] for cell in sheet_cells])
+            for cell, value in zip(sheet_cells, values):
+                self.values[cell] = value
+                self.evaluator.invalidate(sheet_name, cell)
+
+    @staticmethod
+    def find_cycle(remaining, dependents):
+        """
+        One cycle among the cells Kahn's algorithm left over. Each of them has a
+        precedent left over too, so walking precedents from any of them must come
+        back to a cell already seen, iteratively rather than by recursion.
+        """
+        precedents = {}
+        for cell in remaining:
+            for dependent in dependents[cell]:
+                precedents.setdefault(dependent, cell)
+        path, seen = [], {}
+        cell = next(iter(remaining))
+        while cell not in seen:
+            seen[cell] = len(path)
+            path.append(cell)
+            cell = precedents[cell]
+        # the walk went backwards, the formulas read each other in the opposite order
+        return list(reversed(path[seen[cell]:]))
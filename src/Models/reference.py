@@ -1,19 +1,28 @@
 import re
-from openpyxl.utils import column_index_from_string, get_column_letter
+from Models.columns import column_index_from_string, get_column_letter, COLUMN_NUMBERS
 
 class Reference:
     pattern = r"(?:'([^']+)'!)?([A-Z]+)(\d+)$"
-    
+    compiled_pattern = re.compile(pattern)  # compiled once, every reference goes through it
+
     @staticmethod
     def from_dict(ref_dict):
         """Reconstruct the reference string from its dictionary representation."""
-        column_letter = ref_dict['components']['column_letter']
-        row_number = ref_dict['components']['row_number']
-        sheet_name = ref_dict['components'].get('sheet_name', None)
+        components = ref_dict['components']
+        column_number = components.get('column_number')
+        if column_number is None:
+            column_number = column_index_from_string(components['column_letter'])
         # return an instance of the Reference class using the parsed components
-        if sheet_name:
-            return Reference(f"'{sheet_name}'!{column_letter}{row_number}")
-        return Reference(f"{column_letter}{row_number}")
+        return Reference.from_coordinates(column_number, components['row_number'], components.get('sheet_name', None))
+
+    @staticmethod
+    def from_coordinates(column_number, row_number, sheet_name=None):
+        """Build a reference straight from integer coordinates, no string parsing involved."""
+        reference = Reference.__new__(Reference)
+        reference.sheet_name = sheet_name
+        reference.column_number = column_number
+        reference.update_row_number(row_number)
+        return reference
     
     @staticmethod
     def is_valid_reference(cell_ref):
@@ -28,7 +37,7 @@ class Reference:
         ref_is_dict = isinstance(cell_ref, dict)
         ref_is_str = isinstance(cell_ref, str)
         if ref_is_str:
-            match = re.match(Reference.pattern, cell_ref)
+            match = Reference.compiled_pattern.match(cell_ref)
             if not match:
                 return False
             _, column_letter, row_number = match.groups()
@@ -66,17 +75,34 @@ class Reference:
 
     def __init__(self, cell_ref):
         """Initialize the CellReference instance by parsing the provided reference."""
+        if isinstance(cell_ref, str):
+            # strings are validated and split by the same single match
+            self.parse_cell_ref(cell_ref)
+            return
         valid = Reference.is_valid_reference(cell_ref)
         if not valid:
             raise ValueError(f"Invalid cell reference: {cell_ref}")
-        self.parse_cell_ref(cell_ref)
+        components = cell_ref['components']
+        self.sheet_name = components.get('sheet_name', None)
+        self.column_letter = components['column_letter']
+        self.update_row_number(components['row_number'])
 
     def parse_cell_ref(self, cell_ref):
         """Parse the cell reference string and set the object attributes."""
-        match = re.match(Reference.pattern, cell_ref)
-        
-        self.sheet_name, self.column_letter, row_number = match.groups()
-        self.row_number = int(row_number)
+        match = Reference.compiled_pattern.match(cell_ref)
+        if match is None:
+            raise ValueError(f"Invalid cell reference: {cell_ref}")
+        sheet_name, column_letter, row_number = match.groups()
+        row_number = int(row_number)
+        column_number = COLUMN_NUMBERS.get(column_letter)
+        if not row_number or column_number is None:
+            raise ValueError(f"Invalid cell reference: {cell_ref}")
+
+        # set the backing fields directly, the property setters would convert the column again
+        self.sheet_name = sheet_name
+        self._column_letter = column_letter
+        self._column_number = column_number
+        self.row_number = row_number
 
     def to_dict(self):
         """Create a dictionary representation of the cell reference."""
@@ -0,0 +1,268 @@
+"""
+Constant folding and simplification of parse trees.
+
+simplify() works on the binary operator tree of a formula (see Models.operator_tree)
+from the leaves up:
+
+    - operations on constants are worked out: =A1*(60*60*24) becomes =A1*86400
+    - calls to pure functions (excel_functions.pure_functions) with constant arguments
+      are too, and IF / IFERROR with a constant condition (or a constant error) become
+      the branch they take
+    - identities that can't change a value are dropped: x+0, x-0, x*1, 1*x, x/1, x^1
+      and --x when x is already a number (an arithmetic operation), x&"" when x is
+      already text, and prefix + always. A1+0 stays, it turns a text cell into a number.
+
+Anything that would give an Excel error is left as it is, so the error still shows up
+where the formula is evaluated. So are results the tokenizer couldn't read back (inf,
+or floats that only print with an exponent) and integers too big for a float to hold exactly,
+which aren't used as operands either.
+
+The folded tree is flattened back into the parser's form, with only the parenthesis
+the precedence needs, and the parts that changed are written without spaces. It's only
+kept when its text, spaces aside, is no longer than the original's and differs from it.
+"""
+import math
+import re
+from Models.excel_functions import (ExcelError, CellRange, binary_operators, negate, percent, to_bool,
+                                    functions, lazy_functions, pure_functions, excel_if, excel_iferror)
+from Models.nodes import Node, ConstantNode, FunctionNode, ExpressionNode, RangeNode, node_from_dict, moved_span
+from Models.operator_tree import BinaryNode, UnaryNode, binary_tree, flattened
+
+ARITHMETIC = ('+', '-', '*', '/', '^')
+
+# operator -> (value on the left that drops out, value on the right that drops out)
+identities = {'+': (0, 0), '-': (None, 0), '*': (1, 1), '/': (None, 1), '^': (None, 1), '&': ('', '')}
+
+# what constant_value gives for nodes that aren't constants
+NOT_CONSTANT = object()
+
+# whitespace, and the text and sheet names it has to be left alone in
+SPACES = re.compile(r'("[^"]*"|\'[^\']*\')|\s+')
+
+
+def simplify(tree):
+    """
+    A simplified copy of a node tree (or parsed dictionary), parsed from its text. The
+    tree itself comes back when simplifying would make its text longer or only respace it.
+    """
+    if not isinstance(tree, Node):
+        tree = node_from_dict(tree)
+    text = compact_text(flattened(fold(binary_tree(tree))))
+    original = squeezed(tree.source_text())
+    # folding can make the text longer, 0.1 + 0.2 is 0.30000000000000004
+    if squeezed(text) == original or len(squeezed(text)) > len(original):
+        return tree
+    from Models.parser import Parser  # Models.parser imports this module
+    # parsed again so the new tree's spans are in its compact text, translating it keeps that
+    return Parser(f"={text}").tree
+
+
+def compact_text(node):
+    """The text of a flattened tree, the parts without an untouched span written without spaces."""
+    if node.span is not None and not node.span.edited:
+        return node.span.text()
+    if isinstance(node, ExpressionNode):
+        parts = []
+        for component in node.components:
+            text = compact_text(component)
+            if isinstance(component, ExpressionNode) and (component.span is None or component.span.edited):
+                text = f"({text})"
+            parts.append(text)
+        return ''.join(parts)
+    if isinstance(node, FunctionNode):
+        return f"{node.name}({','.join(compact_text(argument) for argument in node.arguments)})"
+    if isinstance(node, RangeNode):
+        return f"{compact_text(node.start)}:{compact_text(node.end)}"
+    return node.source_text()
+
+
+def squeezed(text):
+    """Formula text without the spaces between its tokens."""
+    return SPACES.sub(lambda match: match.group(1) or '', text)
+
+
+def fold(node):
+    """Fold a binary operator tree, returns it (or parts of it) untouched when nothing folds."""
+    if isinstance(node, BinaryNode):
+        return fold_binary(node)
+    if isinstance(node, UnaryNode):
+        return fold_unary(node)
+    if isinstance(node, FunctionNode):
+        return fold_function(node)
+    return node
+
+
+def constant_value(node):
+    """The value of a folded node that's a constant, a negative number included, NOT_CONSTANT otherwise."""
+    if isinstance(node, ConstantNode):
+        return node.value
+    if (isinstance(node, UnaryNode) and node.operator == '-' and isinstance(node.operand, ConstantNode)
+            and is_number(node.operand.value)):
+        return -node.operand.value
+    return NOT_CONSTANT
+
+
+def constant_node(value):
+    """The node for a computed value, None if it can't be written in a formula."""
+    if isinstance(value, (bool, str)):
+        return ConstantNode(value)
+    if not is_number(value) or not is_folded(value):
+        return None  # Python's exact big integers included, Excel would only have a float's digits
+    if isinstance(value, float) and value.is_integer() and abs(value) < 2 ** 53:
+        value = int(value)  # reads back as the same number, and it's shorter
+    if 'e' in str(abs(value)):
+        return None  # the tokenizer doesn't read exponents
+    if value < 0:
+        return UnaryNode('-', ConstantNode(-value))
+    return ConstantNode(value)
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def is_folded(value):
+    """Whether a value is one folding works with, inf, nan and exact big integers aren't."""
+    if not is_number(value):
+        return True
+    return math.isfinite(value) if isinstance(value, float) else abs(value) < 2 ** 53
+
+
+def is_numeric(node):
+    """Whether a folded node always gives a number (or an error), so to_number leaves it alone."""
+    if isinstance(node, BinaryNode):
+        return node.operator in ARITHMETIC
+    if isinstance(node, UnaryNode):
+        return node.operator != '+' or is_numeric(node.operand)
+    return isinstance(node, ConstantNode) and is_number(node.value)
+
+
+def is_text(node):
+    if isinstance(node, BinaryNode):
+        return node.operator == '&'
+    return isinstance(node, ConstantNode) and isinstance(node.value, str)
+
+
+def computed(operation, *values):
+    """The node for operation(*values), None when it gives an error or something a constant can't hold."""
+    if not all(map(is_folded, values)):
+        return None
+    try:
+        value = operation(*values)
+    except (ExcelError, TypeError):
+        return None
+    return None if isinstance(value, CellRange) else constant_node(value)
+
+
+def fold_binary(node):
+    left, right = fold(node.left), fold(node.right)
+    left_value, right_value = constant_value(left), constant_value(right)
+    if left_value is not NOT_CONSTANT and right_value is not NOT_CONSTANT:
+        result = computed(binary_operators[node.operator], left_value, right_value)
+        if result is not None:
+            return result
+
+    identity = identities.get(node.operator)
+    if identity is not None:
+        # only when the other side already is what the operator turns it into, A1+0 makes text a number
+        kept_type = is_text if node.operator == '&' else is_numeric
+        left_identity, right_identity = identity
+        if right_value is not NOT_CONSTANT and same_value(right_value, right_identity) and kept_type(left):
+            return left
+        if left_value is not NOT_CONSTANT and same_value(left_value, left_identity) and kept_type(right):
+            return right
+
+    if left is node.left and right is node.right:
+        return node
+    return BinaryNode(node.operator, left, right)
+
+
+def same_value(value, identity):
+    """Whether a constant is exactly the identity, TRUE and "0" aren't numbers here."""
+    if isinstance(identity, str):
+        return isinstance(value, str) and value == identity
+    return identity is not None and is_number(value) and value == identity
+
+
+def fold_unary(node):
+    operand = fold(node.operand)
+    if node.operator == '+':
+        return operand  # prefix + doesn't do anything in Excel, not even convert text
+    value = constant_value(operand)
+    if value is not NOT_CONSTANT:
+        if node.operator == '-' and isinstance(operand, ConstantNode) and is_number(value):
+            # already as folded as a negative number gets
+            return node if operand is node.operand else UnaryNode('-', operand)
+        result = computed(negate if node.operator == '-' else percent, value)
+        if result is not None:
+            return result
+    if (node.operator == '-' and isinstance(operand, UnaryNode) and operand.operator == '-'
+            and is_numeric(operand.operand)):
+        return operand.operand  # --x is only a conversion to a number
+    if operand is node.operand:
+        return node
+    return UnaryNode(node.operator, operand)
+
+
+def fold_function(node):
+    arguments = [fold(argument) for argument in node.arguments]
+    name = node.name.upper()
+    values = [constant_value(argument) for argument in arguments]
+
+    # IF and IFERROR only while they're the built in ones, register_function can replace them
+    if (lazy_functions.get(name) is excel_if and 1 <= len(arguments) <= 3
+            and values[0] is not NOT_CONSTANT):
+        try:
+            condition = to_bool(values[0])
+        except ExcelError:
+            condition = None
+        if condition is not None:
+            branch = 1 if condition else 2
+            if branch < len(arguments):
+                return arguments[branch]
+            return ConstantNode(condition)  # IF(FALSE, x) is FALSE, IF(TRUE) is TRUE
+    elif lazy_functions.get(name) is excel_iferror and len(arguments) == 2:
+        if values[0] is not NOT_CONSTANT:
+            return arguments[0]  # a constant that folded isn't an error
+        if constant_error(arguments[0]):
+            return arguments[1]
+    elif pure_function(name) is not None and NOT_CONSTANT not in values:
+        result = computed(pure_function(name), *values)
+        if result is not None:
+            return result
+
+    if all(new is old for new, old in zip(arguments, node.arguments)):
+        return node
+    return FunctionNode(node.name, arguments, moved_span(node.span))
+
+
+def pure_function(name):
+    name = name.upper()
+    if name in pure_functions and name not in lazy_functions:
+        return functions.get(name)
+    return None
+
+
+def constant_error(node):
+    """Whether a folded node is bound to give an Excel error, errors are what folding leaves alone."""
+    if isinstance(node, BinaryNode):
+        operation, operands = binary_operators[node.operator], (node.left, node.right)
+    elif isinstance(node, UnaryNode) and node.operator != '+':
+        operation, operands = negate if node.operator == '-' else percent, (node.operand,)
+    elif isinstance(node, FunctionNode) and pure_function(node.name) is not None:
+        operation, operands = pure_function(node.name), node.arguments
+    else:
+        return False
+    # operators and eager functions pass on an error in any of their operands
+    if any(constant_error(operand) for operand in operands):
+        return True
+    values = [constant_value(operand) for operand in operands]
+    if NOT_CONSTANT in values:
+        return False
+    try:
+        operation(*values)
+    except ExcelError:
+        return True
+    except TypeError:
+        pass
+    return False
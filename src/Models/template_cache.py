@@ -0,0 +1,94 @@
+from Models.columns import column_index_from_string
+from Models.parser import Parser
+from Models.reference import Reference
+from Models.tokenizer import Tokenizer
+from Models.parse_cache import ParseCache
+
+
+class TemplateCache:
+    """
+    Cache of parse trees keyed by the formula's shape relative to the cell it sits in.
+
+    A filled down column like =A2*B2, =A3*B3, ... normalises to one template key
+    (every reference becomes an R[row offset]C[column offset] pair), so only the
+    first formula is parsed. The others get a copy of that tree moved by
+    Node.translated, the same arithmetic Parser.translate uses.
+
+    The key ignores whitespace, but the cached tree's spans point into the
+    template's own text. A formula spaced differently is parsed on its own so
+    its reconstructed text stays the way it was written.
+    """
+    reference_pattern = Reference.compiled_pattern
+
+    def __init__(self, maxsize=4096):
+        # entries are (node tree, column_number, row_number, layout) of the formula that was parsed
+        self.entries = ParseCache(maxsize)
+
+    @staticmethod
+    def relative_reference(reference, column, row):
+        """Turn a reference like 'Sheet1'!C5 into 'Sheet1'!R[dr]C[dc] relative to (column, row)."""
+        sheet_name, column_letter, row_number = TemplateCache.reference_pattern.match(reference).groups()
+        offset = f"R[{int(row_number) - row}]C[{column_index_from_string(column_letter) - column}]"
+        return f"'{sheet_name}'!{offset}" if sheet_name else offset
+
+    @staticmethod
+    def template_key(formula_str, column, row):
+        """
+        Build the offset relative key for a formula placed at (column, row).
+        This only tokenizes the text, which is much cheaper than a full parse.
+        """
+        return TemplateCache.template_parts(formula_str, column, row)[0]
+
+    @staticmethod
+    def template_parts(formula_str, column, row):
+        """Return the template key along with the formula's layout, the whitespace between its tokens."""
+        parts = []
+        layout = []
+        body = formula_str[1:] if formula_str.startswith('=') else formula_str
+        position = 0
+        for token in Tokenizer.tokenize(body):
+            layout.append(body[position:token.start])
+            position = token.end
+            if token.kind == Tokenizer.REFERENCE:
+                parts.append(TemplateCache.relative_reference(token.value, column, row))
+            elif token.kind == Tokenizer.RANGE:
+                start, end = token.value.split(':')
+                parts.append(TemplateCache.relative_reference(start, column, row) + ':'
+                             + TemplateCache.relative_reference(end, column, row))
+            else:
+                parts.append(token.value)
+        layout.append(body[position:])
+        return ' '.join(parts), tuple(layout)
+
+    def parse(self, formula_str, cell):
+        """
+        Return a Parser for formula_str sitting in cell (like 'B2').
+        Formulas whose shape was already seen are translated from the cached
+        template instead of being parsed.
+        """
+        if not formula_str.startswith('='):
+            raise ValueError("Formula must start with an '=' sign.")
+        target = Reference(cell)
+        key, layout = TemplateCache.template_parts(formula_str, target.column_number, target.row_number)
+
+        entry = self.entries.get(key)
+        if entry is None or entry[3] != layout:
+            parser = Parser(formula_str)
+            if entry is None:
+                self.entries.put(key, (parser.tree, target.column_number, target.row_number, layout))
+            return parser
+
+        tree, column, row, _ = entry
+        # translated() builds a new tree, the cached one stays shared and untouched
+        tree = tree.translated(target.column_number - column, target.row_number - row)
+        return Parser(formula_str, tree=tree)
+
+    def stats(self):
+        return self.entries.stats()
+
+    def clear(self):
+        self.entries.clear()
+
+
+# The process wide template cache
+template_cache = TemplateCache()
@@ -0,0 +1,78 @@
+import re
+from collections import namedtuple
+
+
+# kind is one of the Tokenizer kind constants, value is the exact source text,
+# start/end are offsets into the string that was tokenized (end is exclusive)
+Token = namedtuple('Token', ['kind', 'value', 'start', 'end'])
+
+
+class Tokenizer:
+    """Single pass lexer that turns formula text into typed tokens with source offsets."""
+
+    NUMBER = 'NUMBER'
+    STRING = 'STRING'
+    BOOLEAN = 'BOOLEAN'
+    RANGE = 'RANGE'
+    REFERENCE = 'REFERENCE'
+    NAME = 'NAME'
+    OPERATOR = 'OPERATOR'
+    LPAREN = 'LPAREN'
+    RPAREN = 'RPAREN'
+    COMMA = 'COMMA'
+
+    # Order matters here, the first alternative that matches wins. The lookaheads
+    # stop things like LOG10( or TRUE( from being read as references / booleans.
+    token_specification = [
+        ('WHITESPACE', r"\s+"),
+        (STRING, r'"(?:[^"]|"")*"'),
+        (BOOLEAN, r"(?:TRUE|FALSE)(?![A-Za-z0-9_.(])"),
+        (RANGE, r"(?:'[^']+'!)?[A-Z]+\d+:[A-Z]+\d+(?![A-Za-z0-9_.(])"),
+        (REFERENCE, r"(?:'[^']+'!)?[A-Z]+\d+(?![A-Za-z0-9_.(])"),
+        (NUMBER, r"\d+(?:\.\d*)?|\.\d+"),
+        (NAME, r"[A-Za-z_][A-Za-z0-9_.]*"),
+        (OPERATOR, r"<>|>=|<=|[-+*/^&=<>%]"),
+        (LPAREN, r"\("),
+        (RPAREN, r"\)"),
+        (COMMA, r","),
+    ]
+    pattern = re.compile('|'.join(f"(?P<{kind}>{regex})" for kind, regex in token_specification))
+
+    @staticmethod
+    def tokenize(text):
+        """Scan the text exactly once and return its tokens, skipping whitespace."""
+        tokens = []
+        position = 0
+        length = len(text)
+        match = Tokenizer.pattern.match
+        while position < length:
+            found = match(text, position)
+            if found is None:
+                raise ValueError(f"Unexpected character {text[position]!r} at position {position}")
+            kind = found.lastgroup
+            end = found.end()
+            if kind != 'WHITESPACE':
+                tokens.append(Token(kind, found.group(), position, end))
+            position = end
+        return tokens
+
+    @staticmethod
+    def match_parentheses(tokens):
+        """Map the index of every '(' token to the index of its matching ')' token."""
+        pairs = {}
+        stack = []
+        for index, token in enumerate(tokens):
+            if token.kind == Tokenizer.LPAREN:
+                stack.append(index)
+            elif token.kind == Tokenizer.RPAREN:
+                if not stack:
+                    raise ValueError(f"Unbalanced parentheses at position {token.start}")
+                pairs[stack.pop()] = index
+        if stack:
+            raise ValueError(f"Unbalanced parentheses at position {tokens[stack[-1]].start}")
+        return pairs
+
+
+if __name__ == "__main__":
+    for token in Tokenizer.tokenize("=IF(A1>=0, SUM(B1:B10), \"none\")"):
+        print(token)
@@ -0,0 +1,303 @@
+"""
+NumPy evaluation of one formula shape over many cells at once.
+
+A filled down formula like =A2*B2+C2 is one template moved down the column,
+so instead of evaluating it cell by cell every reference becomes the column
+slice it covers and the operators run over whole arrays. Only numeric shapes
+are handled: anything else raises NotVectorizable and Evaluator falls back to
+its scalar closures, as it does for the single cells whose results aren't
+finite (Excel errors like #DIV/0! show up as inf or nan here).
+
+A comparison or an IF condition would turn nan into a valid True, False or branch,
+so every operand's non-finite cells are also OR-ed into the environment's errors
+mask on the way up, and the cells in it go to the scalar path whatever they end as.
+
+numpy is imported by this module, Evaluator only loads it when asked to
+evaluate many cells at once.
+"""
+import warnings
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from Models.columns import MAX_COLUMN
+from Models.nodes import ReferenceNode, RangeNode, ConstantNode, FunctionNode, ExpressionNode
+from Models.operator_tree import BinaryNode, UnaryNode, operation_tree
+
+
+class NotVectorizable(Exception):
+    """The formula, or the values it reads, can't be evaluated as arrays."""
+
+
+class VectorEnvironment:
+    """
+    The cells a vectorized formula is evaluated for, as shifts from the cell it was compiled for.
+    column_shift is set when every cell is in the same column, first_row_shift when their rows
+    are consecutive too, then each reference is read as one block through provider.get_range.
+    errors marks the cells an error (a non-finite value) went into along the way.
+    """
+    __slots__ = ('provider', 'sheet_name', 'col_shifts', 'row_shifts', 'size', 'column_shift', 'first_row_shift',
+                 'errors')
+
+    def __init__(self, provider, sheet_name, col_shifts, row_shifts):
+        self.provider = provider
+        self.sheet_name = sheet_name
+        self.col_shifts = np.asarray(col_shifts)
+        self.row_shifts = np.asarray(row_shifts)
+        self.size = len(self.row_shifts)
+        self.column_shift = None
+        self.first_row_shift = None
+        self.errors = np.zeros(self.size, dtype=bool)
+        if self.size and (self.col_shifts == self.col_shifts[0]).all():
+            self.column_shift = int(self.col_shifts[0])
+            if (np.diff(self.row_shifts) == 1).all():
+                self.first_row_shift = int(self.row_shifts[0])
+
+
+class RangeBlock:
+    """The values each cell's range argument covers, one row of values (flattened range) per cell."""
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        self.values = values
+
+
+def numbers(rows, blank=0.0):
+    """
+    The values of a block of cells (a list of rows, or a 2-D array) as a flat float array.
+    Empty cells become blank. Text, booleans and errors compare and coerce differently
+    from numbers in Excel, so those are left to the scalar path.
+    """
+    if isinstance(rows, np.ndarray) and rows.dtype.kind in 'iuf':
+        # a block from a ColumnStore, its empty cells are nan
+        values = rows.astype(float, copy=False).reshape(-1)
+        if blank == blank:
+            values = np.where(np.isnan(values), blank, values)
+        return values
+    flat = []
+    for row in rows:
+        for value in row:
+            if value is None:
+                flat.append(blank)
+            elif type(value) is float or type(value) is int:
+                flat.append(value)
+            else:
+                raise NotVectorizable("a referenced cell isn't a number")
+    return np.array(flat, dtype=float)
+
+
+def check_bounds(environment, min_col, min_row, max_col, max_row):
+    if (min_col + environment.col_shifts.min() < 1 or max_col + environment.col_shifts.max() > MAX_COLUMN
+            or min_row + environment.row_shifts.min() < 1):
+        raise NotVectorizable("a reference moves off the sheet")
+
+
+def compile_formula(tree):
+    """Compile a formula's node tree, raising NotVectorizable when it can't be evaluated as arrays."""
+    if isinstance(tree, ReferenceNode):
+        # =A1 copies an empty cell as empty, there's nothing to gain from arrays anyway
+        raise NotVectorizable("a formula that's just a reference")
+    return compile_node(tree)
+
+
+def compile_node(node):
+    """Compile a node into a closure taking a VectorEnvironment and returning an array per cell."""
+    if isinstance(node, ConstantNode):
+        value = node.value
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise NotVectorizable("only numeric constants are vectorized")
+        return lambda environment: np.full(environment.size, float(value))
+    if isinstance(node, ReferenceNode):
+        return compile_reference(node)
+    if isinstance(node, RangeNode):
+        return compile_range(node)
+    if isinstance(node, FunctionNode):
+        return compile_function(node)
+    if isinstance(node, ExpressionNode):
+        return compile_node(operation_tree(node.components))
+    if isinstance(node, BinaryNode):
+        if node.operator not in binary_operators:
+            raise NotVectorizable(f"{node.operator} isn't vectorized")
+        return binary_closure(binary_operators[node.operator], compile_node(node.left), compile_node(node.right))
+    if isinstance(node, UnaryNode):
+        operand = compile_node(node.operand)
+        if node.operator == '%':
+            return percent_closure(operand)
+        if node.operator == '-':
+            return lambda environment: -scalar(operand(environment))
+        return operand
+    raise NotVectorizable(f"can't vectorize {node!r}")
+
+
+def compile_reference(node, blank=0.0):
+    """
+    A reference's value per cell, empty cells as blank. With blank nan it's read as a one
+    cell range, a RangeBlock, since an empty cell is no number at all to SUM and friends.
+    """
+    sheet_name, column, row = node.sheet_name, node.column, node.row
+
+    def reference(environment):
+        check_bounds(environment, column, row, column, row)
+        sheet = sheet_name or environment.sheet_name
+        if environment.first_row_shift is not None:
+            moved_column = column + environment.column_shift
+            first_row = row + environment.first_row_shift
+            values = numbers(environment.provider.get_range(sheet, moved_column, first_row,
+                                                            moved_column, first_row + environment.size - 1), blank)
+        else:
+            get = environment.provider.get
+            values = numbers([[get(sheet, column + col_shift, row + row_shift)
+                               for col_shift, row_shift in zip(environment.col_shifts.tolist(),
+                                                               environment.row_shifts.tolist())]], blank)
+        return values if blank == blank else RangeBlock(values[:, None])
+    return reference
+
+
+def compile_range(node):
+    sheet_name = node.sheet_name
+    min_col, max_col = sorted((node.start.column, node.end.column))
+    min_row, max_row = sorted((node.start.row, node.end.row))
+    height, width = max_row - min_row + 1, max_col - min_col + 1
+
+    def cell_range(environment):
+        check_bounds(environment, min_col, min_row, max_col, max_row)
+        sheet = sheet_name or environment.sheet_name
+        if environment.first_row_shift is not None:
+            # read the rows every cell's range covers once, each cell's range is then a window of it
+            first_row = min_row + environment.first_row_shift
+            rows = environment.provider.get_range(sheet, min_col + environment.column_shift, first_row,
+                                                  max_col + environment.column_shift,
+                                                  first_row + height + environment.size - 2)
+            # empty cells are nan so the nan aware reductions skip them
+            block = numbers(rows, np.nan).reshape(height + environment.size - 1, width)
+            windows = sliding_window_view(block, (height, width))
+            return RangeBlock(windows.reshape(environment.size, height * width))
+        blocks = [numbers(environment.provider.get_range(sheet, min_col + col_shift, min_row + row_shift,
+                                                          max_col + col_shift, max_row + row_shift), np.nan)
+                  for col_shift, row_shift in zip(environment.col_shifts.tolist(), environment.row_shifts.tolist())]
+        return RangeBlock(np.array(blocks))
+    return cell_range
+
+
+def scalar(argument):
+    if isinstance(argument, RangeBlock):
+        raise NotVectorizable("a range used as a single value")
+    return argument
+
+
+def checked(environment, argument):
+    """A single value per cell, with its non-finite cells (errors) marked in environment.errors."""
+    values = np.asarray(scalar(argument))
+    if values.dtype.kind == 'f':
+        environment.errors |= ~np.isfinite(values)
+    return values
+
+
+def reduce(function, empty):
+    """An aggregate over scalar arguments and range blocks, nan (scalar fallback) where a cell had no numbers."""
+    def aggregate(*arguments):
+        columns = []
+        for argument in arguments:
+            columns.append(argument.values if isinstance(argument, RangeBlock) else argument[:, None])
+        values = np.concatenate(columns, axis=1)
+        result = function(values, axis=1)
+        if empty is not None:
+            result = np.where(np.isnan(values).all(axis=1), empty, result)
+        return result
+    return aggregate
+
+
+def excel_round(value, digits):
+    factor = 10.0 ** digits
+    return np.copysign(np.floor(np.abs(value) * factor + 0.5) / factor, value)
+
+
+# name -> (function over arrays, whether it takes ranges)
+functions = {
+    'SUM': (reduce(np.nansum, None), True),
+    'AVERAGE': (reduce(np.nanmean, None), True),
+    'MIN': (reduce(np.nanmin, 0.0), True),
+    'MAX': (reduce(np.nanmax, 0.0), True),
+    'ABS': (np.abs, False),
+    'INT': (np.floor, False),
+    'SQRT': (np.sqrt, False),
+    'POWER': (np.power, False),
+    'MOD': (lambda value, divisor: np.where(divisor == 0, np.nan, np.mod(value, divisor)), False),
+    'ROUND': (lambda value, digits=None: excel_round(value, 0 if digits is None else digits), False),
+    'IF': (None, False),  # see if_closure
+}
+
+
+def compile_function(node):
+    name = node.name.upper()
+    if name not in functions:
+        raise NotVectorizable(f"{name} isn't vectorized")
+    function, takes_ranges = functions[name]
+    # like Models.evaluator, functions taking ranges read a reference as a one cell range: empty cells are skipped
+    arguments = [compile_reference(argument, blank=np.nan) if takes_ranges and isinstance(argument, ReferenceNode)
+                 else compile_node(argument) for argument in node.arguments]
+    if name == 'IF':
+        if len(arguments) != 3:
+            raise NotVectorizable("IF without both branches")
+        return if_closure(*arguments)
+
+    def call(environment):
+        # a nan argument would just be skipped by nanmax and friends, so it's marked first
+        values = [value if takes_ranges and isinstance(value, RangeBlock) else checked(environment, value)
+                  for value in (argument(environment) for argument in arguments)]
+        # AVERAGE and friends warn about cells with no numbers, those become nan and go to the scalar path
+        with np.errstate(all='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return function(*values)
+    return call
+
+
+binary_operators = {
+    '+': np.add, '-': np.subtract, '*': np.multiply, '/': np.divide, '^': np.power,
+    '=': np.equal, '<>': np.not_equal, '<': np.less, '>': np.greater, '<=': np.less_equal, '>=': np.greater_equal,
+}
+
+
+def binary_closure(operation, left, right):
+    def binary(environment):
+        left_values, right_values = checked(environment, left(environment)), checked(environment, right(environment))
+        with np.errstate(all='ignore'):
+            return operation(left_values, right_values)
+    return binary
+
+
+def if_closure(condition, if_true, if_false):
+    def branch(environment):
+        condition_values = checked(environment, condition(environment)) != 0
+        # an error in a branch only counts for the cells that take it, IF(B1 = 0, 0, A1 / B1) is fine
+        errors = environment.errors
+        branches = []
+        for argument in (if_true, if_false):
+            environment.errors = np.zeros(environment.size, dtype=bool)
+            branches.append((checked(environment, argument(environment)), environment.errors))
+        (true_values, true_errors), (false_values, false_errors) = branches
+        environment.errors = errors | np.where(condition_values, true_errors, false_errors)
+        return np.where(condition_values, true_values, false_values)
+    return branch
+
+
+def percent_closure(operand):
+    return lambda environment: scalar(operand(environment)) / 100
+
+
+def evaluate(closure, provider, sheet_name, col_shifts, row_shifts):
+    """
+    Run a compiled closure for every cell. Returns the values as a list, with None
+    for the cells that ran into an error (a value that wasn't finite) so the caller
+    can evaluate them one by one.
+    """
+    environment = VectorEnvironment(provider, sheet_name, col_shifts, row_shifts)
+    values = np.asarray(closure(environment))
+    if values.shape != (environment.size,):
+        values = np.broadcast_to(values, (environment.size,))
+    errors = environment.errors
+    if values.dtype.kind != 'b':
+        errors = errors | ~np.isfinite(values)
+    results = values.tolist()
+    if errors.any():
+        for index in np.flatnonzero(errors).tolist():
+            results[index] = None
+    return results
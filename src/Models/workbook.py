@@ -0,0 +1,60 @@
+from collections import deque
+from Models.parallel import ParseFailure, iter_parse_many
+from Models.template_cache import template_cache
+
+
+def iter_formula_cells(filename, sheet_names=None):
+    """
+    Yield (sheet_name, cell, formula_str) for every formula in an .xlsx file.
+
+    The workbook is opened in openpyxl's read only mode, which reads the sheets
+    row by row from the file instead of loading them, so memory stays flat
+    however big the workbook is.
+    """
+    from openpyxl import load_workbook  # only needed here, it's slow to import
+
+    workbook = load_workbook(filename, read_only=True)
+    try:
+        for sheet_name in sheet_names or workbook.sheetnames:
+            for row in workbook[sheet_name].iter_rows():
+                for cell in row:
+                    value = cell.value
+                    # array formulas come back as ArrayFormula objects holding the text
+                    value = getattr(value, 'text', value)
+                    if isinstance(value, str) and value.startswith('=') and len(value) > 1:
+                        yield sheet_name, cell.coordinate, value
+    finally:
+        workbook.close()
+
+
+def iter_workbook_formulas(filename, sheet_names=None, workers=1, chunksize=256):
+    """
+    Yield (sheet_name, cell, parsed_formula) for every formula in an .xlsx file, in sheet and row order.
+
+    parsed_formula is the formula's dictionary structure, or a ParseFailure if it
+    couldn't be parsed. With workers=1 formulas are parsed in this process through
+    the template cache, so filled down formulas are only parsed once. More workers
+    hand the parsing to a process pool (see Models.parallel) while this process keeps
+    reading the file, with only a few chunks held in memory at a time.
+    """
+    cells = iter_formula_cells(filename, sheet_names)
+    if workers == 1:
+        for sheet_name, cell, formula in cells:
+            try:
+                parsed = template_cache.parse(formula, cell).to_dict()
+            except Exception as error:
+                parsed = ParseFailure(formula, str(error))
+            yield sheet_name, cell, parsed
+        return
+
+    # iter_parse_many only reads ahead a few chunks, so this queue stays just as short
+    locations = deque()
+
+    def formulas():
+        for sheet_name, cell, formula in cells:
+            locations.append((sheet_name, cell))
+            yield formula
+
+    for parsed in iter_parse_many(formulas(), workers, chunksize):
+        sheet_name, cell = locations.popleft()
+        yield sheet_name, cell, parsed
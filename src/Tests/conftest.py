@@ -0,0 +1,24 @@
+import pytest
+from Models.evaluator import Evaluator, DictCellProvider
+from Models.excel_functions import functions, lazy_functions, pure_functions, range_functions
+
+
+@pytest.fixture
+def make_evaluator():
+    """
+    Builds an Evaluator over a dictionary of cell values keyed by (sheet_name, cell),
+    held in a DictCellProvider or any provider class taking such a dictionary.
+    """
+    def make(values, provider_class=DictCellProvider):
+        return Evaluator(provider_class(values))
+    return make
+
+
+@pytest.fixture
+def restore_functions():
+    """Put the function tables back the way they were once a test that registers functions is done."""
+    saved = dict(functions), dict(lazy_functions), set(pure_functions), set(range_functions)
+    yield
+    for table, contents in zip((functions, lazy_functions, pure_functions, range_functions), saved):
+        table.clear()
+        table.update(contents)
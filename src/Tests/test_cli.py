@@ -0,0 +1,38 @@
+import json
+import pytest
+from Models.cli import main
+from Models.parser import Parser
+
+
+class TestCli:
+
+    def test_jsonl_to_jsonl(self, tmp_path):
+        """ Test one output line per record, with failures written to the errors file. """
+        source = tmp_path / "formulas.jsonl"
+        source.write_text('"=SUM(A1, B1)"\n\n{"formula": "=A1 +", "id": 7}\n{"formula": "=MAX(C1:C3) * 2"}\n')
+        output = tmp_path / "parsed.jsonl"
+        errors = tmp_path / "errors.jsonl"
+        assert main(["parse", str(source), "-o", str(output), "--errors", str(errors)]) == 0
+
+        lines = [json.loads(line) for line in output.read_text().splitlines()]
+        assert lines == [Parser("=SUM(A1, B1)").to_dict(), None, Parser("=MAX(C1:C3) * 2").to_dict()]
+        failure = json.loads(errors.read_text())
+        assert (failure["record"], failure["formula"]) == (2, "=A1 +")
+
+    @pytest.mark.parametrize("jobs", ["1", "2"])
+    def test_csv_input(self, tmp_path, jobs):
+        """ Test reading a CSV column, in process and across workers. """
+        source = tmp_path / "formulas.csv"
+        source.write_text("cell,text\n" + "".join(f"B{row},=A{row} * 2\n" for row in range(1, 101)))
+        output = tmp_path / "parsed.jsonl"
+        assert main(["parse", str(source), "--column", "text", "-o", str(output), "--jobs", jobs, "--chunksize", "16"]) == 0
+        lines = output.read_text().splitlines()
+        assert len(lines) == 100
+        assert json.loads(lines[99])['expression'] == "A100 * 2"
+
+    def test_bad_input(self, tmp_path, capsys):
+        """ Test that unreadable input is reported instead of raising. """
+        source = tmp_path / "formulas.csv"
+        source.write_text("cell,text\nB1,=A1\n")
+        assert main(["parse", str(source), "-o", str(tmp_path / "out.jsonl")]) == 1
+        assert "no 'formula' column" in capsys.readouterr().err
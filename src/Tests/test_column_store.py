@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from Models.column_store import ColumnStore
+from Models.evaluator import Evaluator, DictCellProvider
+from Models.excel_functions import ExcelError
+
+
+class TestColumnStore:
+
+    def values(self):
+        values = {("S", f"A{row}"): row for row in range(1, 11)}
+        values.update({("S", f"B{row}"): row / 2 for row in range(1, 6)})
+        values.update({("S", "C1"): "text", ("S", "C2"): True, ("S", "C3"): ExcelError('#N/A'), ("S", "C4"): 4})
+        return values
+
+    def test_set_and_get(self):
+        """ Test that values come back the way they went in, numbers as floats. """
+        store = ColumnStore(self.values())
+        assert store.get("S", 1, 3) == 3.0
+        assert store.get("S", 3, 1) == "text"
+        assert store.get("S", 3, 2) is True
+        assert store.get("S", 2, 8) is None
+        assert store.get("S", 50, 5000) is None
+        assert store.get("Other", 1, 1) is None
+        store.set("S", "C1", 7)
+        store.set("S", "A1", None)
+        assert store.get("S", 3, 1) == 7.0 and store.get("S", 1, 1) is None
+
+    def test_ranges_are_views(self):
+        """ Test that a numeric column range is a view into the store and mixed ones fall back to rows. """
+        store = ColumnStore(self.values())
+        column = store.get_range("S", 1, 2, 1, 9)
+        assert column.shape == (8, 1) and np.shares_memory(column, store.sheets["S"][1].values)
+        block = store.get_range("S", 1, 2, 2, 9)
+        assert isinstance(block, np.ndarray) and block.shape == (8, 2)
+        assert block[:, 0].tolist() == column.ravel().tolist() and np.isnan(block[7, 1])
+        assert store.get_range("S", 2, 1, 3, 2) == [[0.5, "text"], [1.0, True]]
+        assert store.get_range("S", 1, 9, 1, 12).tolist()[:2] == [[9.0], [10.0]]
+
+    def test_bulk_loading(self):
+        """ Test loading whole columns and blocks at once. """
+        store = ColumnStore()
+        store.set_column("S", "A", 1, np.arange(1, 100001))
+        store.set_column("S", "B", 1, [1, "x", None, 2.5])
+        store.set_block("S", "C1", np.ones((3, 2)))
+        assert store.get("S", 1, 100000) == 100000.0
+        assert [store.get("S", 2, row) for row in range(1, 5)] == [1.0, "x", None, 2.5]
+        store.set_block("S", "B2", np.zeros((1, 1)))
+        assert store.get("S", 2, 2) == 0.0 and not store.sheets["S"][2].others
+        assert Evaluator(store).evaluate("=SUM(A1:A100000) + SUM(C1:D3)", "S") == 5000050000 + 6
+
+    def test_columns_grow_on_their_own(self):
+        """ Test that a cell far out only grows its own column, and NumPy scalars are stored as numbers. """
+        store = ColumnStore({("S", "A1"): 1})
+        store.set("S", "XFD1048576", np.float64(2.5))
+        store.set_column("S", "B", 1, [np.int64(3), np.float32(0.5), None])
+        assert [len(column.values) for column in store.sheets["S"].values()] == [1, 1048576, 4]
+        assert store.get("S", 16384, 1048576) == 2.5 and store.get("S", 2, 1) == 3.0
+        assert not any(column.others for column in store.sheets["S"].values())
+        assert isinstance(store.get_range("S", 2, 1, 2, 3), np.ndarray)
+        store.set("S", "B2", np.bool_(True))
+        assert store.get_range("S", 2, 1, 2, 2) == [[3.0], [True]]
+
+    @pytest.mark.parametrize("formula", [
+        "=SUM(A1:B10)", "=AVERAGE(A1:B10)", "=MIN(B1:B10) + MAX(A1:A10)", "=COUNT(A1:C10)",
+        "=COUNTA(A1:B20)", "=PRODUCT(B1:B10)", "=SUM(A1:C4)", "=CONCAT(B1:B3)", "=AVERAGE(D1:D5)",
+    ])
+    def test_matches_dict_provider(self, formula):
+        """ Test that formulas evaluate the same over the store as over a dictionary. """
+        values = self.values()
+        assert Evaluator(ColumnStore(values)).evaluate(formula, "S") == Evaluator(DictCellProvider(values)).evaluate(formula, "S")
+
+    def test_fill_down_over_store(self):
+        """ Test vectorized fill down reading its columns straight from the store. """
+        store = ColumnStore()
+        store.set_column("S", "A", 1, np.arange(1.0, 1001.0))
+        store.set("S", "A500", None)
+        evaluator = Evaluator(store)
+        values = evaluator.evaluate_fill_down("=A1 * 2 + SUM(A1:A2)", "S", "B1", 999)
+        assert values == [evaluator.evaluate(f"=A{row} * 2 + SUM(A{row}:A{row + 1})", "S", f"B{row}")
+                          for row in range(1, 1000)]
@@ -0,0 +1,71 @@
+import pytest
+from Models.column_store import ColumnStore
+from Models.criteria import parse_criterion, Criterion
+from Models.evaluator import DictCellProvider
+from Models.excel_functions import ExcelError
+
+
+# A: region, B: amount, C: units
+cells = {}
+for row, (region, amount, units) in enumerate([("north", 100, 1), ("South", 250, 2), ("north", 50, 3),
+                                               ("east", None, 4), ("NORTH", 20, "n/a"), (None, 5, 6),
+                                               ("n*th", 1000, True)], start=1):
+    cells.update({("S", f"A{row}"): region, ("S", f"B{row}"): amount, ("S", f"C{row}"): units})
+
+
+class TestCriteria:
+
+    @pytest.mark.parametrize("criterion, expected", [
+        (">=100", Criterion('>=', 'number', 100.0)),
+        ("<>north", Criterion('<>', 'text', 'north')),
+        ("=", Criterion('=', 'blank', None)),
+        ("TRUE", Criterion('=', 'bool', True)),
+        (True, Criterion('=', 'bool', True)),
+        (1, Criterion('=', 'number', 1)),
+        ("n~*th", Criterion('=', 'text', 'n*th')),
+    ])
+    def test_parse_criterion(self, criterion, expected):
+        """ Test parsing criteria values. """
+        assert parse_criterion(criterion) == expected
+        assert parse_criterion("A*").kind == 'pattern'
+
+    @pytest.mark.parametrize("formula, expected", [
+        ('=SUMIF(A1:A7, "north", B1:B7)', 170),
+        ('=SUMIF(A1:A7, "n*", B1:B7)', 1170),
+        ('=SUMIF(A1:A7, "n~*th", B1:B7)', 1000),
+        ('=SUMIF(A1:A7, "?outh", B1:B7)', 250),
+        ('=SUMIF(B1:B7, ">=100")', 1350),
+        ('=SUMIF(A1:A7, "<>north", B1)', 1255),
+        ('=SUMIF(A1:A7, "west", B1:B7)', 0),
+        ('=SUMIFS(B1:B7, A1:A7, "north", C1:C7, ">1")', 50),
+        ('=COUNTIF(A1:A7, "north")', 3),
+        ('=COUNTIF(A1:A7, "")', 1),
+        ('=COUNTIF(A1:C7, "<>")', 19),
+        ('=COUNTIF(C1:C7, TRUE)', 1),
+        ('=COUNTIF(C1:C7, "<4")', 3),
+        ('=COUNTIFS(A1:A7, "north", B1:B7, "<100")', 2),
+        ('=AVERAGEIF(A1:A7, "north", B1:B7)', 170 / 3),
+        ('=AVERAGEIFS(B1:B7, A1:A7, "east")', ExcelError('#DIV/0!')),
+        ('=AVERAGEIFS(B1:B7, A1:A7, "*", C1:C7, ">=2")', 150),
+        ('=COUNTIFS(A1:A7, "north", B1:B2, ">0")', ExcelError('#VALUE!')),
+    ])
+    def test_conditional_aggregates(self, make_evaluator, formula, expected):
+        """ Test the conditional aggregates over dictionary and columnar providers. """
+        for provider_class in (DictCellProvider, ColumnStore):
+            value = make_evaluator(cells, provider_class).evaluate(formula, "S")
+            assert value == (expected if isinstance(expected, ExcelError) else pytest.approx(expected)), provider_class
+
+    def test_shared_group_index(self, make_evaluator):
+        """ Test that a column of SUMIFs over the same ranges reads them once, and sees changes. """
+        evaluator = make_evaluator(cells)
+        regions = ["north", "south", "east", "NORTH", "west"]
+        values = [evaluator.evaluate(f'=SUMIF(A1:A7, "{region}", B1:B7)', "S") for region in regions]
+        assert values == [170, 250, 0, 170, 0]
+        assert len(evaluator.lookups) == 2
+        evaluator.provider.set("S", "B3", 1)
+        evaluator.invalidate("S", "B3")
+        assert evaluator.evaluate('=SUMIF(A1:A7, "north", B1:B7)', "S") == 121
+        evaluator.provider.set("S", "B2", ExcelError('#N/A'))
+        evaluator.invalidate("S", "B2")
+        assert evaluator.evaluate('=SUMIF(A1:A7, "south", B1:B7)', "S") == ExcelError('#N/A')
+        assert evaluator.evaluate('=SUMIF(A1:A7, "north", B1:B7)', "S") == 121
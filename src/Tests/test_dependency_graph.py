@@ -0,0 +1,61 @@
+import pytest
+from openpyxl import Workbook
+from Models.dependency_graph import DependencyGraph, Cell, Area
+from Models.parser import Parser
+
+
+class TestDependencyGraph:
+
+    def build(self):
+        graph = DependencyGraph()
+        graph.add_formula("Data", "C1", "=A1 * B1")
+        graph.add_formula("Data", "C2", "=SUM(A1:A1000000)")
+        graph.add_formula("Data", "D1", "=C1 + C2")
+        graph.add_formula("Summary", "A1", "=MAX('Data'!D1, 'Data'!B5:B9)")
+        return graph
+
+    def test_precedents(self):
+        """ Test that references become cells and ranges stay one rectangle. """
+        graph = self.build()
+        assert graph.precedents("Data", "C1") == [Area("Data", 1, 1, 1, 1), Area("Data", 2, 1, 2, 1)]
+        assert graph.precedents("Data", "C2") == [Area("Data", 1, 1, 1, 1000000)]
+        assert [str(area) for area in graph.precedents("Summary", "A1")] == ["'Data'!D1", "'Data'!B5:B9"]
+        assert graph.precedents("Data", "A1") == []
+
+    def test_dependents(self):
+        """ Test dependents through references, ranges and other sheets. """
+        graph = self.build()
+        assert graph.dependents("Data", "A1") == {Cell("Data", 3, 1), Cell("Data", 3, 2)}
+        assert graph.dependents("Data", "A999999") == {Cell("Data", 3, 2)}
+        assert graph.dependents("Data", "B7") == {Cell("Summary", 1, 1)}
+        assert graph.dependents("Data", "B10") == set()
+        assert graph.dependents("Summary", "B7") == set()
+        assert graph.all_dependents("Data", "A1") == {Cell("Data", 3, 1), Cell("Data", 3, 2),
+                                                      Cell("Data", 4, 1), Cell("Summary", 1, 1)}
+
+    def test_replace_and_remove(self):
+        """ Test that replacing a formula drops its old edges. """
+        graph = self.build()
+        graph.add_formula("Data", "C2", Parser("=B1").to_dict())
+        assert graph.dependents("Data", "A5") == set()
+        assert Cell("Data", 3, 2) in graph.dependents("Data", "B1")
+        graph.remove_formula("Data", "C2")
+        assert graph.dependents("Data", "B1") == {Cell("Data", 3, 1)}
+        assert len(graph) == 3
+        # only the Summary sheet's range is left
+        assert list(graph.range_indexes["Data"].items()) == [((2, 5, 2, 9), Cell("Summary", 1, 1))]
+
+    def test_invalid_cell(self):
+        with pytest.raises(ValueError):
+            DependencyGraph().dependents("Data", "not a cell")
+
+    def test_from_workbook(self, tmp_path):
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.title = "Data"
+        sheet["B1"] = "=SUM(A1:A10)"
+        sheet["B2"] = "=B1 * 2"
+        path = tmp_path / "book.xlsx"
+        workbook.save(path)
+        graph = DependencyGraph.from_workbook(path)
+        assert graph.all_dependents("Data", "A3") == {Cell("Data", 2, 1), Cell("Data", 2, 2)}
@@ -0,0 +1,159 @@
+import pytest
+import Models.evaluator as evaluator_module
+from Models.evaluator import Evaluator, DictCellProvider, CellProvider
+from Models.excel_functions import ExcelError
+from Models.parser import Parser
+
+
+cells = {
+    ("Data", "A1"): 2, ("Data", "A2"): 3, ("Data", "A3"): "text", ("Data", "A4"): True,
+    ("Data", "B1"): 10, ("Data", "B2"): 20, ("Data", "C1"): ExcelError('#N/A'),
+    ("Other", "A1"): 100,
+}
+
+
+class TestEvaluator:
+
+    @pytest.mark.parametrize("formula, expected", [
+        ("=1 + 2 * 3", 7),
+        ("=(1 + 2) * 3", 9),
+        ("=-2^2", 4),
+        ("=2^3^2", 64),
+        ("=50%", 0.5),
+        ("=-A1 + B1", 8),
+        ("=10 / 4 - 1", 1.5),
+        ('="a" & 1 + 2', "a3"),
+        ("=1 + 2 = 3", True),
+        ('="abc" < "ABD"', True),
+        ("=A1 >= 2", True),
+        ("=A5 + 1", 1),
+    ])
+    def test_operators(self, make_evaluator, formula, expected):
+        """ Test Excel's precedence and operator rules. """
+        assert make_evaluator(cells).evaluate(formula, "Data") == expected
+
+    @pytest.mark.parametrize("formula, expected", [
+        ("=SUM(A1:B2)", 35),
+        ("=SUM(A1:A4, 1)", 6),
+        ("=AVERAGE(A1:A2)", 2.5),
+        ("=MAX(A1:B2) - MIN(A1:B2)", 18),
+        ("=COUNT(A1:A5)", 2),
+        ("=COUNTA(A1:A5)", 4),
+        ("=IF(A1 > 5, 1/0, \"small\")", "small"),
+        ("=IFERROR(C1, 0)", 0),
+        ("=ROUND(2.5, 0) + ROUND(-1.25, 1)", 1.7),
+        ("=AND(A4, A1 > 1)", True),
+        ("=CONCATENATE(UPPER(A3), LEN(A3))", "TEXT4"),
+        ("=SUM('Other'!A1, A1)", 102),
+        # a reference is read like a one cell range, only a literal is coerced
+        ("=COUNT(A5)", 0),
+        ("=AVERAGE(A1, A5)", 2),
+        ("=MIN(A1, A5)", 2),
+        ("=SUM(A1, A3, A4)", 2),
+        ('=SUM(A1, TRUE, "3")', 6),
+        ("=COUNT(A1, A3, 1)", 2),
+    ])
+    def test_functions(self, make_evaluator, formula, expected):
+        """ Test the built in functions against a dictionary of cell values. """
+        assert make_evaluator(cells).evaluate(formula, "Data") == pytest.approx(expected)
+
+    @pytest.mark.parametrize("formula, code", [
+        ("=1 / 0", '#DIV/0!'),
+        ("=A3 * 2", '#VALUE!'),
+        ("=C1 + 1", '#N/A'),
+        ("=SUM(B1:C1)", '#N/A'),
+        ("=NOSUCHFUNCTION(1)", '#NAME?'),
+        ("=ABS(1, 2)", '#VALUE!'),
+        ("=7 ^ 300000000", '#NUM!'),
+        ("=POWER(A1, 300000000)", '#NUM!'),
+        ("=(-8) ^ 0.5", '#NUM!'),
+        ("=IF()", '#VALUE!'),
+        ("=IFERROR(A1)", '#VALUE!'),
+        ("=IF(A1, 1, 2, 3)", '#VALUE!'),
+        ("=VLOOKUP(A1, B1:B2)", '#VALUE!'),
+    ])
+    def test_errors(self, make_evaluator, formula, code):
+        """ Test that errors come back as values instead of raising. """
+        assert make_evaluator(cells).evaluate(formula, "Data") == ExcelError(code)
+
+    def test_compiled_once_per_template(self, monkeypatch):
+        """ Test that a filled down column folds and compiles one closure and moves its references. """
+        evaluator = Evaluator(DictCellProvider({("S", f"A{row}"): row for row in range(1, 11)}))
+        compiles = []
+        original_fold = evaluator_module.fold
+        monkeypatch.setattr(evaluator_module, "fold", lambda tree: compiles.append(tree) or original_fold(tree))
+        values = [evaluator.evaluate(f"=A{row} * 2 + SUM(A{row}:A{row + 1})", "S", f"B{row}") for row in range(1, 10)]
+        assert values == [row * 2 + row + row + 1 for row in range(1, 10)]
+        assert len(compiles) == 1
+        assert evaluator.evaluate("=A1 * 2", "S") == 2
+        assert evaluator.evaluate("=A1", "S", "B1") == 1
+
+    def test_custom_provider_and_function(self, restore_functions):
+        """ Test plugging in a provider and a function. """
+        class Squares(CellProvider):
+            def get(self, sheet_name, column, row):
+                return row * row
+        Evaluator.register_function("DOUBLE", lambda value: value * 2)
+        evaluator = Evaluator(Squares())
+        assert evaluator.evaluate("=DOUBLE(SUM(A1:A3))") == 28
+        assert evaluator.evaluate(Parser("=A3 - A2").tree) == 5
+
+    def fill_down_evaluator(self):
+        values = {("S", f"A{row}"): float(row) for row in range(1, 41)}
+        values.update({("S", f"B{row}"): row % 5 for row in range(1, 41)})
+        values.update({("S", f"D{row}"): row * 1.5 for row in range(2, 41, 2)})
+        return Evaluator(DictCellProvider(values))
+
+    @pytest.mark.parametrize("template", [
+        "=A{row} * 2 + B{row}",
+        "=A{row} / B{row}",
+        "=ROUND(A{row} / 3, 1) - -B{row}%",
+        "=IF(B{row} > 2, SUM(A{row}:B{next}), MAX(A{row}:A{next}))",
+        "=AVERAGE(B{row}:B{next}) ^ 2",
+        "=MIN(B{row}, D{row}) + AVERAGE(A{row}, D{row}) + SUM(D{row}, D{next})",
+    ])
+    def test_fill_down_matches_scalar(self, template):
+        """ Test that the vectorized fill down gives the same values as evaluating each cell. """
+        evaluator = self.fill_down_evaluator()
+        formula = template.format(row=1, next=2)
+        vectorized = evaluator.evaluate_fill_down(formula, "S", "C1", 30)
+        scalar = [evaluator.evaluate(template.format(row=row, next=row + 1), "S", f"C{row}") for row in range(1, 31)]
+        for value, expected in zip(vectorized, scalar):
+            assert value == (expected if isinstance(expected, ExcelError) else pytest.approx(expected))
+        # compiled for arrays, not left to the scalar fallback
+        assert evaluator.compiled_entry(formula, "C1")[0][4]
+
+    @pytest.mark.parametrize("template", [
+        "=IF(A{row} / B{row} > 1, 1, 2)",
+        "=A{row} / B{row} > 1",
+        "=MOD(A{row}, B{row}) = 0",
+        "=SQRT(-A{row}) < 1",
+        "=MAX(A{row} / B{row}, 1)",
+        "=IF(B{row} = 0, 0, A{row} / B{row})",
+    ])
+    def test_fill_down_errors_inside(self, template):
+        """ Test that errors reaching a comparison, an IF condition or an aggregate aren't turned into values. """
+        evaluator = self.fill_down_evaluator()
+        formula = template.format(row=1)
+        vectorized = evaluator.evaluate_fill_down(formula, "S", "C1", 30)
+        scalar = [evaluator.evaluate(template.format(row=row), "S", f"C{row}") for row in range(1, 31)]
+        assert vectorized == scalar
+        assert evaluator.compiled_entry(formula, "C1")[0][4]
+        if "SQRT" in template:
+            assert all(value == ExcelError('#NUM!') for value in vectorized)
+        elif "B{row} = 0" in template:
+            assert not any(isinstance(value, ExcelError) for value in vectorized)
+        else:
+            assert ExcelError('#DIV/0!') in vectorized
+
+    def test_evaluate_many_falls_back(self):
+        """ Test grouping by template, text cells and formulas numpy can't run go through the scalar path. """
+        evaluator = self.fill_down_evaluator()
+        evaluator.provider.set("S", "A7", "text")
+        cells = [(f"C{row}", f"=A{row} + 1") for row in range(1, 31)]
+        cells += [(f"D{row}", f'=A{row} & "!"') for row in range(1, 21)]
+        cells += [("E1", "=A1 * 2"), ("E9", "=A9 * 2")]
+        values = evaluator.evaluate_many(reversed(cells), "S", min_group=2)
+        expected = [evaluator.evaluate(formula, "S", cell) for cell, formula in reversed(cells)]
+        assert values == expected
+        assert ExcelError('#VALUE!') in values and "text!" in values
@@ -44,6 +44,9 @@ class TestExpression:
         expected_components = ['A1', '+', 'B1', '-', 'C1', '*', {'expression': ['D1', '/', 'E1']}]
         assert expression.expression == expected_components
 
+        expression = Expression("SUM(A1, B1) >= -2")
+        assert expression.expression == ['SUM(A1, B1)', '>=', '-', '2']
+
     def test_expression_to_dict(self):
         """ Test the dictionary output of the expression """
         expr = "A1 + B1"
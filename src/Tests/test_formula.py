@@ -0,0 +1,25 @@
+import pytest
+from Models.formula import Formula
+
+
+class TestFormula:
+
+    def test_string_round_trip(self):
+        """ Test that a Formula turns back into an Excel friendly string. """
+        formula = Formula("=SUM(A1, A2)")
+        assert str(formula) == "=SUM(A1, A2)"
+        assert formula.parsed_formula['components']['name'] == "SUM"
+
+    def test_translate(self):
+        """ Test translating a formula as shown in the README. """
+        formula = Formula("=SUM(A1, A2)")
+        formula.translate(input_cell="A1", output_cell="C3")
+        assert str(formula) == "=SUM(C3, C4)"
+        assert formula.parsed_formula['function'] == "SUM(C3, C4)"
+
+    def test_invalid_input(self):
+        """ Test that non formula input raises a ValueError. """
+        with pytest.raises(ValueError):
+            Formula(42)
+        with pytest.raises(ValueError):
+            Formula("SUM(A1, A2)")
@@ -33,6 +33,9 @@ class TestFunction:
         with pytest.raises(ValueError):
             Function("MISSINGPARENTHESIS")
 
+        with pytest.raises(ValueError):
+            Function("SUM(A1) + SUM(B1)")  # Two calls joined by an operator, not one function.
+
 
     def test_function_string_representation(self):
         """Test the string representation of the function."""
@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+# Generous enough for a slow CI box, but pandas or openpyxl on their own blow through it
+IMPORT_BUDGET_SECONDS = 0.25
+SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import Models.formula, Models.parser, Models.range, Models.reference, Models.function
+import Models.expression, Models.constant, Models.model_types, Models.template_cache, Models.parallel
+import Models.workbook, Models.dependency_graph, Models.range_index, Models.evaluator, Models.recalculation
+import Models.lookup, Models.criteria, Models.operator_tree, Models.simplify
+elapsed = time.perf_counter() - start
+print(elapsed, 'pandas' in sys.modules, 'openpyxl' in sys.modules)
+"""
+
+
+class TestImportTime:
+
+    def import_models(self):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT], cwd=SOURCE_DIR,
+                                capture_output=True, text=True, check=True).stdout.split()
+        return float(output[0]), output[1] == 'True', output[2] == 'True'
+
+    def test_heavy_dependencies_are_deferred(self):
+        """ Test that importing the models doesn't load pandas or openpyxl. """
+        _, pandas_loaded, openpyxl_loaded = self.import_models()
+        assert not pandas_loaded, "pandas should only be imported when a DataFrame is asked for"
+        assert not openpyxl_loaded, "openpyxl isn't needed to parse formulas"
+
+    def test_import_time_budget(self):
+        """ Test that importing the models stays within the import time budget. """
+        # best of a few runs so a busy machine doesn't make this flaky
+        elapsed = min(self.import_models()[0] for _ in range(3))
+        assert elapsed < IMPORT_BUDGET_SECONDS, f"Importing the models took {elapsed:.3f}s"
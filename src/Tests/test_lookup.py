@@ -0,0 +1,72 @@
+import pytest
+from Models.column_store import ColumnStore
+from Models.evaluator import DictCellProvider
+from Models.excel_functions import ExcelError
+from Models.recalculation import Recalculator
+
+
+# A: ids, B: names, C: sorted scores, E1:H2 a horizontal table
+cells = {}
+for row, (identifier, name, score) in enumerate([(3, "carol", 10), (1, "alice", 20), (2, "Bob", 20),
+                                                 (1, "again", 35), ("x", "text id", 50)], start=1):
+    cells.update({("S", f"A{row}"): identifier, ("S", f"B{row}"): name, ("S", f"C{row}"): score})
+for column, (key, value) in zip("EFGH", [(10, "low"), (20, "mid"), (30, "high"), (40, "top")]):
+    cells.update({("S", f"{column}1"): key, ("S", f"{column}2"): value})
+
+
+class TestLookup:
+
+    @pytest.mark.parametrize("formula, expected", [
+        ("=VLOOKUP(1, A1:C5, 2, FALSE)", "alice"),
+        ('=VLOOKUP("X", A1:C5, 3, FALSE)', 50),
+        ("=VLOOKUP(4, A1:C5, 2, FALSE)", ExcelError('#N/A')),
+        ("=VLOOKUP(1, A1:C5, 4, FALSE)", ExcelError('#REF!')),
+        ("=VLOOKUP(25, C1:C5, 1)", 20),
+        ("=HLOOKUP(25, E1:H2, 2)", "mid"),
+        ("=HLOOKUP(30, E1:H2, 2, FALSE)", "high"),
+        ('=MATCH("bob", B1:B5, 0)', 3),
+        ("=MATCH(20, C1:C5)", 3),
+        ("=MATCH(5, C1:C5)", ExcelError('#N/A')),
+        ("=MATCH(35, E1:H1, 1)", 3),
+        ("=MATCH(1, A1:C5, 0)", ExcelError('#N/A')),
+        ("=XLOOKUP(1, A1:A5, B1:B5)", "alice"),
+        ("=XLOOKUP(1, A1:A5, B1:B5, \"none\", 0, -1)", "again"),
+        ('=XLOOKUP(9, A1:A5, B1:B5, "none")', "none"),
+        ('=XLOOKUP(25, C1:C5, B1:B5, "none", 1)', "again"),
+        ('=XLOOKUP(25, C1:C5, B1:B5, "none", -1)', "alice"),
+        ('=XLOOKUP(25, E1:H1, E2:H2, "none", 1)', "high"),
+        ("=SUM(XLOOKUP(2, A1:A5, B1:C5))", 20),
+        ("=IFERROR(VLOOKUP(9, A1:B5, 2, FALSE), \"missing\")", "missing"),
+    ])
+    def test_lookups(self, make_evaluator, formula, expected):
+        """ Test the lookup functions over dictionary and columnar providers. """
+        for provider_class in (DictCellProvider, ColumnStore):
+            value = make_evaluator(cells, provider_class).evaluate(formula, "S")
+            assert value == expected, provider_class
+
+    def test_indexes_are_shared_and_invalidated(self, make_evaluator):
+        """ Test that lookups into one column build one index, and changing a cell drops it. """
+        evaluator = make_evaluator(cells)
+        assert evaluator.evaluate("=VLOOKUP(2, A1:C5, 2, FALSE)", "S") == "Bob"
+        assert evaluator.evaluate("=MATCH(3, A1:A5, 0) + MATCH(2, A1:A9, 0)", "S") == 4
+        assert len(evaluator.lookups) == 2
+        evaluator.provider.set("S", "A3", 7)
+        evaluator.invalidate("S", "A3")
+        assert len(evaluator.lookups) == 0
+        assert evaluator.evaluate("=VLOOKUP(7, A1:C5, 2, FALSE)", "S") == "Bob"
+        evaluator.invalidate("S", "Z100")
+        assert len(evaluator.lookups) == 1
+
+    def test_lookups_recalculate(self):
+        """ Test a filled down column of lookups against a table the Recalculator keeps up to date. """
+        model = Recalculator()
+        for row in range(1, 201):
+            model.set_value("S", f"A{row}", row)
+            model.set_formula("S", f"B{row}", f"=A{row} * 2")
+            model.set_formula("S", f"C{row}", f"=VLOOKUP({201 - row}, A1:B200, 2, FALSE)")
+        model.recalculate()
+        assert [model.value("S", f"C{row}") for row in (1, 200)] == [400, 2]
+        model.set_value("S", "A50", 1000)
+        model.recalculate()
+        assert model.value("S", "B50") == 2000
+        assert model.value("S", "C151") == ExcelError('#N/A')
@@ -0,0 +1,71 @@
+import importlib
+import pytest
+from Models.model_types import Types
+from Models.nodes import Node, node_from_dict
+from Models.reference import Reference
+from Models.function import Function
+
+
+class TestTypes:
+
+    def test_get_type(self):
+        """ Test that kinds map to the model classes, whatever their case. """
+        assert Types('reference').get_type() is Reference
+        assert Types('Function').get_type() is Function
+        with pytest.raises(ValueError):
+            Types('').get_type()
+        with pytest.raises(ImportError):
+            Types('not_a_type').get_type()
+
+    def test_lookups_skip_the_import_machinery(self, monkeypatch):
+        """ Test that once loaded, lookups are plain dictionary hits. """
+        Types.lookup('reference')  # make sure the defaults are loaded
+
+        def fail(*args, **kwargs):
+            raise AssertionError("import_module shouldn't be called per lookup")
+
+        monkeypatch.setattr(importlib, 'import_module', fail)
+        monkeypatch.setattr('Models.model_types.import_module', fail)
+        function = Function.from_dict({
+            "function": "SUM(A1, 1)",
+            "components": {"name": "SUM", "arguments": [
+                {"reference": "A1", "components": {"sheet_name": None, "column_letter": "A",
+                                                   "row_number": 1, "column_number": 1}},
+                {"constant": 1}
+            ]}
+        })
+        assert str(function) == "SUM(A1, 1)"
+
+    def test_custom_node_registration(self, monkeypatch):
+        """ Test that custom node types can be plugged into node_from_dict. """
+        monkeypatch.setattr(Types, 'node_registry', dict(Types.node_registry))
+
+        @Types.register_node
+        class NameNode(Node):
+            __slots__ = ('name',)
+            kind = 'name'
+
+            def __init__(self, name):
+                self.name = name
+
+            @staticmethod
+            def from_dict(data):
+                return NameNode(data['name'])
+
+            def to_dict(self):
+                return {"name": self.name}
+
+            def __str__(self):
+                return self.name
+
+        node = node_from_dict({"name": "TaxRate"})
+        assert isinstance(node, NameNode)
+        assert str(node) == "TaxRate"
+        with pytest.raises(ValueError):
+            node_from_dict({"unknown": 1})
+
+    def test_custom_model_registration(self, monkeypatch):
+        """ Test that model classes can be registered for new kinds. """
+        monkeypatch.setattr(Types, 'registry', dict(Types.registry))
+        Types.register('Name', str)
+        assert Types.lookup('name') is str
@@ -0,0 +1,75 @@
+import pytest
+from Models.nodes import (ReferenceNode, RangeNode, ConstantNode, OperatorNode,
+                          FunctionNode, ExpressionNode, node_from_dict)
+from Models.parser import Parser
+
+
+class TestNodes:
+
+    def test_nodes_use_slots(self):
+        """ Test that nodes don't carry a per instance __dict__. """
+        nodes = [ReferenceNode(None, 1, 1), RangeNode(ReferenceNode(None, 1, 1), ReferenceNode(None, 2, 2)),
+                 ConstantNode(1), OperatorNode('+'), FunctionNode('SUM', []), ExpressionNode([])]
+        for node in nodes:
+            assert not hasattr(node, '__dict__'), f"{type(node).__name__} should only use __slots__"
+
+    def test_reference_stores_integers(self):
+        """ Test that references keep integer coordinates and build the dict on demand. """
+        node = ReferenceNode.from_string("'Sheet1'!AB12")
+        assert (node.sheet_name, node.column, node.row) == ("Sheet1", 28, 12)
+        assert node.to_dict() == {
+            "reference": "'Sheet1'!AB12",
+            "components": {"sheet_name": "Sheet1", "column_letter": "AB", "row_number": 12, "column_number": 28}
+        }
+        with pytest.raises(ValueError):
+            ReferenceNode(None, 0, 1)
+
+    def test_dict_round_trip(self):
+        """ Test that node_from_dict rebuilds the same tree Parser produced. """
+        parsed = Parser('=IF(A1 >= 2, SUM(B1:B3) * (C1 + 1), "no")').to_dict()
+        tree = node_from_dict(parsed)
+        assert isinstance(tree, FunctionNode)
+        assert tree.to_dict() == parsed
+
+    def test_translated_returns_new_nodes(self):
+        """ Test that translating leaves the original tree untouched. """
+        tree = Parser("=SUM(A1:B2, C3)").tree
+        moved = tree.translated(1, 2)
+        assert str(moved) == "SUM(B3:C4, D5)"
+        assert str(tree) == "SUM(A1:B2, C3)"
+        with pytest.raises(ValueError):
+            tree.translated(-1, 0)
+
+    def test_translated_shares_untouched_subtrees(self):
+        """ Test that parts of the tree without references aren't copied. """
+        tree = Parser('=IF(A1 > 0, MAX(1, 2), "no")').tree
+        moved = tree.translated(0, 1)
+        assert moved is not tree
+        assert moved.arguments[1] is tree.arguments[1]
+        assert moved.arguments[2] is tree.arguments[2]
+
+    def test_shift_in_place(self):
+        """ Test that shift moves a private tree's coordinates directly. """
+        tree = node_from_dict(Parser("=SUM(A1:B2, C3)").to_dict())
+        tree.shift(1, 2)
+        assert str(tree) == "SUM(B3:C4, D5)"
+        with pytest.raises(ValueError):
+            tree.shift(0, -10)
+
+    def test_source_spans(self):
+        """ Test that nodes record where they came from and edits only regenerate what moved. """
+        tree = Parser("=SUM( A1:B2 ,C3)+1").tree
+        function = tree.components[0]
+        assert (function.span.start, function.span.end) == (0, 15)
+        assert function.arguments[0].end.source_text() == "B2"
+        moved = tree.translated(0, 1)
+        assert moved.span.edited and not moved.components[2].span.edited
+        assert moved.source_text() == "SUM( A2:B3 ,C4)+1"
+        # trees built from dictionaries have no source and are regenerated
+        assert node_from_dict(tree.to_dict()).source_text() == "SUM(A1:B2, C3) + 1"
+
+    def test_display_strings(self):
+        """ Test display strings and reconstructed formula text. """
+        tree = Parser("=IF(A1>0, (B1+2)*C1, TRUE)").tree
+        assert str(tree) == "IF(A1 > 0, (B1 + 2) * C1, TRUE)"
+        assert tree.to_formula() == "IF((A1 > 0), ((B1 + 2) * C1), TRUE)"
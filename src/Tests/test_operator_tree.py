@@ -0,0 +1,69 @@
+import pytest
+from Models.dependency_graph import DependencyGraph
+from Models.evaluator import Evaluator, DictCellProvider
+from Models.nodes import FunctionNode, ReferenceNode
+from Models.operator_tree import BinaryNode, UnaryNode, binary_tree, flattened
+from Models.parser import Parser
+
+
+class TestOperatorTree:
+
+    @pytest.mark.parametrize("formula, expected", [
+        ("=1 + 2 * 3", "(1 + (2 * 3))"),
+        ("=(1 + 2) * 3", "((1 + 2) * 3)"),
+        ("=2 ^ 3 ^ 2", "((2 ^ 3) ^ 2)"),
+        ("=-2 ^ 2", "((-2) ^ 2)"),
+        ("=-A1%", "(-(A1%))"),
+        ("=A1 >= B1 & \"x\"", "(A1 >= (B1 & \"x\"))"),
+        ("=A1 <> 1 + 2", "(A1 <> (1 + 2))"),
+        ("=10 - 4 - 3", "((10 - 4) - 3)"),
+        ("=1 - -2", "(1 - (-2))"),
+        ("=SUM(A1:A3, 2 * (3 + 4))", "SUM(A1:A3, (2 * (3 + 4)))"),
+    ])
+    def test_precedence(self, formula, expected):
+        """ Test that the tree nests operators by Excel's precedence. """
+        assert Parser(formula).binary_tree.to_formula() == expected
+
+    def test_node_structure(self):
+        """ Test the node types the tree is built from, and that operands are shared with the parse tree. """
+        parser = Parser("=-A1 + B1 * 2%")
+        tree = parser.binary_tree
+        assert isinstance(tree, BinaryNode) and tree.operator == '+'
+        assert isinstance(tree.left, UnaryNode) and tree.left.operator == '-'
+        assert isinstance(tree.left.operand, ReferenceNode)
+        assert tree.left.operand is parser.tree.components[1]
+        assert tree.right.right.postfix
+        function = Parser("=SUM(A1, B1)").tree
+        assert binary_tree(function) is function
+
+    @pytest.mark.parametrize("formula", [
+        "=A1 + B1 * C1",
+        "=(A1 + B1) * C1",
+        "=A1 - (B1 - C1)",
+        "=2 ^ (3 ^ 2)",
+        "=-A1 ^ 2 + (-A1) % + -A1%",
+        '=IF(A1 > 0, (B1 + 2.5) * C1, "none") & "!"',
+    ])
+    def test_flat_dictionary_round_trip(self, formula):
+        """ Test that a tree flattens back into the parser's dictionary when there are no redundant parenthesis. """
+        parser = Parser(formula)
+        tree = parser.binary_tree
+        assert tree.to_dict() == parser.to_dict()
+        assert binary_tree(flattened(tree)).to_formula() == tree.to_formula()
+
+    def test_redundant_parenthesis_dropped(self):
+        """ Test that parenthesis the precedence doesn't need aren't kept. """
+        assert Parser("=(A1 + B1) + (C1 * D1)").binary_tree.to_dict() == Parser("=A1 + B1 + C1 * D1").to_dict()
+
+    def test_trees_are_usable_nodes(self):
+        """ Test translating, evaluating and graphing a binary tree. """
+        tree = Parser("=A1 * 2 + SUM(B1:B2)").binary_tree
+        moved = tree.translated(1, 1)
+        assert moved.to_formula() == "((B2 * 2) + SUM(C2:C3))"
+        assert tree.to_formula() == "((A1 * 2) + SUM(B1:B2))"
+        assert isinstance(moved.right, FunctionNode)
+        provider = DictCellProvider({("S", "A1"): 3, ("S", "B1"): 1, ("S", "B2"): 2})
+        assert Evaluator(provider).evaluate(tree, "S") == 9
+        graph = DependencyGraph()
+        graph.add_formula("S", "C1", tree)
+        assert [str(area) for area in graph.precedents("S", "C1")] == ["'S'!A1", "'S'!B1:B2"]
@@ -0,0 +1,36 @@
+import pytest
+from Models.parser import Parser
+from Models.parallel import ParseFailure, iter_parse_many, parse_many
+
+
+class TestParallel:
+
+    formulas = ["=SUM(A1, B1)", "=A1 +", '=IF(A1 > 0, "yes", "no")', "not a formula", "=MAX(C1:C10) * 2"]
+
+    def test_results_in_input_order(self):
+        """ Test that worker processes hand back results in input order with failures in place. """
+        results = Parser.parse_many(self.formulas * 20, workers=2, chunksize=7)
+        assert len(results) == 100
+        for formula, result in zip(self.formulas * 20, results):
+            if isinstance(result, ParseFailure):
+                assert result.formula == formula
+                assert formula in ("=A1 +", "not a formula")
+            else:
+                assert result == Parser(formula).to_dict()
+
+    def test_single_worker_matches_pool(self):
+        """ Test that parsing in process gives the same results as the pool. """
+        assert parse_many(self.formulas, workers=1) == parse_many(self.formulas, workers=2, chunksize=2)
+
+    def test_streams_from_a_generator(self):
+        """ Test that formulas can come from a generator and results come out lazily. """
+        formulas = (f"=A{row} * 2" for row in range(1, 1001))
+        results = iter_parse_many(formulas, workers=2, chunksize=50)
+        assert next(results)['expression'] == "A1 * 2"
+        assert sum(1 for _ in results) == 999
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            parse_many(self.formulas, chunksize=0)
+        with pytest.raises(ValueError):
+            parse_many(self.formulas, workers=0)
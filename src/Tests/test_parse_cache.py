@@ -0,0 +1,58 @@
+import pytest
+from Models.parse_cache import ParseCache
+
+
+class TestParseCache:
+
+    def test_hits_and_misses(self):
+        """ Test that lookups are counted as hits or misses. """
+        cache = ParseCache(maxsize=2)
+        assert cache.get("SUM(A1)") is None
+        cache.put("SUM(A1)", {"constant": 1})
+        assert cache.get("SUM(A1)") == {"constant": 1}
+        stats = cache.stats()
+        assert (stats.hits, stats.misses, stats.currsize, stats.maxsize) == (1, 1, 1, 2)
+
+    def test_least_recently_used_is_evicted(self):
+        """ Test that the oldest unused entry is dropped first. """
+        cache = ParseCache(maxsize=2)
+        cache.put("A1", {"constant": 1})
+        cache.put("A2", {"constant": 2})
+        cache.get("A1")  # A2 is now the least recently used
+        cache.put("A3", {"constant": 3})
+        assert "A1" in cache and "A3" in cache
+        assert "A2" not in cache
+        assert cache.stats().evictions == 1
+
+    def test_resize(self):
+        """ Test that shrinking the cache evicts entries straight away. """
+        cache = ParseCache(maxsize=3)
+        for text in ["A1", "A2", "A3"]:
+            cache.put(text, {"constant": 0})
+        cache.resize(1)
+        assert len(cache) == 1
+        assert "A3" in cache
+        assert cache.stats().evictions == 2
+        with pytest.raises(ValueError):
+            cache.resize(-1)
+
+    def test_disable_and_enable(self):
+        """ Test that a disabled cache stores nothing and counts nothing. """
+        cache = ParseCache()
+        cache.put("A1", {"constant": 1})
+        cache.disable()
+        assert len(cache) == 0
+        cache.put("A1", {"constant": 1})
+        assert cache.get("A1") is None
+        assert cache.stats().misses == 0
+
+        cache.enable()
+        cache.put("A1", {"constant": 1})
+        assert cache.get("A1") == {"constant": 1}
+
+    def test_memory_estimate(self):
+        """ Test that the memory estimate grows with the stored trees. """
+        cache = ParseCache()
+        empty = cache.stats().memory_bytes
+        cache.put("SUM(A1, B1)", {"function": "SUM(A1, B1)", "components": {"name": "SUM", "arguments": ["A1", "B1"]}})
+        assert cache.stats().memory_bytes > empty
@@ -1,5 +1,6 @@
 import pytest
 from Models.parser import Parser
+from Models.parse_cache import ParseCache
 
 class TestParser:
     
@@ -77,11 +78,30 @@ class TestParser:
 
     def test_invalid_formula(self):
         """ Test handling of invalid formulas. """
-        invalid_formulas = ["A1 + B1", "=(1 + 2", "=SUM((A1, A2)"]
+        invalid_formulas = ["A1 + B1", "=(1 + 2", "=SUM((A1, A2)", "=A1 +", "=SUM(A1,, 2)", "=A1 B1"]
         for formula in invalid_formulas:
             with pytest.raises(ValueError):
                 Parser(formula)
 
+    def test_nested_parentheses_and_operators(self):
+        """ Test parenthesised groups, two character operators and literals. """
+        parser = Parser('=IF(A1>=0, (B1+2.5)*C1, "none")')
+        arguments = parser.to_dict()['components']['arguments']
+        assert arguments[0]['expression'] == "A1 >= 0"
+        assert arguments[0]['components'][1] == {'operator': '>='}
+        assert arguments[1]['expression'] == "(B1 + 2.5) * C1"
+        assert arguments[1]['components'][0]['components'][2] == {'constant': 2.5}
+        assert arguments[2] == {'constant': 'none'}
+        assert parser.reconstructed_formula == '=IF(A1>=0, (B1+2.5)*C1, "none")'
+
+    def test_functions_inside_expressions(self):
+        """ Test that two calls joined by an operator aren't read as one function. """
+        parser = Parser("=SUM(A1) + SUM(B1)")
+        parsed = parser.to_dict()
+        assert parsed['expression'] == "SUM(A1) + SUM(B1)"
+        assert parsed['components'][0]['function'] == "SUM(A1)"
+        assert parsed['components'][2]['function'] == "SUM(B1)"
+
     def test_reconstructed_formula(self):
         """ Test the reconstructed formula from parsed output. """
         formula = "=A1 + B1"
@@ -89,6 +109,14 @@ class TestParser:
         output_formula = parser.reconstructed_formula.replace("(", "").replace(")", "")
         assert formula == output_formula, "Reconstructed formula should match the original"
 
+    def test_reconstruction_keeps_source_text(self):
+        """ Test that untouched parts of a formula come back exactly as written. """
+        formula = '=IF( A1>=0 ,(B1+2.50)*C1,  "say ""hi""" ) & MAX((1),2)'
+        parser = Parser(formula)
+        assert parser.reconstructed_formula == formula
+        parser.translate('A1', 'A3')
+        assert parser.reconstructed_formula == '=IF( A3>=0 ,(B3+2.50)*C3,  "say ""hi""" ) & MAX((1),2)'
+
     def test_get_all_keys_with_counts(self):
         """ Test key counting in parsed formulas. """
         formula = "=SUM(A1, MAX(B1, C1))"
@@ -139,3 +167,95 @@ class TestParser:
             }
         }
         assert parser.to_dict() == expected_output, "Translation should correctly adjust cell references"
+
+    def test_parse_is_cached(self, monkeypatch):
+        """ Test that the text is parsed once no matter how often the tree is used. """
+        calls = []
+        original_parse_tree = Parser.parse_tree
+
+        def counting_parse_tree(self, expr):
+            calls.append(expr)
+            return original_parse_tree(self, expr)
+
+        monkeypatch.setattr(Parser, 'parse_tree', counting_parse_tree)
+        monkeypatch.setattr(Parser, 'cache', ParseCache())
+        parser = Parser("=SUM(A1, B2)")
+        parser.parse()
+        str(parser)
+        assert parser.reconstructed_formula == "=SUM(A1, B2)"
+        parser.translate('A1', 'B1')
+        assert len(calls) == 1, "Parsing should only happen once per Parser"
+
+    def test_cache_invalidation(self):
+        """ Test that edits to the tree show up in the reconstructed formula. """
+        parser = Parser("=SUM(A1, B2)")
+        assert parser.reconstructed_formula == "=SUM(A1, B2)"
+
+        parser.translate('A1', 'A2')
+        assert parser.reconstructed_formula == "=SUM(A2, B3)"
+
+        parser.detach()['components']['name'] = "MAX"
+        assert parser.reconstructed_formula == "=SUM(A2, B3)", "In place edits are cached until invalidate()"
+        parser.invalidate()
+        assert parser.reconstructed_formula == "=MAX(A2, B3)"
+
+        parser.reparse()
+        assert parser.reconstructed_formula == "=SUM(A1, B2)"
+
+    def test_shared_cache_is_copy_on_write(self, monkeypatch):
+        """ Test that parsers of the same text share a tree until one changes it. """
+        monkeypatch.setattr(Parser, 'cache', ParseCache())
+        first = Parser("=SUM(A1, B2)")
+        second = Parser("=SUM(A1, B2)")
+        assert first.tree is second.tree
+        assert first.parsed_formula is not second.parsed_formula, "Dictionaries are private to each parser"
+        assert Parser.cache.stats().hits == 1
+
+        second.translate('A1', 'C3')
+        assert second.reconstructed_formula == "=SUM(C3, D4)"
+        assert first.reconstructed_formula == "=SUM(A1, B2)"
+        assert Parser("=SUM(A1, B2)").reconstructed_formula == "=SUM(A1, B2)"
+
+    def test_range_translation(self):
+        """ Test that ranges move along with references when translating. """
+        parser = Parser("=SUM(A1:B3, C1)")
+        parser.translate('A1', 'B2')
+        arguments = parser.to_dict()['components']['arguments']
+        assert arguments[0] == {"range": "B2:C4", "components": {"start": "B2", "end": "C4"}}
+        assert parser.reconstructed_formula == "=SUM(B2:C4, D2)"
+
+    def test_recurse_translate_in_place(self):
+        """ Test that recurse_translate moves the references of the dictionary it's given, nested ones included. """
+        parser = Parser("=SUM(A1:B3, C1 * 2)")
+        data = parser.to_dict()
+        arguments = data['components']['arguments']
+        product = arguments[1]
+        assert parser.recurse_translate(data, 1, 1) is data
+        assert data['function'] == "SUM(B2:C4, D2 * 2)"
+        assert data['components']['arguments'] is arguments and arguments[1] is product
+        assert product['components'][0]['reference'] == "D2"
+        assert arguments[0] == {"range": "B2:C4", "components": {"start": "B2", "end": "C4"}}
+        # the parser's own tree isn't touched
+        assert parser.reconstructed_formula == "=SUM(A1:B3, C1 * 2)"
+
+    def test_translate_many(self):
+        """ Test that a batch translation matches translating into each cell one at a time. """
+        formula = "=IF(A1 > 0, SUM(B1:C3, 'Sheet 1'!D2), \"x\")"
+        targets = ['A2', 'C10', (5, 7)]
+        expected = []
+        for target in ['A2', 'C10', 'E7']:
+            parser = Parser(formula)
+            parser.translate('A1', target)
+            expected.append(parser.reconstructed_formula)
+
+        parser = Parser(formula)
+        assert parser.translate_many('A1', targets) == expected
+        trees = parser.translate_many('A1', targets, as_tree=True)
+        assert ["=" + tree.source_text() for tree in trees] == expected
+        # the parser itself isn't moved
+        assert parser.reconstructed_formula == Parser(formula).reconstructed_formula
+
+    def test_translate_many_off_sheet(self):
+        """ Test that moving a reference above row 1 is an error. """
+        with pytest.raises(ValueError):
+            Parser("=A2 + B5").translate_many('A2', ['A1', (1, -5)])
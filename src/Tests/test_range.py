@@ -100,3 +100,21 @@ class TestCellRange:
         assert str(range.start_cell) == range_dict["components"]["start"]
         assert str(range.end_cell) == range_dict["components"]["end"]
         # end cell, not to be confused with incel ecks dee 
+
+    def test_large_range_is_lazy(self):
+        """ Test that a big range only keeps its bounds. """
+        range_inst = Range('A1:Z100000')
+        assert not hasattr(range_inst, '_cell_matrix') and 'cell_matrix' not in vars(range_inst)
+        assert len(range_inst) == 2600000
+        assert range_inst.shape == (100000, 26)
+        assert 'Z100000' in range_inst
+        assert 'AA1' not in range_inst
+        assert 'not a cell' not in range_inst
+        cells = iter(range_inst)
+        assert [next(cells) for _ in range(3)] == ['A1', 'B1', 'C1']
+
+    def test_membership_of_reversed_range(self):
+        """ Test that ranges written end first cover the same cells. """
+        range_inst = Range('B2:A1')
+        assert 'A1' in range_inst and 'B2' in range_inst
+        assert range_inst.get_cells_in_range() == [['A1', 'B1'], ['A2', 'B2']]
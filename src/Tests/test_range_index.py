@@ -0,0 +1,75 @@
+import random
+import pytest
+from Models.range import Range
+from Models.range_index import RangeIndex
+
+
+class TestRangeIndex:
+
+    def test_search_cell(self):
+        """ Test which ranges hold a cell, with the cell given a few different ways. """
+        index = RangeIndex([("A1:B5", "first"), (Range("B4:D10"), "second"), ((5, 1, 5, 1000000), "column E")])
+        assert sorted(index.search("B4")) == ["first", "second"]
+        assert index.search((5, 999999)) == ["column E"]
+        assert index.search("F1") == []
+        assert len(index) == 3
+
+    def test_search_area(self):
+        """ Test which ranges overlap a rectangle. """
+        index = RangeIndex([("A1:B5", 1), ("D1:D2", 2), ("A10:Z20", 3)])
+        assert sorted(index.search_area("B2:D3")) == [1, 2]
+        assert index.search_area("C6:C9") == []
+        assert sorted(index.search_area("A1:A100")) == [1, 3]
+
+    def test_remove(self):
+        """ Test that removed ranges stop coming back and unknown ones raise. """
+        index = RangeIndex([("A1:B5", 1), ("A1:B5", 2)])
+        index.remove("A1:B5", 1)
+        assert index.search("A1") == [2]
+        with pytest.raises(KeyError):
+            index.remove("A1:B5", 1)
+
+    def test_matches_a_linear_scan(self):
+        """ Test random rectangles and queries against checking every rectangle. """
+        generator = random.Random(7)
+        rectangles = {}
+        index = RangeIndex()
+        for value in range(3000):
+            top, left = generator.randint(1, 5000), generator.randint(1, 50)
+            bounds = (left, top, left + generator.randint(0, 5), top + generator.randint(0, 400))
+            rectangles[value] = bounds
+            index.add(bounds, value)
+        for value in range(0, 3000, 3):
+            index.remove(rectangles.pop(value), value)
+
+        for _ in range(300):
+            column, row = generator.randint(1, 60), generator.randint(1, 5500)
+            expected = [value for value, (min_col, min_row, max_col, max_row) in rectangles.items()
+                        if min_col <= column <= max_col and min_row <= row <= max_row]
+            assert sorted(index.search((column, row))) == expected
+            area = (column, row, column + 3, row + 50)
+            expected = [value for value, (min_col, min_row, max_col, max_row) in rectangles.items()
+                        if min_col <= column + 3 and max_col >= column and min_row <= row + 50 and max_row >= row]
+            assert sorted(index.search_area(area)) == expected
+
+    def test_ranges_sharing_rows(self):
+        """ Test many column ranges over the same rows, they're searched by column too instead of one by one. """
+        generator = random.Random(11)
+        rectangles = {}
+        for column in range(1, 2001):
+            # mostly SUM(B2:B1000), SUM(C2:C1000), ... with a few rows moved around
+            top, bottom = (2, 1000) if column % 4 else (generator.randint(1, 600), generator.randint(600, 1200))
+            rectangles[column] = (column, top, column + generator.randint(0, 2), bottom)
+        index = RangeIndex((bounds, value) for value, bounds in rectangles.items())
+
+        root = index.levels[-1][1]
+        assert root.across is not None and len(root.by_start) > 1000
+        for _ in range(300):
+            column, row = generator.randint(1, 2010), generator.randint(1, 1250)
+            expected = [value for value, (min_col, min_row, max_col, max_row) in rectangles.items()
+                        if min_col <= column <= max_col and min_row <= row <= max_row]
+            assert sorted(index.search((column, row))) == expected
+            area = (column, row, column + 5, row + 20)
+            expected = [value for value, (min_col, min_row, max_col, max_row) in rectangles.items()
+                        if min_col <= column + 5 and max_col >= column and min_row <= row + 20 and max_row >= row]
+            assert sorted(index.search_area(area)) == expected
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+from Models.column_store import ColumnStore
+from Models.dependency_graph import Cell
+from Models.evaluator import Evaluator
+from Models.excel_functions import ExcelError
+from Models.recalculation import Recalculator, CircularReferenceError
+
+
+class TestRecalculator:
+
+    def model(self):
+        model = Recalculator()
+        for row in range(1, 6):
+            model.set_value("S", f"A{row}", row)
+            model.set_formula("S", f"B{row}", f"=A{row} * 10")
+        model.set_formula("S", "C1", "=SUM(B1:B5)")
+        model.set_formula("S", "C2", "=C1 + A1")
+        model.set_formula("S", "D1", "=A5 * 2")
+        model.recalculate()
+        return model
+
+    def test_first_calculation(self):
+        """ Test that everything is calculated after the first recalculate. """
+        model = self.model()
+        assert [model.value("S", f"B{row}") for row in range(1, 6)] == [10, 20, 30, 40, 50]
+        assert model.value("S", "C1") == 150
+        assert model.value("S", "C2") == 151
+        assert not model.dirty
+
+    def test_only_affected_cells_recalculated(self, monkeypatch):
+        """ Test that an edit recalculates its dependents once each, after their precedents. """
+        model = self.model()
+        evaluated = []
+        original_evaluate_many = Evaluator.evaluate_many
+        monkeypatch.setattr(Evaluator, "evaluate_many", lambda self, items, *args, **kwargs: (
+            evaluated.extend(cell for cell, _ in items) or original_evaluate_many(self, items, *args, **kwargs)))
+        model.set_value("S", "A2", 7)
+        order = model.recalculate()
+        assert order == [Cell("S", 2, 2), Cell("S", 3, 1), Cell("S", 3, 2)]
+        assert evaluated == order
+        assert model.value("S", "C2") == 201
+        assert model.value("S", "D1") == 10
+        assert model.recalculate() == []
+
+    def test_replacing_formulas_and_values(self):
+        """ Test that a formula replaced by a value stops depending on its old precedents. """
+        model = self.model()
+        model.set_value("S", "B1", 1000)
+        model.set_formula("S", "A3", "=1 / 0")
+        model.recalculate()
+        assert model.value("S", "B3") == ExcelError('#DIV/0!')
+        assert model.value("S", "C1") == ExcelError('#DIV/0!')
+        model.set_value("S", "A1", 5)
+        assert model.recalculate() == [Cell("S", 3, 2)]
+
+    def test_cycles(self):
+        """ Test that a cycle is reported without recursing and everything outside it is still calculated. """
+        model = Recalculator()
+        for row in range(1, 5001):
+            model.set_formula("S", f"A{row}", f"=A{row + 1} + 1")
+        model.set_formula("S", "A5001", "=A1")
+        model.set_formula("S", "B1", "=A1")
+        model.set_formula("S", "C1", "=2 * 3")
+        with pytest.raises(CircularReferenceError) as error:
+            model.recalculate()
+        assert len(error.value.cycle) == 5001
+        assert Cell("S", 2, 1) in error.value.cells and Cell("S", 3, 1) not in error.value.cells
+        assert model.value("S", "C1") == 6
+
+        model.set_value("S", "A5001", 0)
+        model.recalculate()
+        assert model.value("S", "A1") == 5000
+        assert model.value("S", "B1") == 5000
+
+    def test_ranges_read_through_the_provider(self, monkeypatch):
+        """ Test that a wrapped ColumnStore serves its array views, with formula values put in where needed. """
+        store = ColumnStore()
+        store.set_column("S", "A", 1, np.arange(1, 5001, dtype=float))
+        model = Recalculator(store)
+        model.set_formula("S", "B1", "=SUM(A1:A5000)")
+        model.set_formula("S", "A2", "=A1 * 100")
+        model.set_formula("S", "C1", '=A1 & "!"')
+        # single cell reads would go through get, the array path doesn't need any
+        reads = []
+        original_get = ColumnStore.get
+        monkeypatch.setattr(ColumnStore, "get", lambda self, *cell: reads.append(cell) or original_get(self, *cell))
+        model.recalculate()
+        assert model.value("S", "B1") == 5000 * 5001 / 2 - 2 + 100
+        assert len(reads) < 10
+        assert isinstance(model.get_range("S", 1, 3, 1, 5000), np.ndarray)
+        assert model.get_range("S", 1, 1, 1, 3).tolist() == [[1.0], [100.0], [3.0]]
+        assert model.get_range("S", 1, 1, 3, 1) == [[1.0, 5000 * 5001 / 2 - 2 + 100, "1!"]]
+        model.set_value("S", "A2", 2)
+        assert isinstance(model.get_range("S", 1, 1, 1, 3), np.ndarray)
@@ -53,3 +53,38 @@ class TestReference:
         # Test string representation with a sheet name
         cell = Reference("'Sheet2'!E5")
         assert str(cell) == "'Sheet2'!E5", "String representation should include the sheet name"
+
+    def test_column_conversions(self):
+        # Column letters and numbers convert both ways up to XFD, Excel's last column
+        from Models.columns import column_index_from_string, get_column_letter
+        for letter, number in [("A", 1), ("Z", 26), ("AA", 27), ("AZ", 52), ("ZZ", 702), ("XFD", 16384)]:
+            assert column_index_from_string(letter) == number
+            assert get_column_letter(number) == letter
+        for bad in ["", "A1", "XFE", "ABCD"]:
+            with pytest.raises(ValueError):
+                column_index_from_string(bad)
+        with pytest.raises(ValueError):
+            get_column_letter(0)
+
+    def test_from_coordinates(self):
+        # Build references from integer coordinates without going through strings
+        cell = Reference.from_coordinates(28, 5)
+        assert str(cell) == "AB5"
+        assert cell.column_letter == "AB"
+        cell = Reference.from_coordinates(16384, 1048576, sheet_name="Data")
+        assert str(cell) == "'Data'!XFD1048576"
+        for column, row in [(0, 1), (1, 0), (16385, 1)]:
+            with pytest.raises(ValueError):
+                Reference.from_coordinates(column, row)
+
+    def test_columns_past_xfd_are_invalid(self):
+        # Excel stops at column XFD
+        assert Reference("XFD1").column_number == 16384
+        with pytest.raises(ValueError):
+            Reference("XFE1")
+
+    def test_from_dict(self):
+        cell = Reference.from_dict({"reference": "'Sheet1'!C3", "components": {
+            "sheet_name": "Sheet1", "column_letter": "C", "row_number": 3, "column_number": 3}})
+        assert str(cell) == "'Sheet1'!C3"
+        assert (cell.column_number, cell.row_number) == (3, 3)
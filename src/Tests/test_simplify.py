@@ -0,0 +1,99 @@
+import pytest
+from Models.evaluator import Evaluator, DictCellProvider
+from Models.formula import Formula
+from Models.parser import Parser
+from Models.simplify import simplify
+
+
+def simplified(formula):
+    return f"={simplify(Parser(formula).tree).source_text()}"
+
+
+class TestSimplify:
+
+    @pytest.mark.parametrize("formula, expected", [
+        ("=A1*(60*60*24)", "=A1*86400"),
+        ("=A1 * (60 * 60 * 24)", "=A1*86400"),
+        ("=((A1 + B1)) * (C1)", "=(A1+B1)*C1"),
+        ("=(A1+B1)+C1", "=A1+B1+C1"),
+        ("=SUM(A1,(2*3))", "=SUM(A1,6)"),
+        ("=2^-1 + A1", "=0.5+A1"),
+        ("=A1 - (2 - 3)", "=A1--1"),
+        ("=10% * A1", "=0.1*A1"),
+        ("=6 / 3", "=2"),
+        ('="a" & "b" & A1', '="ab"&A1'),
+        ("=(1 < 2) = TRUE", "=TRUE"),
+        ("=SUM(1, 2, 3) * A1", "=6*A1"),
+        ('=UPPER("ab") & LEN(A1)', '="AB"&LEN(A1)'),
+        ("=SUM(A1:A3, 2 * 3)", "=SUM(A1:A3,6)"),
+        ("=IF(1 > 2, A1, B1 + 1)", "=B1+1"),
+        ("=IF(FALSE, A1)", "=FALSE"),
+        ("=IFERROR(3, A1)", "=3"),
+        ("=IFERROR(SQRT(1 - 2) * 3, A1)", "=A1"),
+    ])
+    def test_folding(self, formula, expected):
+        """ Test that constant operations and pure functions over constants are worked out. """
+        assert simplified(formula) == expected
+
+    @pytest.mark.parametrize("formula, expected", [
+        ("=(A1 * 2) + 0", "=A1*2"),
+        ("=1 * (A1 - B1) / 1", "=A1-B1"),
+        ("=-(-(A1 * 2))", "=A1*2"),
+        ("=+A1", "=A1"),
+        ('=(A1 & "x") & ""', '=A1&"x"'),
+        # these convert their operand, so they stay
+        ("=A1 + 0", "=A1 + 0"),
+        ("=(A1 > 1) * 1", "=(A1 > 1) * 1"),
+        ('=A1 & ""', '=A1 & ""'),
+        ("=--A1", "=--A1"),
+    ])
+    def test_identities(self, formula, expected):
+        """ Test that identities are only dropped when they can't change the value. """
+        assert simplified(formula) == expected
+
+    @pytest.mark.parametrize("formula", ["=1 / 0 + A1", "=SQRT(- 1) + A1", "=IF(\"x\", 1, 2)",
+                                         "=2 ^ 1000 * A1", "=1 / 100000", "=NOW() + 1",
+                                         "=A1 * (0.1 + 0.2)", "=A1+B1", "=A1 + B1", "=7 ^ 300000000 * A1",
+                                         "=POWER(7, 300000000)", "=99999999999999999999 * 99999999999999999999"])
+    def test_left_alone(self, formula):
+        """ Test that errors, results a formula can't hold, unknown functions, longer text and respacing are left. """
+        tree = Parser(formula).tree
+        assert simplify(tree) is tree
+
+    def test_registered_functions(self, restore_functions):
+        """ Test that only functions registered as pure are precomputed. """
+        Evaluator.register_function("TWICE", lambda value: value * 2)
+        assert simplified("=TWICE(2)") == "=TWICE(2)"
+        Evaluator.register_function("TWICE", lambda value: value * 2, pure=True)
+        assert simplified("=TWICE(2)") == "=4"
+        Evaluator.register_function("SUM", lambda *values: 0)
+        assert simplified("=SUM(1, 2)") == "=SUM(1, 2)"
+
+    @pytest.mark.parametrize("formula", [
+        "=A1 * (60 * 60 * 24) + B1 / 1",
+        "=IF(A1 > 2 * 3, SUM(A1:B2, 1 + 1), -(-(B1 - 1)))",
+        '=UPPER("ab") & (A1 * 1) & ""',
+        "=(A1 + 0) * (1 + 1) ^ 2 - 50% * A2",
+        "=IFERROR(1 / 0, 2) + MAX(1, 2, B1)",
+    ])
+    def test_same_values(self, formula):
+        """ Test that a simplified formula evaluates to the same value, and simplifying again changes nothing. """
+        provider = DictCellProvider({("S", "A1"): 7, ("S", "B1"): "3", ("S", "A2"): 2.5})
+        evaluator = Evaluator(provider)
+        tree = simplify(Parser(formula).tree)
+        # compile_node doesn't fold, so this is the value of the formula as written
+        unfolded = evaluator.run(Evaluator.compile_node(Parser(formula).tree), "S", 0, 0)
+        assert evaluator.evaluate(tree, "S") == unfolded
+        assert simplify(tree) is tree
+        assert len(tree.source_text()) < len(formula) - 1
+
+    def test_parser_and_formula(self):
+        """ Test simplifying a parsed formula in place. """
+        formula = Formula("=SUM(A1, (2 * 3)) + ((B1))")
+        formula.simplify()
+        assert str(formula) == "=SUM(A1,6)+B1"
+        assert formula.parsed_formula == Parser("=SUM(A1, 6) + B1").to_dict()
+        parser = Parser("=A1 * (60 * 60 * 24)")
+        parser.simplify()
+        parser.translate("A1", "B2")
+        assert parser.reconstructed_formula == "=B2*86400"
@@ -0,0 +1,53 @@
+import pytest
+from Models.parser import Parser
+from Models.parse_cache import ParseCache
+from Models.template_cache import TemplateCache
+
+
+class TestTemplateCache:
+
+    def test_fill_down_formulas_share_a_key(self):
+        """ Test that formulas differing only by their relative offsets get the same key. """
+        assert TemplateCache.template_key("=A2*B2", 3, 2) == TemplateCache.template_key("=A3 * B3", 3, 3)
+        assert TemplateCache.template_key("=SUM(A1:A10)", 2, 1) == TemplateCache.template_key("=SUM(B5:B14)", 3, 5)
+        assert TemplateCache.template_key("=A2*B2", 3, 2) != TemplateCache.template_key("=A2*B3", 3, 2)
+        assert TemplateCache.template_key("='Sheet1'!A2", 2, 2) == "'Sheet1'!R[0]C[-1]"
+
+    def test_parse_matches_direct_parsing(self):
+        """ Test that translated templates reconstruct the same formula as a normal parse. """
+        cache = TemplateCache()
+        for row in range(2, 6):
+            formula = f"=SUM(A{row}:B{row}, C{row} * 2)"
+            parser = cache.parse(formula, f"D{row}")
+            assert parser.reconstructed_formula == Parser(formula).reconstructed_formula
+            assert parser.full_formula == formula
+        stats = cache.stats()
+        assert (stats.hits, stats.misses) == (3, 1)
+
+    def test_parse_keeps_each_formulas_spacing(self):
+        """ Test that a formula spaced unlike its template reconstructs as written. """
+        cache = TemplateCache()
+        assert cache.parse("=A1*B1", "C1").reconstructed_formula == "=A1*B1"
+        assert cache.parse("=A2*B2", "C2").reconstructed_formula == "=A2*B2"
+        assert cache.parse("=A3 * B3", "C3").reconstructed_formula == "=A3 * B3"
+
+    def test_only_first_row_is_parsed(self, monkeypatch):
+        """ Test that later rows are translated instead of parsed. """
+        calls = []
+        original_parse_tree = Parser.parse_tree
+
+        def counting_parse_tree(self, expr):
+            calls.append(expr)
+            return original_parse_tree(self, expr)
+
+        monkeypatch.setattr(Parser, 'parse_tree', counting_parse_tree)
+        monkeypatch.setattr(Parser, 'cache', ParseCache())
+        cache = TemplateCache()
+        parsers = [cache.parse(f"=A{row}*B{row}", f"C{row}") for row in range(1, 101)]
+        assert len(calls) == 1
+        assert parsers[-1].to_dict()['components'][2]['reference'] == "B100"
+
+    def test_invalid_formula(self):
+        """ Test that text without the leading '=' is rejected. """
+        with pytest.raises(ValueError):
+            TemplateCache().parse("A1*B1", "C1")
@@ -0,0 +1,54 @@
+import pytest
+from Models.tokenizer import Tokenizer
+
+
+class TestTokenizer:
+
+    def test_token_kinds(self):
+        """ Test that every kind of token is recognised with its value. """
+        tokens = Tokenizer.tokenize("SUM(A1:B2, 'Sheet1'!C3, 1.5, \"text\", TRUE) >= 10")
+        kinds = [token.kind for token in tokens]
+        assert kinds == [
+            Tokenizer.NAME, Tokenizer.LPAREN, Tokenizer.RANGE, Tokenizer.COMMA,
+            Tokenizer.REFERENCE, Tokenizer.COMMA, Tokenizer.NUMBER, Tokenizer.COMMA,
+            Tokenizer.STRING, Tokenizer.COMMA, Tokenizer.BOOLEAN, Tokenizer.RPAREN,
+            Tokenizer.OPERATOR, Tokenizer.NUMBER
+        ]
+        assert tokens[4].value == "'Sheet1'!C3"
+        assert tokens[12].value == ">="
+
+    def test_source_offsets(self):
+        """ Test that token offsets slice back to the token text. """
+        text = "A1 +  MAX(B1,C1)"
+        for token in Tokenizer.tokenize(text):
+            assert text[token.start:token.end] == token.value
+
+    def test_function_names_are_not_references(self):
+        """ Names that look like cells but are followed by '(' stay names. """
+        tokens = Tokenizer.tokenize("LOG10(A1)")
+        assert tokens[0].kind == Tokenizer.NAME
+        assert tokens[0].value == "LOG10"
+        assert tokens[2].kind == Tokenizer.REFERENCE
+
+    def test_two_character_operators(self):
+        """ Test that <>, >= and <= are single tokens. """
+        values = [token.value for token in Tokenizer.tokenize("A1<>B1<=C1")]
+        assert values == ["A1", "<>", "B1", "<=", "C1"]
+
+    def test_unexpected_character(self):
+        """ Test that characters outside the grammar raise a ValueError. """
+        with pytest.raises(ValueError):
+            Tokenizer.tokenize("A1 # B1")
+
+    def test_match_parentheses(self):
+        """ Test matching of parenthesis token indexes. """
+        tokens = Tokenizer.tokenize("(A1 + (B1))")
+        assert Tokenizer.match_parentheses(tokens) == {0: 6, 3: 5}
+        with pytest.raises(ValueError):
+            Tokenizer.match_parentheses(Tokenizer.tokenize("(A1 + (B1)"))
+
+    def test_sheet_qualified_range(self):
+        """ Test that a sheet name in front of a range stays part of the range token. """
+        tokens = Tokenizer.tokenize("SUM('My Data'!A1:B2)")
+        assert [token.kind for token in tokens] == [Tokenizer.NAME, Tokenizer.LPAREN, Tokenizer.RANGE, Tokenizer.RPAREN]
+        assert tokens[2].value == "'My Data'!A1:B2"
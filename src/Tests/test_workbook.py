@@ -0,0 +1,45 @@
+import pytest
+from openpyxl import Workbook
+from Models.parser import Parser
+from Models.parallel import ParseFailure
+from Models.workbook import iter_formula_cells, iter_workbook_formulas
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "Data"
+    for row in range(1, 51):
+        sheet.cell(row=row, column=1, value=row)
+        sheet.cell(row=row, column=2, value=f"=A{row} * 2")
+    sheet["C1"] = "=SUM(B1:B50)"
+    sheet["D1"] = "plain text"
+    other = workbook.create_sheet("Summary")
+    other["A1"] = "=MAX('Data'!B1, 10)"
+    other["A2"] = "=A1 +"
+    path = tmp_path / "book.xlsx"
+    workbook.save(path)
+    return path
+
+
+class TestWorkbook:
+
+    def test_formula_cells(self, workbook_path):
+        """ Test that only formula cells come out, sheet by sheet and row by row. """
+        cells = list(iter_formula_cells(workbook_path))
+        assert len(cells) == 53
+        assert cells[:3] == [("Data", "B1", "=A1 * 2"), ("Data", "C1", "=SUM(B1:B50)"), ("Data", "B2", "=A2 * 2")]
+        assert cells[-1] == ("Summary", "A2", "=A1 +")
+        assert [cell for _, cell, _ in iter_formula_cells(workbook_path, ["Summary"])] == ["A1", "A2"]
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_parsed_formulas(self, workbook_path, workers):
+        """ Test that every formula is parsed the same as Parser would, failures included. """
+        results = list(iter_workbook_formulas(workbook_path, workers=workers, chunksize=8))
+        assert [(sheet, cell) for sheet, cell, _ in results] == \
+            [(sheet, cell) for sheet, cell, _ in iter_formula_cells(workbook_path)]
+        for _, _, parsed in results[:-1]:
+            assert not isinstance(parsed, ParseFailure)
+        assert results[3][2] == Parser("=A3 * 2").to_dict()
+        assert isinstance(results[-1][2], ParseFailure)
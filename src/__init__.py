@@ -7,6 +7,28 @@ from .Models.constant import Constant
 from .Models.expression import Expression
 from .Models.parser import Parser
 from .Models.model_types import Types
+from .Models.parse_cache import ParseCache, parse_cache
+from .Models.template_cache import TemplateCache, template_cache
+from .Models.parallel import ParseFailure, parse_many, iter_parse_many
+from .Models.workbook import iter_formula_cells, iter_workbook_formulas
+from .Models.range_index import RangeIndex
+from .Models.dependency_graph import DependencyGraph, Cell, Area
+from .Models.excel_functions import ExcelError, CellRange
+from .Models.evaluator import Evaluator, CellProvider, DictCellProvider
+from .Models.recalculation import Recalculator, CircularReferenceError
+from .Models.nodes import (Node, ReferenceNode, RangeNode, ConstantNode, OperatorNode,
+                           FunctionNode, ExpressionNode, node_from_dict)
+from .Models.operator_tree import BinaryNode, UnaryNode, binary_tree
+from .Models.simplify import simplify
 
 __all__ = ['Reference', 'Function', 'Range', 'Formula', 
-           'Constant', 'Expression', 'Parser', 'Types']
+           'Constant', 'Expression', 'Parser', 'Types',
+           'ParseCache', 'parse_cache', 'TemplateCache', 'template_cache',
+           'ParseFailure', 'parse_many', 'iter_parse_many',
+           'iter_formula_cells', 'iter_workbook_formulas',
+           'RangeIndex', 'DependencyGraph', 'Cell', 'Area',
+           'ExcelError', 'CellRange', 'Evaluator', 'CellProvider', 'DictCellProvider',
+           'Recalculator', 'CircularReferenceError',
+           'Node', 'ReferenceNode', 'RangeNode', 'ConstantNode', 'OperatorNode',
+           'FunctionNode', 'ExpressionNode', 'node_from_dict', 'BinaryNode', 'UnaryNode', 'binary_tree',
+           'simplify']
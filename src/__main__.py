@@ -0,0 +1,5 @@
+# Lets the package run as `python -m ExcelFormulaParser parse ...`, see Models/cli.py
+import sys
+from .Models.cli import main
+
+sys.exit(main())